@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
 import os
+import sys
+
+# make the repo-level `genai_common` package importable when started with `streamlit run LLM-CSV/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import functions and data from our custom modules
-from data_handler import df 
-from conversation_manager import run_conversation
+from data_handler import dataset_summary, start_delta_watcher
+from conversation_manager import run_conversation, API_ERROR_MESSAGE
+from history_manager import turn_index
 from evaluation import TEST_CASES, evaluate_bert_score
+from genai_common import metrics
+from genai_common.tracing import trace
+from genai_common.streamlit_panels import render_timing_panel
+from genai_common.api_client import api_url, ask_bloodbank
 
 # --- Set page config ---
 st.set_page_config(
@@ -13,19 +22,28 @@ st.set_page_config(
     layout="wide"
 )
 
+# expose Prometheus metrics when METRICS_PORT is set (started once per process)
+metrics.start_from_env()
+# append the daily extracts dropped in BLOODBANK_DELTA_DIR while the app runs (started once per process)
+start_delta_watcher()
+
 # --- Initialize session state ---
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
+if 'tool_call_log' not in st.session_state:
+    st.session_state.tool_call_log = {}
 
 # --- Streamlit UI ---
 st.title("🩸 LLM Chat Blood Bank Assistant")
+show_timings = st.sidebar.checkbox("Show timing breakdown", value=False, help="Per-stage timings (LLM calls, data tool, formatting) for the last answer.")
 chat_tab, eval_tab = st.tabs(["Chat Assistant", "Model Evaluations"])
 
 with chat_tab:
     # Dataset Overview: only the expander
     with st.expander("Click to view detailed available columns and data info"):
-        st.markdown(f"**Total Records:** {len(df):,}")
-        st.markdown(f"**Date Range:** {df['TRANSFUSION_DT'].min().strftime('%Y-%m-%d')} to {df['TRANSFUSION_DT'].max().strftime('%Y-%m-%d')}")
+        summary = dataset_summary()
+        st.markdown(f"**Total Records:** {summary['records']:,}")
+        st.markdown(f"**Date Range:** {summary['first_date'].strftime('%Y-%m-%d')} to {summary['last_date'].strftime('%Y-%m-%d')}")
         st.markdown("""
         The dataset contains the following columns related to blood transfusion records:
         - **ENCNTR_ID**: Unique identifier for a hospital encounter.
@@ -63,10 +81,27 @@ with chat_tab:
         query_to_process, _ = st.session_state.conversation_history[-1]
         with st.chat_message("assistant"):
             with st.spinner("Analyzing your question and fetching data..."):
-                response = run_conversation(query_to_process)
+                if api_url():
+                    # answered by the shared API workers (KFSHRC_API_URL) instead of this process
+                    try:
+                        result = ask_bloodbank(query_to_process, st.session_state.conversation_history, st.session_state.tool_call_log)
+                        response = result["answer"]
+                        turn = turn_index(st.session_state.conversation_history, query_to_process)
+                        st.session_state.tool_call_log[turn] = result["tool_calls"]
+                        st.session_state.last_timing = result["timing"]
+                    except Exception as e:
+                        print(f"API request failed: {e}")
+                        response = API_ERROR_MESSAGE
+                else:
+                    with trace("bloodbank.ask") as request_trace:
+                        response = run_conversation(query_to_process)
+                    st.session_state.last_timing = request_trace.to_dict()
                 st.session_state.conversation_history[-1] = (query_to_process, response)
                 st.rerun() 
 
+    if show_timings:
+        render_timing_panel(st, st.session_state.get("last_timing"))
+
     # Quick Questions to Try
     st.markdown("---")
     with st.expander("Quick Questions to Try"):
@@ -93,6 +128,7 @@ with chat_tab:
     st.markdown("---")
     if st.button("Clear Chat History", help="Clears all messages from the current session.", use_container_width=True):
         st.session_state.conversation_history = []
+        st.session_state.tool_call_log = {}
         st.rerun()
 
 with eval_tab: # Content for the "Model Evaluations"
@@ -102,9 +138,13 @@ with eval_tab: # Content for the "Model Evaluations"
     - **BERTScore Evaluation**: Measures the semantic similarity between the model's generated natural language response and an expected reference response.
     """)
     
+    rescale = st.checkbox("Rescale BERTScore with baseline", value=False, key="eval_rescale",
+                          help="Spreads scores over a more readable range; does not change the ranking.")
+
     if st.button("Run BERTScore Evaluation", type="secondary", use_container_width=True):
-        st.session_state.conversation_history = [] 
-        evaluate_bert_score()
+        st.session_state.conversation_history = []
+        st.session_state.tool_call_log = {}
+        evaluate_bert_score(rescale=rescale)
 
 st.markdown("---") #
 st.caption("Developed for KFSHRC Blood Bank LLM Chat")
\ No newline at end of file
@@ -1,7 +1,14 @@
 import json
 import re
+from typing import Iterator
 import streamlit as st 
-from llm_config import client, system_prompt, tools, available_functions 
+from llm_config import get_llm_client, system_prompt, tools, available_functions, MODEL_NAME, latency_policy
+from history_manager import build_history_messages, format_tool_call, turn_index
+from genai_common.prompt_metrics import timed_completion
+from genai_common.tracing import mark_failed, span
+from genai_common.streaming import strip_thoughts_stream
+
+API_ERROR_MESSAGE = "Sorry, I encountered an error while trying to connect to the AI service. Please try again later."
 
 def strip_model_thoughts(text: str) -> str:
     """
@@ -33,84 +40,151 @@ def strip_model_thoughts(text: str) -> str:
 
     return text
 
-def run_conversation(user_query: str) -> str:
+def _run_tool_phase(user_query: str, history: list, tool_log: dict):
     """
-    The main function to handle the conversation with the LLM using Fireworks.
-    It orchestrates sending messages, handling tool calls, and getting the final response.
+    Sends the question with the available tools and executes any tool calls the model makes.
+    Returns (answer, messages): `answer` is set when the model replied directly or a tool failed,
+    otherwise `messages` includes the tool results and is ready for the final answer request.
     """
-    model_name = "accounts/fireworks/models/qwen3-30b-a3b"
-    
     # initialize messages with the system prompt
-    messages = [{"role": "system", "content": system_prompt}]
-
-    if 'conversation_history' in st.session_state:
-        for past_user_query, past_assistant_response in st.session_state.conversation_history:
-            if past_assistant_response != "...":
-                messages.append({"role": "user", "content": past_user_query})
-                messages.append({"role": "assistant", "content": past_assistant_response})
-
-    messages.append({"role": "user", "content": user_query})
-
-    try:
-        # send the conversation and available tools to the model
-        response = client.chat.completions.create(
-            model=model_name,
+    with span("context_build"):
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(build_history_messages(history, tool_log))
+        messages.append({"role": "user", "content": user_query})
+
+    # send the conversation and available tools to the model
+    with span("llm_call"):
+        response = timed_completion(
+            get_llm_client(),
+            "bloodbank.tool_selection",
+            model=MODEL_NAME,
+            policy=latency_policy,
             messages=messages,
             tools=tools,
             tool_choice="auto", # the model decides whether to call a function
         )
 
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
+    response_message = response["choices"][0]["message"]
+    tool_calls = response_message.get("tool_calls")
+
+    # by turn, so asking the same question again does not replace the earlier turn's calls;
+    # reset even when no tool is called, so a retried turn does not keep the calls of its last try
+    turn = turn_index(history, user_query)
+    tool_log[turn] = []
 
-        #  check if the model wants to call a function
-        if not tool_calls:
-            final_response_content = strip_model_thoughts(response_message.content)
-            return final_response_content
+    #  check if the model wants to call a function
+    if not tool_calls:
+        with span("formatting"):
+            return strip_model_thoughts(response_message.get("content")), messages
 
-        messages.append(response_message)
+    messages.append(response_message)
 
-        # execute the function and get the result
-        for tool_call in tool_calls:
-            function_name = tool_call.function.name
-            function_to_call = available_functions.get(function_name)
-            
-            if not function_to_call:
-                return f"I encountered an issue: The function '{function_name}' is not recognized."
+    # execute the function and get the result
+    for tool_call in tool_calls:
+        function_name = tool_call["function"]["name"]
+        function_to_call = available_functions.get(function_name)
+        
+        if not function_to_call:
+            return f"I encountered an issue: The function '{function_name}' is not recognized.", messages
 
-            try:
-                function_args = json.loads(tool_call.function.arguments)
+        try:
+            function_args = json.loads(tool_call["function"]["arguments"])
+            with span("tool_execution"):
                 function_response_data = function_to_call(**function_args)
-            except json.JSONDecodeError:
-                return "I had trouble understanding the data structure needed for the tool. Could you rephrase your question?"
-            except TypeError as e:
-                return f"There was a type error when calling the function: {e}. Please check the input values."
-            except Exception as e:
-                 return f"An error occurred while processing your request with the data tool: {e}"
-
-            # append the function's response to the message history
+        except json.JSONDecodeError:
+            return "I had trouble understanding the data structure needed for the tool. Could you rephrase your question?", messages
+        except TypeError as e:
+            return f"There was a type error when calling the function: {e}. Please check the input values.", messages
+        except Exception as e:
+             return f"An error occurred while processing your request with the data tool: {e}", messages
+
+        # remember the filters used so later turns can be summarized compactly
+        tool_log[turn].append(format_tool_call(function_name, function_args))
+
+        # append the function's response to the message history
+        # (default=str covers timestamps and numpy scalars returned by pandas aggregations)
+        with span("formatting"):
             messages.append(
                 {
-                    "tool_call_id": tool_call.id,
+                    "tool_call_id": tool_call["id"],
                     "role": "tool",
                     "name": function_name,
-                    "content": json.dumps(function_response_data),
+                    "content": json.dumps(function_response_data, default=str),
                 }
             )
+    return None, messages
+
+def _resolve_session(history: list, tool_log: dict):
+    if history is None:
+        history = st.session_state.get('conversation_history', [])
+    if tool_log is None:
+        tool_log = st.session_state.setdefault('tool_call_log', {})
+    return history, tool_log
+
+def run_conversation(user_query: str, history: list = None, tool_log: dict = None) -> str:
+    """
+    The main function to handle the conversation with the LLM using Fireworks.
+    It orchestrates sending messages, handling tool calls, and getting the final response.
+    `history` and `tool_log` default to the Streamlit session; older turns are compacted
+    into a summary by `build_history_messages` so the prompt stays within budget. The tool
+    calls of this question are stored in `tool_log` under its turn index (see `turn_index`).
+    """
+    history, tool_log = _resolve_session(history, tool_log)
+
+    try:
+        answer, messages = _run_tool_phase(user_query, history, tool_log)
+        if answer is not None:
+            return answer
 
         # send the updated messages back to the model
-        second_response = client.chat.completions.create(
-            model=model_name,
-            messages=messages, # now includes the system prompt
-        )
+        # tools are resent (with tool_choice="none") so this request shares the cached prefix of the first one
+        with span("llm_call"):
+            second_response = timed_completion(
+                get_llm_client(),
+                "bloodbank.final_answer",
+                model=MODEL_NAME,
+                policy=latency_policy,
+                messages=messages, # now includes the system prompt
+                tools=tools,
+                tool_choice="none",
+            )
 
-        response_content = second_response.choices[0].message.content
-        final_response_content = strip_model_thoughts(response_content)
+        response_content = second_response["choices"][0]["message"]["content"]
+        with span("formatting"):
+            final_response_content = strip_model_thoughts(response_content)
         
         return final_response_content
 
     except Exception as e:
-        return "Sorry, I encountered an error while trying to connect to the AI service. Please try again later."
+        print(f"LLM request failed: {e}")
+        mark_failed()
+        return API_ERROR_MESSAGE
+
+def stream_conversation(user_query: str, history: list = None, tool_log: dict = None) -> Iterator[str]:
+    """
+    Streaming variant of `run_conversation`: tool selection and execution run as usual, then the
+    final answer is yielded as it is generated (thought blocks removed).
+    """
+    history, tool_log = _resolve_session(history, tool_log)
+
+    try:
+        answer, messages = _run_tool_phase(user_query, history, tool_log)
+        if answer is not None:
+            yield answer
+            return
+
+        with span("llm_call"):
+            yield from strip_thoughts_stream(get_llm_client().stream(
+                model=MODEL_NAME,
+                messages=messages,
+                tools=tools,
+                tool_choice="none",
+            ))
+
+    except Exception as e:
+        print(f"LLM request failed: {e}")
+        mark_failed()
+        yield API_ERROR_MESSAGE
 
 # function to get only the tool call arguments for evaluation
 def get_tool_call_arguments(user_query: str):
@@ -118,27 +192,27 @@ def get_tool_call_arguments(user_query: str):
     Sends a query to the LLM and returns the arguments of the first tool call, if any.
     This is for evaluation purposes, to inspect the tool call before execution.
     """
-    model_name = "accounts/fireworks/models/qwen3-30b-a3b"
-    
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_query},
     ]
 
     try:
-        response = client.chat.completions.create(
-            model=model_name,
+        response = timed_completion(
+            get_llm_client(),
+            "bloodbank.tool_arguments",
+            model=MODEL_NAME, # no latency policy: evaluation must score the primary model only
             messages=messages,
             tools=tools,
             tool_choice="auto", # the model decides whether to call a function
         )
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
+        response_message = response["choices"][0]["message"]
+        tool_calls = response_message.get("tool_calls")
 
         if tool_calls:
             tool_call_info = {
-                "name": tool_calls[0].function.name,
-                "args": json.loads(tool_calls[0].function.arguments)
+                "name": tool_calls[0]["function"]["name"],
+                "args": json.loads(tool_calls[0]["function"]["arguments"])
             }
             return tool_call_info
         else:
@@ -1,40 +1,270 @@
 import pandas as pd
 import streamlit as st 
 import os 
+import glob
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+from genai_common import metrics
+from genai_common.tracing import timed
+from query_format import format_grouped_resample, format_group_index
+
+# "pandas" keeps the dataset in memory; "duckdb" runs the same queries over Parquet (see duckdb_engine.py)
+QUERY_ENGINE = os.getenv("BLOODBANK_QUERY_ENGINE", "pandas").lower()
+
+# "1" maps one copy of the dataset shared by all worker processes on the host (see shared_dataset.py)
+SHARED_DATASET = os.getenv("BLOODBANK_SHARED_DATASET", "0") == "1"
+CSV_PATH = os.getenv("BLOODBANK_CSV", 'RAG/synthetic_data_blood_bank.csv')
 
 _df = None 
+_shared_source = None # the CSV the shared dataset was published from (see shared_dataset.source_fingerprint)
+
+
+def _read_csv() -> pd.DataFrame:
+    df_loaded = pd.read_csv(CSV_PATH)
+    df_loaded['TRANSFUSION_DT'] = pd.to_datetime(df_loaded['TRANSFUSION_DT'])
+    return df_loaded
+
+
 @st.cache_data
 def _load_data_internal():
     """
     Loads the synthetic blood bank data from a CSV file.
     Caches the data to avoid re-loading on every rerun.
     """
+    return _read_csv()
+
+
+def _load_data():
+    global _shared_source
     try:
-        df_loaded = pd.read_csv('RAG/synthetic_data_blood_bank.csv')
-        df_loaded['TRANSFUSION_DT'] = pd.to_datetime(df_loaded['TRANSFUSION_DT'])
-        return df_loaded
+        if SHARED_DATASET:
+            import shared_dataset
+            _shared_source = shared_dataset.source_fingerprint(CSV_PATH)
+            # not through st.cache_data, which would hand each caller a private copy of the mapped frame
+            return shared_dataset.load(_shared_source, _read_csv)
+        return _load_data_internal()
     except FileNotFoundError:
-        st.error("Error: 'RAG/synthetic_data_blood_bank.csv' not found. Please ensure the CSV file is in the correct location.")
+        st.error(f"Error: '{CSV_PATH}' not found. Please ensure the CSV file is in the correct location.")
         st.stop() 
     except Exception as e:
         st.error(f"Error loading data: {e}. Please check your CSV file.")
         st.stop()
 
-# load the dataframe once when the module is imported.
-df = _load_data_internal()
+# load the dataframe once when the module is imported (the duckdb engine reads Parquet instead).
+df = _load_data() if QUERY_ENGINE == "pandas" else None
+
+# daily extracts dropped here are appended by the delta watcher (see start_delta_watcher)
+DELTA_DIR_ENV_VAR = "BLOODBANK_DELTA_DIR"
+DELTA_POLL_SECONDS = float(os.getenv("BLOODBANK_DELTA_POLL_SECONDS", "30"))
+
+# bumped on every append; caches of query results include it in their keys
+_dataset_version = 0
+_applied_deltas: Dict[str, int] = {} # delta name -> rows appended
+_append_lock = threading.Lock()
+# derived from df and updated in place by append_records instead of being recomputed per call
+_unique_values: Dict[str, list] = {} # column -> non-null values in order of first appearance
+_date_range = None # (first, last) TRANSFUSION_DT
+
+
+def dataset_version() -> int:
+    return _dataset_version
+
+
+metrics.register_gauge("bloodbank_dataset_version", "Appends applied to the blood bank dataset in this process.", dataset_version)
+metrics.register_gauge("bloodbank_delta_rows", "Rows appended from deltas in this process.", lambda: sum(_applied_deltas.values()))
+
+# results of query_data by canonical arguments and dataset version, least recently used evicted first
+QUERY_CACHE_SIZE = int(os.getenv("BLOODBANK_QUERY_CACHE_SIZE", "256")) # 0 disables the cache
+PERIOD_ALIASES = {"d": "D", "day": "D", "daily": "D", "w": "W", "week": "W", "weekly": "W",
+                  "m": "M", "me": "M", "month": "M", "monthly": "M"}
+_query_cache: "OrderedDict[Tuple[int, str], dict]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_query_cache_events = metrics.counter("bloodbank_query_cache_events_total", "query_data result cache hits, misses and evictions.")
+metrics.register_gauge("bloodbank_query_cache_entries", "Results held in the query_data cache.", lambda: len(_query_cache))
+
+
+def dataset_summary() -> dict:
+    """Record count and date range, for the sidebar."""
+    global _date_range
+    if QUERY_ENGINE == "duckdb":
+        import duckdb_engine
+        return duckdb_engine.dataset_summary()
+    if _date_range is None:
+        _date_range = (df['TRANSFUSION_DT'].min(), df['TRANSFUSION_DT'].max())
+    return {"records": len(df), "first_date": _date_range[0], "last_date": _date_range[1]}
+
+
+def _delta_name(source: Union[str, pd.DataFrame]) -> str:
+    if isinstance(source, pd.DataFrame):
+        # frames have no file name; the same rows give the same name, so they are appended once
+        digest = hashlib.sha1(pd.util.hash_pandas_object(source, index=False).values.tobytes()).hexdigest()
+        return f"frame-{digest[:16]}"
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def _read_delta(source: Union[str, pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    """Loads a delta (CSV path or DataFrame) and checks it has exactly the dataset's columns."""
+    delta = pd.read_csv(source) if isinstance(source, str) else source.copy()
+    missing = [c for c in columns if c not in delta.columns]
+    extra = [c for c in delta.columns if c not in columns]
+    if missing or extra:
+        raise ValueError(f"Delta columns do not match the dataset (missing: {missing}, unexpected: {extra}).")
+    delta = delta[columns]
+    delta['TRANSFUSION_DT'] = pd.to_datetime(delta['TRANSFUSION_DT'])
+    return delta
+
+
+def _dataset_columns() -> List[str]:
+    if QUERY_ENGINE == "duckdb":
+        import duckdb_engine
+        return duckdb_engine.column_names()
+    return list(df.columns)
+
+
+def _append_pandas(deltas: List[Tuple[str, pd.DataFrame]]) -> None:
+    global df, _date_range
+    delta = pd.concat([d.astype(df.dtypes.to_dict()) for _, d in deltas], ignore_index=True)
+    # new row labels continue the existing RangeIndex
+    delta.index = pd.RangeIndex(len(df), len(df) + len(delta))
+    # built aside and swapped in one assignment, so running queries keep a consistent frame
+    if SHARED_DATASET:
+        import shared_dataset
+        # a concat would copy the mapped frame into this worker; the combined frame is mapped as well
+        new_df = shared_dataset.extend(df, delta, _shared_source, list(_applied_deltas) + [name for name, _ in deltas])
+    else:
+        new_df = pd.concat([df, delta])
+    for column, values in _unique_values.items():
+        seen = set(values)
+        values.extend(v for v in delta[column].dropna().unique().tolist() if v not in seen)
+    if _date_range is not None and len(delta):
+        dates = delta['TRANSFUSION_DT']
+        _date_range = (min(_date_range[0], dates.min()), max(_date_range[1], dates.max()))
+    df = new_df
+
+
+def _record_applied(name: str, rows: int) -> None:
+    global _dataset_version
+    _applied_deltas[name] = rows
+    _dataset_version += 1
+    clear_query_cache() # entries of older versions can no longer be hit
+    print(f"Appended {rows} records from delta '{name}' (dataset version {_dataset_version}).")
+
+
+def _append_locked(deltas: List[Tuple[str, pd.DataFrame]]) -> None:
+    """Appends read deltas in order; the caller holds _append_lock. Deltas applied before a failure stay applied."""
+    if QUERY_ENGINE == "duckdb":
+        import duckdb_engine
+        for name, delta in deltas:
+            duckdb_engine.append_delta(delta, name)
+            _record_applied(name, len(delta))
+        return
+    # in one step, so a shared dataset is published once with all of them (see shared_dataset.extend)
+    _append_pandas(deltas)
+    for name, delta in deltas:
+        _record_applied(name, len(delta))
+
+
+def append_records(source: Union[str, pd.DataFrame], name: Optional[str] = None) -> dict:
+    """
+    Appends new transfusion records (a CSV path or a DataFrame with the dataset's columns) without
+    reloading the dataset. A delta is applied once per name (the file name without extension by
+    default), so re-delivered files are skipped. Returns a dictionary with 'result' or 'error'.
+    """
+    name = name or _delta_name(source)
+    with _append_lock:
+        if name in _applied_deltas:
+            return {"result": f"Delta '{name}' was already applied.", "rows": 0, "version": _dataset_version}
+        try:
+            delta = _read_delta(source, _dataset_columns())
+            _append_locked([(name, delta)])
+        except Exception as e:
+            return {"error": f"Failed to append delta '{name}': {e}"}
+        return {"result": f"Appended {len(delta)} records.", "rows": len(delta), "version": _dataset_version}
+
+
+def apply_pending_deltas(directory: str) -> int:
+    """Appends the CSV files in `directory` not applied yet, in file name order; returns the rows added."""
+    with _append_lock:
+        deltas = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            name = _delta_name(path)
+            if name in _applied_deltas:
+                continue
+            try:
+                deltas.append((name, _read_delta(path, _dataset_columns())))
+            except Exception as e:
+                print(f"Failed to append delta '{name}': {e}")
+        if not deltas:
+            return 0
+        applied = len(_applied_deltas)
+        try:
+            # all pending deltas at once, so a restarted worker attaches the shared file with all of them
+            _append_locked(deltas)
+        except Exception as e:
+            print(f"Failed to append deltas from {directory}: {e}")
+        return sum(rows for rows in list(_applied_deltas.values())[applied:])
+
+
+_watcher: Optional[threading.Thread] = None
+
+
+def start_delta_watcher(directory: Optional[str] = None, interval: float = DELTA_POLL_SECONDS) -> Optional[threading.Thread]:
+    """
+    Polls `directory` (default: $BLOODBANK_DELTA_DIR) for new delta CSVs on a daemon thread.
+    Does nothing when no directory is configured; later calls return the running watcher.
+    """
+    global _watcher
+    directory = directory or os.getenv(DELTA_DIR_ENV_VAR)
+    if not directory:
+        return None
+    with _append_lock:
+        if _watcher is not None:
+            return _watcher
+
+        def watch():
+            while True:
+                try:
+                    apply_pending_deltas(directory)
+                except Exception as e:
+                    print(f"Error while applying deltas from {directory}: {e}")
+                time.sleep(interval)
+
+        _watcher = threading.Thread(target=watch, name="bloodbank-delta-watcher", daemon=True)
+        _watcher.start()
+        return _watcher
+
 
 # function to get unique values in a column
+@timed("get_unique_values")
 def get_unique_values(column_name: str) -> dict:
     """
     Retrieves all unique, non-null values from a specified column in the dataset.
     Returns a dictionary with 'result' or 'error'.
     """
+    if QUERY_ENGINE == "duckdb":
+        import duckdb_engine
+        return duckdb_engine.get_unique_values(column_name)
+    return get_unique_values_pandas(column_name)
+
+
+def get_unique_values_pandas(column_name: str) -> dict:
     if column_name not in df.columns:
         return {"error": f"Column '{column_name}' not found in the dataset."}
     
-    unique_vals = df[column_name].dropna().unique().tolist()
+    # under the append lock, so a list computed from the old frame is never cached after an append
+    with _append_lock:
+        if column_name not in _unique_values:
+            _unique_values[column_name] = df[column_name].dropna().unique().tolist()
+        unique_vals = list(_unique_values[column_name])
     return {"result": unique_vals}
 
+@timed("query_data")
 def query_data(
     filters: dict = None,
     aggregations: dict = None,
@@ -44,9 +274,111 @@ def query_data(
     """
     A powerful and general function to query the blood bank dataset.
     It can filter, aggregate, group, and create time series data based on the provided parameters.
-    Returns a dictionary with 'result' or 'error'.
+    Returns a dictionary with 'result' or 'error'. Results are cached (see canonical_query) and
+    shared between callers, so treat them as read-only.
+    """
+    if isinstance(time_resample_period, str):
+        time_resample_period = PERIOD_ALIASES.get(time_resample_period.strip().lower(), time_resample_period)
+    # the version is read before the data, so a result is never filed under a newer version than its data
+    key = (_dataset_version, canonical_query(filters, aggregations, group_by, time_resample_period))
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    if QUERY_ENGINE == "duckdb":
+        import duckdb_engine
+        result = duckdb_engine.query_data(filters, aggregations, group_by, time_resample_period)
+    else:
+        result = query_data_pandas(filters, aggregations, group_by, time_resample_period)
+    if "error" not in result:
+        _cache_put(key, result)
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _canonical_date(value: str) -> str:
+    # parsing a date string takes hundreds of microseconds, more than a cache hit should
+    try:
+        return pd.to_datetime(value).isoformat()
+    except Exception:
+        return value
+
+
+def _canonical_value(column: str, op: str, value: Any) -> Any:
+    if column == 'TRANSFUSION_DT' and isinstance(value, str):
+        return _canonical_date(value)
+    # contains matches case-insensitively; escapes like \D and \d differ, so those patterns are kept
+    if op == 'contains' and isinstance(value, str) and "\\" not in value:
+        return value.casefold()
+    return value
+
+
+def canonical_query(filters: dict = None, aggregations: dict = None, group_by: list = None,
+                    time_resample_period: str = None) -> str:
+    """
+    query_data arguments as a string that is equal for equivalent calls: filters and aggregations
+    in sorted order, dates in ISO form, `contains` patterns in lower case. Group keys keep their
+    order, since it sets the order of the result keys.
     """
-    df_filtered = df.copy() # use the module-level df
+    canonical_filters = {
+        column: {op: _canonical_value(column, op, value) for op, value in sorted(conditions.items())}
+        if isinstance(conditions, dict) else conditions
+        for column, conditions in sorted((filters or {}).items())
+    }
+    return json.dumps([canonical_filters, dict(sorted((aggregations or {}).items())), list(group_by or []),
+                       time_resample_period or None], sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _cache_get(key: Tuple[int, str]) -> Optional[dict]:
+    if QUERY_CACHE_SIZE <= 0:
+        return None
+    with _query_cache_lock:
+        result = _query_cache.get(key)
+        if result is None:
+            _query_cache_stats["misses"] += 1
+        else:
+            _query_cache.move_to_end(key)
+            _query_cache_stats["hits"] += 1
+    _query_cache_events.inc(event="miss" if result is None else "hit")
+    return result
+
+
+def _cache_put(key: Tuple[int, str], result: dict) -> None:
+    if QUERY_CACHE_SIZE <= 0:
+        return
+    evicted = 0
+    with _query_cache_lock:
+        _query_cache[key] = result
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+            evicted += 1
+        _query_cache_stats["evictions"] += evicted
+    if evicted:
+        _query_cache_events.inc(evicted, event="eviction")
+
+
+def query_cache_stats() -> dict:
+    """Hits, misses, evictions, current entries and hit ratio of the query_data cache."""
+    with _query_cache_lock:
+        stats = dict(_query_cache_stats, entries=len(_query_cache))
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def clear_query_cache() -> None:
+    with _query_cache_lock:
+        _query_cache.clear()
+
+
+def query_data_pandas(
+    filters: dict = None,
+    aggregations: dict = None,
+    group_by: list = None,
+    time_resample_period: str = None
+) -> dict:
+    df_filtered = df # copy-on-write: filtering never modifies (or copies) the module-level df
 
     # apply filters
     if filters:
@@ -95,23 +427,7 @@ def query_data(
             agg_result = grouped_resampled_df.agg(aggregations)
 
             # flatten MultiIndex and format for LLM readability
-            formatted_results = {}
-            for index, row_data in agg_result.iterrows():
-                category_value = index[:-1] if len(group_by) > 1 else index[0] # handle single or multiple group_by columns
-                date_str = index[-1].strftime('%Y-%m-%d')
-
-                # create a unique key for the dictionary based on group_by values and date
-                key_parts = [str(cv) for cv in category_value] if isinstance(category_value, tuple) else [str(category_value)]
-                formatted_key = f"{' - '.join(key_parts)} - {date_str}"
-
-                # ensure row_data is a dictionary
-                if isinstance(row_data, pd.Series):
-                    formatted_results[formatted_key] = row_data.to_dict()
-                else: # for single aggregation, row_data might be a scalar
-                    agg_col, agg_func = list(aggregations.items())[0]
-                    formatted_results[formatted_key] = {f"{agg_col}_{agg_func}": row_data}
-
-            return {"result": formatted_results}
+            return {"result": format_grouped_resample(agg_result, group_by, aggregations)}
 
         elif time_resample_period:
             # only time resampling
@@ -121,10 +437,7 @@ def query_data(
 
         elif group_by:
             # only grouping
-            result_df = df_filtered.groupby(group_by).agg(aggregations)
-            if isinstance(result_df.index, pd.MultiIndex):
-                # convert MultiIndex tuples to a readable string format
-                result_df.index = result_df.index.map(lambda x: str(x) if isinstance(x, tuple) else x)
+            result_df = format_group_index(df_filtered.groupby(group_by).agg(aggregations))
             return {"result": result_df.to_dict(orient='index')}
         else:
             # simple aggregation without grouping or time resampling
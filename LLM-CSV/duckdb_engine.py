@@ -0,0 +1,287 @@
+"""
+DuckDB execution engine for the blood bank tools, selected with BLOODBANK_QUERY_ENGINE=duckdb.
+
+`query_data` and `get_unique_values` take the same arguments as the pandas implementation in
+`data_handler` and return the same result dictionaries, but run as SQL over Parquet files
+(BLOODBANK_PARQUET, a file or glob), so the dataset does not have to fit in every worker's memory
+and scans use all cores (BLOODBANK_DUCKDB_THREADS, BLOODBANK_DUCKDB_MEMORY to cap them). Only the
+aggregated rows come back to pandas, where the pandas path's formatting is reused; empty resample
+bins are filled in the way pandas `resample` fills them.
+
+Appended records (`data_handler.append_records`) are written as one Parquet file per delta to
+BLOODBANK_DELTA_PARQUET_DIR (default RAG/bloodbank_deltas/) and read together with the base files;
+a delta whose file already exists (written by another worker or before a restart) is not written
+again, so deltas are not counted twice.
+
+Create the Parquet file from the CSV (from the repository root):
+    python LLM-CSV/duckdb_engine.py
+Check parity with the pandas engine:
+    python -m benchmarks.query_engine_parity
+"""
+import os
+import glob
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from query_format import format_grouped_resample, format_group_index
+
+PARQUET_ENV_VAR = "BLOODBANK_PARQUET"
+DELTA_PARQUET_ENV_VAR = "BLOODBANK_DELTA_PARQUET_DIR"
+DEFAULT_DELTA_PARQUET_DIR = "RAG/bloodbank_deltas"
+DEFAULT_CSV = "RAG/synthetic_data_blood_bank.csv"
+DEFAULT_PARQUET = "RAG/synthetic_data_blood_bank.parquet"
+DATE_COLUMN = "TRANSFUSION_DT"
+
+AGGREGATES = {
+    "sum": "SUM({c})",
+    "mean": "AVG({c})",
+    "count": "COUNT({c})",
+    "nunique": "COUNT(DISTINCT {c})",
+    "max": "MAX({c})",
+    "min": "MIN({c})",
+    "std": "STDDEV_SAMP({c})",
+    "median": "MEDIAN({c})",
+}
+# what pandas reports for an empty resample bin; the other functions give NaN
+EMPTY_BIN_VALUES = {"sum": 0, "count": 0, "nunique": 0}
+COMPARISONS = {"eq": "=", "neq": "<>", "gt": ">", "lt": "<", "gte": ">=", "lte": "<="}
+# bin labels of pandas resample: the day, the Sunday ending the week, the last day of the month
+PERIODS = {
+    "D": ("date_trunc('day', {c})", "D"),
+    "W": ("date_trunc('week', {c}) + INTERVAL 6 DAY", "W-SUN"),
+    "M": ("CAST(last_day({c}) AS TIMESTAMP)", "ME"),
+}
+
+_connection = None
+_columns: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def parquet_path() -> str:
+    return os.getenv(PARQUET_ENV_VAR, DEFAULT_PARQUET)
+
+
+def delta_parquet_dir() -> str:
+    return os.getenv(DELTA_PARQUET_ENV_VAR, DEFAULT_DELTA_PARQUET_DIR)
+
+
+def _delta_files() -> List[str]:
+    return sorted(glob.glob(os.path.join(delta_parquet_dir(), "*.parquet")))
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _cursor():
+    """A cursor on the shared in-memory database; cursors can be used from one thread each."""
+    global _connection
+    with _lock:
+        if _connection is None:
+            import duckdb  # imported on first query, like the other optional engines
+
+            connection = duckdb.connect()
+            if os.getenv("BLOODBANK_DUCKDB_THREADS"):
+                connection.execute(f"SET threads = {int(os.environ['BLOODBANK_DUCKDB_THREADS'])}")
+            if os.getenv("BLOODBANK_DUCKDB_MEMORY"):
+                connection.execute(f"SET memory_limit = {_literal(os.environ['BLOODBANK_DUCKDB_MEMORY'])}")
+            _create_view(connection)
+            _columns.update({name: dtype for name, dtype, *_ in connection.execute("DESCRIBE blood_bank").fetchall()})
+            _connection = connection
+        return _connection.cursor()
+
+
+def _sources() -> str:
+    """The base Parquet file(s) and the appended deltas, base files first."""
+    files = [parquet_path()] + _delta_files()
+    return "[" + ", ".join(_literal(f) for f in files) + "]"
+
+
+def _create_view(connection) -> None:
+    connection.execute(f"CREATE OR REPLACE VIEW blood_bank AS SELECT * FROM read_parquet({_sources()})")
+
+
+def column_names() -> List[str]:
+    _cursor()
+    return list(_columns)
+
+
+def append_delta(delta: pd.DataFrame, name: str) -> str:
+    """Writes `delta` (with the dataset's columns) as the Parquet file of delta `name`; returns its path."""
+    cursor = _cursor()
+    os.makedirs(delta_parquet_dir(), exist_ok=True)
+    target = os.path.join(delta_parquet_dir(), f"{name}.parquet")
+    # every worker's watcher appends the same deltas: the first one writes the file, the others only
+    # reload the view; the tmp name is per process so concurrent writers never touch each other's file
+    if not os.path.exists(target):
+        tmp = f"{target}.{os.getpid()}.tmp"
+        # cast to the base files' types, so the files read as one table
+        selects = ", ".join(f"CAST({_quote(c)} AS {dtype}) AS {_quote(c)}" for c, dtype in _columns.items())
+        cursor.register("delta_frame", delta)
+        try:
+            cursor.execute(f"COPY (SELECT {selects} FROM delta_frame) TO {_literal(tmp)} (FORMAT PARQUET)")
+        finally:
+            cursor.unregister("delta_frame")
+        os.replace(tmp, target)
+    with _lock:
+        _create_view(_connection)
+    return target
+
+
+def _where(filters: Optional[dict]) -> Tuple[str, List[Any], Optional[str]]:
+    """Translates the tool's filters to a WHERE clause; returns (sql, params, error)."""
+    clauses, params = [], []
+    for column, conditions in (filters or {}).items():
+        if column not in _columns:
+            return "", [], f"Invalid column name in filters: {column}"
+        for op, value in conditions.items():
+            col = _quote(column)
+            try:
+                if column == DATE_COLUMN and isinstance(value, str):
+                    value = pd.to_datetime(value).to_pydatetime()
+            except Exception as e:
+                return "", [], f"Failed to apply filter on column '{column}' with operator '{op}' and value '{value}': {e}"
+            if op in COMPARISONS:
+                clause = f"{col} {COMPARISONS[op]} ?"
+                if op == "neq":
+                    clause = f"({clause} OR {col} IS NULL)" # pandas keeps missing values for !=
+            elif op == "contains":
+                # pandas str.contains: case-insensitive regular expression
+                clause, value = f"regexp_matches(CAST({col} AS VARCHAR), ?, 'i')", str(value)
+            else:
+                return "", [], f"Unsupported operator '{op}' for column '{column}'."
+            clauses.append(clause)
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params, None
+
+
+def _aggregate_sql(aggregations: dict) -> Tuple[str, Dict[str, str]]:
+    """Returns the aggregate expressions and their alias -> column names (a column can also be a group key)."""
+    exprs, aliases = [], {}
+    for i, (column, func) in enumerate(aggregations.items()):
+        if column not in _columns:
+            raise KeyError(f"Column(s) ['{column}'] do not exist")
+        if not isinstance(func, str) or func not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregation '{func}' for column '{column}'")
+        expr = AGGREGATES[func].format(c=_quote(column))
+        if func == "sum" and "INT" in _columns[column]:
+            expr = f"CAST({expr} AS BIGINT)" # SUM widens to HUGEINT; pandas keeps int64
+        aliases[f"__agg{i}"] = column
+        exprs.append(f"{expr} AS __agg{i}")
+    return ", ".join(exprs), aliases
+
+
+def _fill_bins(frame: pd.DataFrame, freq: str, aggregations: dict) -> pd.DataFrame:
+    """Adds the empty bins between the first and last label, as pandas resample does."""
+    frame.index = pd.DatetimeIndex(frame.index).as_unit("ns")
+    full = frame.reindex(pd.date_range(frame.index.min(), frame.index.max(), freq=freq))
+    for column, func in aggregations.items():
+        if func in EMPTY_BIN_VALUES and full[column].isna().any():
+            full[column] = full[column].fillna(EMPTY_BIN_VALUES[func]).astype(frame[column].dtype)
+    return full.rename_axis(DATE_COLUMN)
+
+
+def query_data(filters: dict = None, aggregations: dict = None, group_by: list = None,
+               time_resample_period: str = None) -> dict:
+    cursor = _cursor()
+    where, params, error = _where(filters)
+    if error:
+        return {"error": error}
+
+    try:
+        count = cursor.execute(f"SELECT COUNT(*) FROM blood_bank{where}", params).fetchone()[0]
+    except Exception as e:
+        return {"error": f"Failed to apply filters {filters}: {e}"}
+    if count == 0:
+        return {"result": "No data found for the given criteria."}
+    if not aggregations:
+        return {"result": {"record_count": count}}
+
+    try:
+        selects, aliases = _aggregate_sql(aggregations)
+        group_by = list(group_by or [])
+        for column in group_by:
+            if column not in _columns:
+                raise KeyError(column)
+        keys = [_quote(c) for c in group_by]
+        # pandas groupby drops rows with a missing key
+        key_filter = "".join(f" AND {k} IS NOT NULL" for k in keys)
+        where = where or " WHERE TRUE"
+
+        if time_resample_period:
+            if time_resample_period not in PERIODS:
+                raise ValueError(f"Invalid resample period: {time_resample_period}")
+            label_sql, freq = PERIODS[time_resample_period]
+            label = label_sql.format(c=_quote(DATE_COLUMN))
+            columns = keys + [f"{label} AS {_quote(DATE_COLUMN)}"]
+            frame = cursor.execute(
+                f"SELECT {', '.join(columns)}, {selects} FROM blood_bank{where}{key_filter} "
+                f"GROUP BY ALL ORDER BY ALL", params).df()
+            if group_by:
+                # pandas bins each group from its own first to its last date
+                parts = {key: _fill_bins(part.drop(columns=group_by).set_index(DATE_COLUMN).rename(columns=aliases), freq, aggregations)
+                         for key, part in frame.groupby(group_by if len(group_by) > 1 else group_by[0], sort=True)}
+                agg_result = pd.concat(parts, names=group_by)
+                return {"result": format_grouped_resample(agg_result, group_by, aggregations)}
+            result_df = _fill_bins(frame.set_index(DATE_COLUMN).rename(columns=aliases), freq, aggregations)
+            result_df.index = result_df.index.strftime('%Y-%m-%d')
+            return {"result": result_df.to_dict(orient='index')}
+
+        if group_by:
+            frame = cursor.execute(
+                f"SELECT {', '.join(keys)}, {selects} FROM blood_bank{where}{key_filter} "
+                f"GROUP BY ALL ORDER BY ALL", params).df()
+            result_df = format_group_index(frame.set_index(group_by).rename(columns=aliases))
+            return {"result": result_df.to_dict(orient='index')}
+
+        frame = cursor.execute(f"SELECT {selects} FROM blood_bank{where}", params).df()
+        return {"result": frame.rename(columns=aliases).iloc[0].to_dict()}
+    except Exception as e:
+        return {"error": f"An error occurred during data processing: {str(e)}"}
+
+
+def get_unique_values(column_name: str) -> dict:
+    cursor = _cursor()
+    if column_name not in _columns:
+        return {"error": f"Column '{column_name}' not found in the dataset."}
+    col = _quote(column_name)
+    # in order of first appearance, like pandas unique(); deltas come after the base files
+    delta_prefix = _literal(os.path.join(delta_parquet_dir(), ""))
+    frame = cursor.execute(
+        f"SELECT {col} FROM read_parquet({_sources()}, filename = true, file_row_number = true) "
+        f"WHERE {col} IS NOT NULL GROUP BY {col} "
+        f"ORDER BY MIN(struct_pack(d := starts_with(filename, {delta_prefix}), f := filename, r := file_row_number))").df()
+    return {"result": frame[column_name].tolist()}
+
+
+def dataset_summary() -> Dict[str, Any]:
+    records, first, last = _cursor().execute(
+        f"SELECT COUNT(*), MIN({_quote(DATE_COLUMN)}), MAX({_quote(DATE_COLUMN)}) FROM blood_bank").fetchone()
+    return {"records": records, "first_date": pd.Timestamp(first), "last_date": pd.Timestamp(last)}
+
+
+def export_parquet(csv_path: str = DEFAULT_CSV, parquet_file: Optional[str] = None) -> str:
+    """Converts the CSV extract to Parquet without loading it into memory; returns the output path."""
+    import duckdb
+
+    parquet_file = parquet_file or parquet_path()
+    duckdb.execute(
+        f"COPY (SELECT * REPLACE (CAST({_quote(DATE_COLUMN)} AS TIMESTAMP) AS {_quote(DATE_COLUMN)}) "
+        f"FROM read_csv_auto({_literal(csv_path)})) TO {_literal(parquet_file)} (FORMAT PARQUET)")
+    return parquet_file
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert the blood bank CSV to Parquet for the DuckDB engine.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--out", default=None, help=f"output file (default: ${PARQUET_ENV_VAR} or {DEFAULT_PARQUET})")
+    args = parser.parse_args()
+    print(f"Wrote {export_parquet(args.csv, args.out)}")
@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
-from bert_score import score as bert_score_score
+from genai_common.scoring import score_pairs
 
 # import run_conversation from conversation_manager for evaluation
-from conversation_manager import run_conversation
+from conversation_manager import run_conversation, API_ERROR_MESSAGE
 
 # define test cases for BERTScore (Natural Language Response) Evaluation
 TEST_CASES = [
@@ -50,58 +50,46 @@ TEST_CASES = [
 ]
 
 # function to run BERTScore evaluation
-def evaluate_bert_score():
+def evaluate_bert_score(rescale: bool = False):
     st.subheader("Model Natural Language Response (BERTScore) Evaluation Results")
     st.info("Note: Expected responses are based on the provided `synthetic_data_blood_bank.csv` and may vary if the data changes.")
     
-    bert_scores = []
     total_questions = len(TEST_CASES)
 
     progress_bar = st.progress(0)
     status_text = st.empty()
 
+    # get the actual generated responses from the full conversation flow
+    generated_responses = []
     for i, test_case in enumerate(TEST_CASES):
         question = test_case["question"]
-        expected_response = test_case["expected_response"]
-
         status_text.text(f"Evaluating LLM Response: '{question}' ({i+1}/{total_questions})")
-        
-        # get the actual generated response from the full conversation flow
-        generated_response = run_conversation(question)
-        
-        if generated_response and generated_response != "Sorry, I encountered an error while trying to connect to the AI service.":
-            if not generated_response.strip():
-                gen_res_list = ["<EMPTY_RESPONSE>"]
-            else:
-                gen_res_list = [generated_response]
-            
-            if not expected_response.strip():
-                exp_res_list = ["<EMPTY_EXPECTED>"]
-            else:
-                exp_res_list = [expected_response]
-
-            P, R, F1 = bert_score_score(gen_res_list, exp_res_list, lang="en", verbose=False)
-            
-            bert_scores.append({
-                "Question": question,
-                "Generated Response": generated_response,
-                "Expected Response": expected_response,
-                "BERTScore Precision": P.mean().item(),
-                "BERTScore Recall": R.mean().item(),
-                "BERTScore F1": F1.mean().item()
-            })
-        else:
-            bert_scores.append({
-                "Question": question,
-                "Generated Response": generated_response or "No response/Error during generation",
-                "Expected Response": expected_response,
-                "BERTScore Precision": 0.0,
-                "BERTScore Recall": 0.0,
-                "BERTScore F1": 0.0
-            })
-        
+        # each test case is asked on its own, not as a follow-up of the chat or of earlier cases
+        generated_responses.append(run_conversation(question, history=[], tool_log={}))
         progress_bar.progress((i + 1) / total_questions)
 
+    # score every successful response in a single batched BERTScore call
+    scored = [i for i, r in enumerate(generated_responses) if r and r != API_ERROR_MESSAGE]
+    status_text.text(f"Scoring {len(scored)} responses with BERTScore...")
+    pair_scores = score_pairs(
+        [generated_responses[i].strip() or "<EMPTY_RESPONSE>" for i in scored],
+        [TEST_CASES[i]["expected_response"].strip() or "<EMPTY_EXPECTED>" for i in scored],
+        rescale_with_baseline=rescale,
+    )
+    scores = dict(zip(scored, pair_scores))
+
+    bert_scores = []
+    for i, test_case in enumerate(TEST_CASES):
+        precision, recall, f1 = scores.get(i, (0.0, 0.0, 0.0))
+        bert_scores.append({
+            "Question": test_case["question"],
+            "Generated Response": generated_responses[i] or "No response/Error during generation",
+            "Expected Response": test_case["expected_response"],
+            "BERTScore Precision": precision,
+            "BERTScore Recall": recall,
+            "BERTScore F1": f1
+        })
+
     status_text.empty()
     st.markdown("---")
     st.subheader("BERTScore Summary")
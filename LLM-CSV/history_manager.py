@@ -0,0 +1,99 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+# how many of the most recent question/answer pairs are resent verbatim
+KEEP_RECENT_TURNS = 4
+# rough upper bound on the tokens spent on past turns (system prompt excluded)
+HISTORY_TOKEN_BUDGET = 1500
+# how much of an older answer is kept in the compact summary
+SUMMARY_ANSWER_CHARS = 160
+
+PENDING_RESPONSE = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token) used to enforce the history budget.
+    """
+    return len(text) // 4 + 1
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
+
+
+def format_tool_call(name: str, args: Dict) -> str:
+    """
+    Renders a tool call as a single line, e.g. `query_data(filters={...}, aggregations={...})`.
+    """
+    rendered_args = ", ".join(f"{k}={json.dumps(v, sort_keys=True, default=str)}" for k, v in args.items())
+    return f"{name}({rendered_args})"
+
+
+def turn_index(history: List[Tuple[str, str]], query: str) -> int:
+    """
+    Index of the turn answering `query` in `history`, the key of its tool calls in the tool log:
+    the pending last turn when the caller has already added it, otherwise the next one.
+    """
+    if history and history[-1][0] == query and history[-1][1] == PENDING_RESPONSE:
+        return len(history) - 1
+    return len(history)
+
+
+def summarize_turns(turns: List[Tuple[int, str, str]], tool_log: Optional[Dict[int, List[str]]] = None) -> List[str]:
+    """
+    Builds one compact line per older (turn index, query, response) turn with the question, the
+    tool calls (filters) used and a shortened answer.
+    """
+    tool_log = tool_log or {}
+    lines = []
+    for index, query, response in turns:
+        line = f"- Q: {_shorten(query, SUMMARY_ANSWER_CHARS)}"
+        calls = tool_log.get(index)
+        if calls:
+            line += f" | tools: {'; '.join(calls)}"
+        line += f" | A: {_shorten(response, SUMMARY_ANSWER_CHARS)}"
+        lines.append(line)
+    return lines
+
+
+def build_history_messages(
+    history: List[Tuple[str, str]],
+    tool_log: Optional[Dict[int, List[str]]] = None,
+    keep_recent: int = KEEP_RECENT_TURNS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+) -> List[Dict]:
+    """
+    Turns the (query, response) conversation history into chat messages that fit the token budget.
+    The last `keep_recent` answered turns are kept verbatim, older turns are folded into a single
+    summary message, and the oldest summary lines are dropped first when the budget is exceeded.
+    `tool_log` maps turn indices in `history` to the tool calls of that turn.
+    """
+    answered = [(i, q, r) for i, (q, r) in enumerate(history) if r != PENDING_RESPONSE]
+
+    # keep recent turns verbatim, newest first, as long as they fit in the budget
+    recent: List[Tuple[int, str, str]] = []
+    used = 0
+    for turn in reversed(answered[-keep_recent:] if keep_recent > 0 else []):
+        cost = estimate_tokens(turn[1]) + estimate_tokens(turn[2])
+        if recent and used + cost > token_budget:
+            break
+        recent.insert(0, turn)
+        used += cost
+
+    older = answered[: len(answered) - len(recent)]
+    summary_lines = summarize_turns(older, tool_log)
+
+    # drop the oldest summary lines until the summary fits in what is left of the budget
+    header = "Summary of earlier questions in this session (tool calls and results):"
+    while summary_lines and used + estimate_tokens("\n".join([header] + summary_lines)) > token_budget:
+        summary_lines.pop(0)
+
+    messages: List[Dict] = []
+    if summary_lines:
+        messages.append({"role": "system", "content": "\n".join([header] + summary_lines)})
+    for _, query, response in recent:
+        messages.append({"role": "user", "content": query})
+        messages.append({"role": "assistant", "content": response})
+    return messages
@@ -1,8 +1,22 @@
-from fireworks.client import Fireworks
 from data_handler import query_data, get_unique_values 
 import os
 from dotenv import load_dotenv
-from fireworks.client import Fireworks
+from genai_common.llm_client import get_client
+from genai_common.cassette import replay_enabled as cassette_replay_enabled
+from genai_common.hedging import LatencyPolicy
+
+MODEL_NAME = "accounts/fireworks/models/qwen3-30b-a3b"
+
+# hedge a slow completion after 4s and fall back to a faster model after 10s;
+# override with BLOODBANK_HEDGE_AFTER_S, BLOODBANK_BUDGET_S, BLOODBANK_FALLBACK_MODELS, BLOODBANK_FALLBACK_BUDGET_S
+latency_policy = LatencyPolicy.from_env(
+    "BLOODBANK",
+    primary_model=MODEL_NAME,
+    fallback_models=["accounts/fireworks/models/llama4-scout-instruct-basic"],
+    budget_s=10.0,
+    hedge_after_s=4.0,
+    fallback_budget_s=20.0,
+)
 
 # system prompt for LLM 
 system_prompt_parts = [
@@ -79,6 +93,8 @@ system_prompt_parts = [
         """
 ]
 
+# built once at import so every request starts with byte-identical system prompt and tool schemas,
+# which lets the provider reuse its cached prefix; anything that varies per request goes after it
 system_prompt = "\n".join(system_prompt_parts)
 
 # tools definition
@@ -149,11 +165,13 @@ available_functions = {
 # load environment variables from .env 
 load_dotenv() 
 
-your_fireworks_api_key = os.getenv("FIREWORKS_API_KEY")
-if not your_fireworks_api_key:
-    raise ValueError("Fireworks API key (FIREWORKS_API_KEY) not found in environment variables or .env file.")
-else:
-    print("Fireworks API key loaded successfully.")
 
-# Initialize Fireworks client
-client = Fireworks(api_key=your_fireworks_api_key)
\ No newline at end of file
+def get_llm_client():
+    """
+    The shared pooled client with timeouts, retries and a circuit breaker, created on first use
+    (FIREWORKS_BASE_URL points it at a local mock/stub server).
+    """
+    # replaying recorded completions (LLM_CASSETTE_MODE=replay) works offline without a key
+    if not os.getenv("FIREWORKS_API_KEY") and not cassette_replay_enabled():
+        raise ValueError("Fireworks API key (FIREWORKS_API_KEY) not found in environment variables or .env file.")
+    return get_client()
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""Result formatting shared by the pandas (`data_handler`) and DuckDB (`duckdb_engine`) query engines."""
+import pandas as pd
+
+
+def format_group_index(result_df: pd.DataFrame) -> pd.DataFrame:
+    """Turns MultiIndex tuples of a grouped result into strings, so the keys survive JSON encoding."""
+    if isinstance(result_df.index, pd.MultiIndex):
+        # convert MultiIndex tuples to a readable string format
+        result_df.index = result_df.index.map(lambda x: str(x) if isinstance(x, tuple) else x)
+    return result_df
+
+
+def format_grouped_resample(agg_result: pd.DataFrame, group_by: list, aggregations: dict) -> dict:
+    """Flattens a (group_by..., date) indexed result into {"<group values> - <date>": {column: value}}."""
+    formatted_results = {}
+    for index, row_data in agg_result.iterrows():
+        category_value = index[:-1] if len(group_by) > 1 else index[0] # handle single or multiple group_by columns
+        date_str = index[-1].strftime('%Y-%m-%d')
+
+        # create a unique key for the dictionary based on group_by values and date
+        key_parts = [str(cv) for cv in category_value] if isinstance(category_value, tuple) else [str(category_value)]
+        formatted_key = f"{' - '.join(key_parts)} - {date_str}"
+
+        # ensure row_data is a dictionary
+        if isinstance(row_data, pd.Series):
+            formatted_results[formatted_key] = row_data.to_dict()
+        else: # for single aggregation, row_data might be a scalar
+            agg_col, agg_func = list(aggregations.items())[0]
+            formatted_results[formatted_key] = {f"{agg_col}_{agg_func}": row_data}
+    return formatted_results
@@ -0,0 +1,136 @@
+"""
+Blood bank dataset shared by all worker processes of a host, enabled with BLOODBANK_SHARED_DATASET=1.
+
+The first worker to start parses the CSV and publishes the typed columns as one uncompressed Arrow
+IPC file (BLOODBANK_ARROW_FILE, default RAG/synthetic_data_blood_bank.arrow). Every worker then
+memory-maps that file and wraps the column buffers in a DataFrame without copying them: numeric and
+date columns become read-only NumPy views, text columns Arrow-backed strings. The pages live once
+in the OS page cache however many workers attach, so a worker's own memory holds only what its
+queries allocate.
+
+The file records the CSV it was built from (absolute path, size and modification time) in its
+schema metadata, and is published again when that no longer matches the CSV, e.g. a file left by
+a run over another extract. It is replaced atomically, so workers that mapped the previous file
+keep reading it until they restart.
+
+Appended deltas are shared the same way. The first worker to append a delta publishes the dataset
+with it as a new file, named after the deltas it holds and tagged with their names, and every
+worker appending the same deltas in the same order attaches that file instead of concatenating a
+private copy (see `extend`). Files of shorter delta lists are removed once a longer one exists.
+"""
+import os
+import glob
+import json
+import hashlib
+from typing import Callable, List, Optional, Sequence
+
+import pandas as pd
+
+ARROW_ENV_VAR = "BLOODBANK_ARROW_FILE"
+DEFAULT_ARROW_FILE = "RAG/synthetic_data_blood_bank.arrow"
+SOURCE_METADATA_KEY = b"bloodbank.source"
+
+
+def arrow_path(deltas: Sequence[str] = ()) -> str:
+    """The published file of the dataset with `deltas` appended; the base file when there are none."""
+    path = os.getenv(ARROW_ENV_VAR, DEFAULT_ARROW_FILE)
+    if not deltas:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha1(chr(0).join(deltas).encode()).hexdigest()[:16]}{ext}"
+
+
+def source_fingerprint(source_path: str, deltas: Sequence[str] = ()) -> dict:
+    """What identifies the data of a published file: the CSV it was built from and the deltas appended since."""
+    stat = os.stat(source_path)
+    return {"path": os.path.abspath(source_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "deltas": list(deltas)}
+
+
+def published_source(path: str) -> Optional[dict]:
+    """The source fingerprint stored in the published file, or None when there is no readable file."""
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    return json.loads(metadata[SOURCE_METADATA_KEY]) if SOURCE_METADATA_KEY in metadata else None
+
+
+def publish(frame: pd.DataFrame, path: str, source: dict) -> str:
+    """Writes `frame` as an Arrow IPC file with a single record batch, tagged with `source`; returns the path."""
+    import pyarrow as pa
+
+    # one chunk per column: several chunks would be concatenated (copied) when converting to pandas
+    table = pa.Table.from_pandas(frame, preserve_index=False).combine_chunks()
+    # keeps the pandas metadata from_pandas added, which restores the dtypes on attach
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCE_METADATA_KEY: json.dumps(source).encode()})
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    os.replace(tmp, path)
+    return path
+
+
+def attach(path: str) -> pd.DataFrame:
+    """Maps the published file and returns a DataFrame over its buffers."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # split_blocks keeps each column in its own block, so no column is copied to consolidate them
+    return table.to_pandas(split_blocks=True)
+
+
+def is_current(path: str, source_path: str) -> bool:
+    return published_source(path) == source_fingerprint(source_path)
+
+
+def load(source: dict, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Attaches to the published dataset, publishing it first from `loader()` when it is missing or
+    was built from another version of the CSV (`source`, from `source_fingerprint`). Workers
+    starting together may each publish; the last write wins.
+    """
+    path = arrow_path()
+    if published_source(path) != source:
+        publish(loader(), path, source)
+        print(f"Published the blood bank dataset to {path} for the worker processes.")
+    return attach(path)
+
+
+def extend(frame: pd.DataFrame, delta: pd.DataFrame, source: dict, deltas: List[str]) -> pd.DataFrame:
+    """
+    The attached dataset with `delta` appended. `frame` holds the dataset of `source` with all but
+    the last of `deltas` applied, and `delta` the rows of the last one, typed like `frame`. The
+    combined frame is only built by the worker that publishes it.
+    """
+    expected = {**source, "deltas": list(deltas)}
+    path = arrow_path(deltas)
+    try:
+        if published_source(path) == expected:
+            return attach(path)
+    except FileNotFoundError:
+        pass # removed by a worker that has appended further deltas since
+    publish(pd.concat([frame, delta], ignore_index=True), path, expected)
+    _remove_superseded(expected)
+    return attach(path)
+
+
+def _remove_superseded(current: dict) -> None:
+    """Deletes delta files built from another CSV or holding a prefix of `current`'s deltas."""
+    root, ext = os.path.splitext(arrow_path())
+    for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+        published = published_source(path)
+        if published is None or path == arrow_path(current["deltas"]):
+            continue
+        deltas = published.pop("deltas", [])
+        base = {k: v for k, v in current.items() if k != "deltas"}
+        if published != base or deltas == current["deltas"][:len(deltas)]:
+            # workers that mapped it keep reading it; one still needing it publishes it again
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -4,10 +4,13 @@ import os
 from pathlib import Path
 
 from functools import partial
-from src.llm import generate_answer
+from src.llm import generate_answer, API_ERROR_MESSAGE
 from src.vector_store import VectorStore
 from src.constants import TEST_QUESTIONS_PER_PDF, CHUNK_RECORDS_FILE
-from src.evaluation import evaluate_bert_score_rag
+from genai_common import metrics
+from genai_common.tracing import trace
+from genai_common.streamlit_panels import render_timing_panel
+from genai_common.api_client import api_url, ask_pdf
 
 st.set_page_config(
     page_title="LLM chat assistant KFSHRC",
@@ -18,6 +21,9 @@ st.set_page_config(
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
 
+# expose Prometheus metrics when METRICS_PORT is set (started once per process)
+metrics.start_from_env()
+
 # --- Data Loading and Caching (for the CSV file) ---
 @st.cache_data
 def load_data():
@@ -30,8 +36,13 @@ def load_data():
     df['TRANSFUSION_DT'] = pd.to_datetime(df['TRANSFUSION_DT'])
     return df
 
+@st.cache_resource
+def load_vector_store():
+    # one store per server process instead of one per rerun; the embedding model loads on the first query
+    return VectorStore(st=st)
+
 df = load_data()
-vs = VectorStore(st=st)
+vs = load_vector_store()
 
 def main():
     st.title("LLM chat assistant KFSHRC") 
@@ -44,12 +55,14 @@ def main():
         st.error(f"Chunk records file not found at {CHUNK_RECORDS_FILE}. Please run your `parse_ingest.py` script first to process your PDFs.")
         return
 
-    if not st.session_state.vector_store_built or vs.collection.count() == 0:
-        with st.spinner("Building/Loading vector store (first run can take a few minutes)..."):
-            vs.ingest_from_jsonl()
+    if not st.session_state.vector_store_built:
+        # an existing index is reused; only an empty one is built from the chunk records
+        if vs.count() == 0:
+            with st.spinner("Building vector store (first run can take a few minutes)..."):
+                vs.ingest_from_jsonl()
         st.session_state.vector_store_built = True
-        if vs.collection.count() > 0:
-            st.success(f"Vector store built/loaded successfully with {vs.collection.count()} chunks!")
+        if vs.count() > 0:
+            st.success(f"Vector store built/loaded successfully with {vs.count()} chunks!")
         else:
             st.error("Vector store is empty. Please ensure `chunks.jsonl` has content and `parse_ingest.py` ran successfully.")
 
@@ -69,6 +82,8 @@ def main():
     with chat_tab:
         st.subheader("Chat with Your Document Assistant")
         selected_pdf_for_chat = st.selectbox("Select a PDF to ask questions about", pdf_files, key="chat_pdf_select")
+        show_timings = st.checkbox("Show timing breakdown", value=False, key="show_timings",
+                                   help="Per-stage timings (embedding, vector search, images, LLM call) for the last answer.")
 
         # display conversation history
         for query, response in st.session_state.conversation_history:
@@ -89,8 +104,20 @@ def main():
             with st.chat_message("assistant"):
                 with st.spinner("Retrieving context & generating answer..."):
 
-                    contexts = vs.query(query_to_process, k=15, source_pdf=selected_pdf_for_chat)
-                    answer = generate_answer(query_to_process, contexts)
+                    if api_url():
+                        # answered by the shared API workers (KFSHRC_API_URL) instead of this process
+                        try:
+                            result = ask_pdf(query_to_process, selected_pdf_for_chat, k=15)
+                            contexts, answer = result["contexts"], result["answer"]
+                            st.session_state.last_timing = result["timing"]
+                        except Exception as e:
+                            print(f"API request failed: {e}")
+                            contexts, answer = [], API_ERROR_MESSAGE
+                    else:
+                        with trace("pdf.ask") as request_trace:
+                            contexts = vs.query(query_to_process, k=15, source_pdf=selected_pdf_for_chat)
+                            answer = generate_answer(query_to_process, contexts)
+                        st.session_state.last_timing = request_trace.to_dict()
                     
                     if contexts:
                         st.markdown("---")
@@ -105,6 +132,9 @@ def main():
                 st.session_state.conversation_history[-1] = (query_to_process, answer)
                 st.rerun() # rerun to display assistant's full answer
 
+        if show_timings:
+            render_timing_panel(st, st.session_state.get("last_timing"))
+
         # quick Questions to Try
         st.markdown("---")
         with st.expander("Quick Questions to Try"):
@@ -146,10 +176,15 @@ def main():
             help="Choose a PDF whose pre-defined test questions you want to evaluate."
         )
 
+        rescale = st.checkbox("Rescale BERTScore with baseline", value=False, key="eval_rescale",
+                              help="Spreads scores over a more readable range; does not change the ranking.")
+
         st.markdown("---")
         if st.button(f"Run BERTScore Evaluation for '{selected_pdf_for_eval}'", type="primary", use_container_width=True):
             if selected_pdf_for_eval:
-                evaluate_bert_score_rag(st, vs, selected_pdf_for_eval)
+                # imported on demand: the evaluation stack is only needed when an evaluation runs
+                from src.evaluation import evaluate_bert_score_rag
+                evaluate_bert_score_rag(st, vs, selected_pdf_for_eval, rescale=rescale)
             else:
                 st.warning("Please select a PDF to run the evaluation.")
         
@@ -1,2 +1,7 @@
-# initialize llm
-from .llm import generate_answer
\ No newline at end of file
+import sys
+from pathlib import Path
+
+# make the repo-level `genai_common` package importable from the app and the ingest scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# submodules are not imported here: the LLM client, torch and chromadb load on first use
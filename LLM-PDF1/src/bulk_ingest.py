@@ -0,0 +1,175 @@
+"""
+Bulk (re-)indexing of the chunk records with a multi-process encode pool.
+
+Usage (from the repository root):
+    PYTHONPATH=LLM-PDF1 python -m src.bulk_ingest --workers 8 --rebuild
+
+`VectorStore.ingest_from_jsonl` embeds fixed batches of 64 on one process and writes each batch
+before encoding the next. Here records are read in windows, sorted by text length and cut into
+batches under a padded-character budget (many short chunks or a few long ones per call), and the
+batches are encoded by one worker process per core. Finished batches go to a single writer thread
+that adds them to the index in larger writes while the pool keeps encoding.
+"""
+import os
+import time
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.constants import CHUNK_RECORDS_FILE
+from src.chunk_io import ReadReport, iter_chunk_records
+from src.chunk_store import ChunkRecord
+from src.embeddings import default_backend
+
+WINDOW_SIZE = 8192 # records sorted together; bounds memory for very large record files
+BATCH_CHAR_BUDGET = 32_000 # padded characters per encode call (longest text x batch size)
+MAX_BATCH_SIZE = 256
+WRITE_BATCH_SIZE = 1024 # documents per index add
+MAX_PENDING_WRITES = 4
+
+# per worker process, loaded by `_init_worker`
+_embedder = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int) -> None:
+    # keep workers from oversubscribing the cores: each gets its share of the intra-op threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    global _embedder
+    from src.embeddings import Embedder
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _embedder = Embedder(model_name, backend)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    # float32 rows pickle as one buffer; Python lists of floats would be several times larger
+    return _embedder.encode(texts, batch_size=len(texts))
+
+
+def read_windows(jsonl_path: Path, window_size: int = WINDOW_SIZE,
+                 report: Optional[ReadReport] = None) -> Iterator[List[ChunkRecord]]:
+    window: List[ChunkRecord] = []
+    for record in iter_chunk_records(jsonl_path, report):
+        window.append(ChunkRecord.from_dict(record))
+        if len(window) >= window_size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def length_batches(records: List[ChunkRecord], char_budget: int = BATCH_CHAR_BUDGET,
+                   max_batch_size: int = MAX_BATCH_SIZE) -> List[List[ChunkRecord]]:
+    """Sorts records by text length and groups them so that longest text x batch size stays under the budget."""
+    batches: List[List[ChunkRecord]] = []
+    current: List[ChunkRecord] = []
+    for record in sorted(records, key=lambda r: len(r.text)):
+        # sorted ascending, so this record is the longest (padded) one in the batch
+        padded = (len(current) + 1) * max(1, len(record.text))
+        if current and (padded > char_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(record)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def bulk_ingest(vs, jsonl_path: Path = CHUNK_RECORDS_FILE, workers: Optional[int] = None, rebuild: bool = False,
+                char_budget: int = BATCH_CHAR_BUDGET) -> Dict[str, float]:
+    """Embeds every record of `jsonl_path` with a process pool and writes them to `vs`; returns timing stats."""
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if rebuild:
+        vs.reset()
+
+    start = time.perf_counter()
+    total = 0
+    report = ReadReport()
+    pending_docs: List[ChunkRecord] = []
+    pending_embeddings: List[np.ndarray] = [] # one row per pending doc
+    writes: List[Future] = []
+
+    # spawn: forking a process that already loaded torch can deadlock its thread pools;
+    # the configured names, not `vs.embedder`, which would load the model in this process too
+    pool = ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn"), initializer=_init_worker,
+                               initargs=(vs.model_name, vs.embedding_backend or default_backend(), threads))
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer")
+    in_flight: Dict[Future, List[ChunkRecord]] = {}
+
+    def flush(force: bool = False) -> None:
+        nonlocal pending_docs, pending_embeddings
+        while len(pending_docs) >= WRITE_BATCH_SIZE or (force and pending_docs):
+            docs, embeddings = pending_docs[:WRITE_BATCH_SIZE], pending_embeddings[:WRITE_BATCH_SIZE]
+            pending_docs, pending_embeddings = pending_docs[WRITE_BATCH_SIZE:], pending_embeddings[WRITE_BATCH_SIZE:]
+            # backpressure: do not let encoded batches pile up faster than Chroma can take them
+            unfinished = [w for w in writes if not w.done()]
+            if len(unfinished) >= MAX_PENDING_WRITES:
+                wait(unfinished, return_when=FIRST_COMPLETED)
+            writes.append(writer.submit(vs.add_embedded, docs, np.stack(embeddings)))
+
+    def collect(return_when: str) -> None:
+        nonlocal total
+        done, _ = wait(list(in_flight), return_when=return_when)
+        for future in done:
+            batch = in_flight.pop(future)
+            pending_docs.extend(batch)
+            pending_embeddings.extend(future.result())
+            total += len(batch)
+        flush()
+
+    try:
+        for window in read_windows(jsonl_path, report=report):
+            for batch in length_batches(window, char_budget):
+                if len(in_flight) >= workers * 2:
+                    collect(FIRST_COMPLETED)
+                in_flight[pool.submit(_encode, [r.text for r in batch])] = batch
+            print(f"Encoded {total} chunks so far ({time.perf_counter() - start:.1f}s)")
+        while in_flight:
+            collect(FIRST_COMPLETED)
+        flush(force=True)
+        for w in writes:
+            w.result()  # surfaces write errors
+        vs.flush()
+    finally:
+        pool.shutdown(cancel_futures=True)
+        writer.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f"Read {jsonl_path}: {report.summary()}")
+    return {"chunks": total, "skipped": report.skipped, "seconds": elapsed,
+            "chunks_per_s": total / elapsed if elapsed else 0.0, "workers": workers}
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Embed and index data/chunks.jsonl with all CPU cores.")
+    parser.add_argument("--workers", type=int, default=None, help="encode processes (default: one per core)")
+    parser.add_argument("--rebuild", action="store_true", help="drop the index first, e.g. after a model change")
+    parser.add_argument("--char-budget", type=int, default=BATCH_CHAR_BUDGET)
+    parser.add_argument("--shards-only", action="store_true",
+                        help="only rebuild the per-PDF shards from the existing collection (no re-embedding)")
+    parser.add_argument("--hierarchy-only", action="store_true",
+                        help="only recompute the page and document vectors from the existing index (no re-embedding)")
+    args = parser.parse_args()
+
+    if args.shards_only:
+        copied = VectorStore(shard_by_pdf=True).rebuild_shards()
+        print(f"Copied {copied} chunks into per-PDF shards.")
+    elif args.hierarchy_only:
+        pages = VectorStore().rebuild_hierarchy()
+        print(f"Built vectors for {pages} pages.")
+    else:
+        if not CHUNK_RECORDS_FILE.exists():
+            raise SystemExit(f"{CHUNK_RECORDS_FILE} not found; run `parse_ingest.py` first.")
+        stats = bulk_ingest(VectorStore(), workers=args.workers, rebuild=args.rebuild, char_budget=args.char_budget)
+        print(f"Indexed {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+              f"({stats['chunks_per_s']:.1f} chunks/s, {stats['workers']} workers)")
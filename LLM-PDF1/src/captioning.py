@@ -0,0 +1,260 @@
+"""
+Ingest-time text descriptions for figure and table chunks.
+
+The layout parser gives image chunks only their alt text (usually none, so "(image)"), which makes
+figures nearly impossible to retrieve, and `generate_answer` used to attach every retrieved image
+to the vision model. `caption_records` runs once per PDF at ingest (after deduplication) and
+replaces the text of each image chunk, and prefixes the text of each table chunk, with a
+description from a captioner. The chunk gets `captioned_by`, so query time knows the text stands in
+for the image (see `src.llm.build_answer_messages`) and a second run skips it.
+
+Captioners, selected with PDF_CAPTIONER:
+
+    local  no model: the figure/table caption printed on the same page ("Figure 3: ..."), nearest
+           to the chunk when there are several, else the alt text and the page's section heading
+    vlm    the vision model describes each image (PDF_CAPTION_MODEL, default the answer model),
+           PDF_CAPTION_CONCURRENCY (default 4) calls at a time; the local caption is given as a hint and used
+           when a call fails
+    off    no captioning
+
+Any object with a `name` and `caption_batch(records, hints) -> captions` can be passed instead.
+
+Usage on an existing records file (from the repository root):
+    PYTHONPATH=LLM-PDF1 python -m src.captioning --captioner vlm
+"""
+import os
+import re
+import base64
+import asyncio
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+CAPTIONER_ENV_VAR = "PDF_CAPTIONER"
+CAPTIONERS = ("local", "vlm", "off")
+CAPTION_MODEL_ENV_VAR = "PDF_CAPTION_MODEL"
+# image requests are much larger than evaluation questions, so fewer run at once by default
+CAPTION_CONCURRENCY = int(os.getenv("PDF_CAPTION_CONCURRENCY", "4"))
+MAX_CAPTION_CHARS = 600
+PLACEHOLDER_TEXT = "(image)" # what parse_ingest stores for an image without alt text
+FIGURE_PREFIX = "[Figure, page {page}] "
+TABLE_PREFIX = "[Table, page {page}] "
+
+# "Figure 3:", "Fig. 2.", "Table 1 -", "Chart 4" at the start of a line
+_CAPTION_LINE_RE = re.compile(r"^\s*(?:#+\s*)?((?:fig(?:ure)?\.?|table|chart|diagram|exhibit)\s*\d+[a-z]?\b.*)$",
+                              re.IGNORECASE | re.MULTILINE)
+
+CAPTION_PROMPT = (
+    "Describe this figure from a scientific paper so it can be found by text search: what kind of "
+    "figure it is, what it shows, axis labels and units, and the key numbers or trends. "
+    "Answer in at most 4 sentences of plain text."
+)
+
+
+@dataclass
+class CaptionStats:
+    figures: int = 0
+    tables: int = 0
+    skipped: int = 0 # captioned in an earlier run
+    fallbacks: int = 0 # captioner failed, local caption used
+
+    def summary(self) -> str:
+        return (f"{self.figures} figures and {self.tables} tables captioned, "
+                f"{self.skipped} already captioned, {self.fallbacks} fell back to the local caption")
+
+
+def is_table(record: Dict[str, Any]) -> bool:
+    return "table" in (record.get("type") or "").lower()
+
+
+def needs_caption(record: Dict[str, Any]) -> bool:
+    return bool(record.get("image_path")) or is_table(record)
+
+
+def _vertical_distance(a: Optional[list], b: Optional[list]) -> float:
+    if not a or not b or len(a) < 4 or len(b) < 4:
+        return 0.0
+    return max(0.0, float(b[1]) - float(a[3]), float(a[1]) - float(b[3]))
+
+
+def local_caption(record: Dict[str, Any], page_records: List[Dict[str, Any]]) -> str:
+    """Caption from the page's own text: the nearest printed caption of the same kind, else alt text and heading."""
+    candidates = []
+    for other in page_records:
+        if other is record or other.get("image_path"):
+            continue
+        for match in _CAPTION_LINE_RE.finditer(other.get("text") or ""):
+            caption = match.group(1).strip()
+            # only captions of the same kind: "Table 2" never describes a figure, nor "Figure 3" a table
+            if caption.lower().startswith("table") == is_table(record):
+                candidates.append((_vertical_distance(record.get("bbox"), other.get("bbox")), caption))
+    candidates.sort(key=lambda c: c[0])
+    parts = [candidates[0][1]] if candidates else []
+
+    alt_text = (record.get("text") or "").strip()
+    if record.get("image_path") and alt_text and alt_text != PLACEHOLDER_TEXT and alt_text not in parts:
+        parts.append(alt_text)
+    if not parts:
+        headings = [(o.get("text") or "").lstrip("#").strip() for o in page_records if (o.get("text") or "").startswith("#")]
+        kind = "Table" if is_table(record) else "Figure"
+        parts.append(f"{kind} in section '{headings[0]}'" if headings else kind)
+    return " ".join(parts)[:MAX_CAPTION_CHARS]
+
+
+class LocalCaptioner:
+    """Uses the hints (the local captions) as they are; no model, no network."""
+
+    name = "local"
+
+    def caption_batch(self, records: List[Dict[str, Any]], hints: List[str]) -> List[Optional[str]]:
+        return list(hints)
+
+
+class VisionCaptioner:
+    """Describes each image with the vision model; tables and failed calls keep their local caption."""
+
+    name = "vlm"
+
+    def __init__(self, model: Optional[str] = None, concurrency: int = CAPTION_CONCURRENCY) -> None:
+        from src.llm import MODEL_NAME
+
+        self.model = model or os.getenv(CAPTION_MODEL_ENV_VAR, MODEL_NAME)
+        self.concurrency = concurrency
+
+    async def _describe(self, client, record: Dict[str, Any], hint: str) -> Optional[str]:
+        from genai_common.prompt_metrics import atimed_completion
+        from src.llm import strip_model_thoughts
+
+        image_path = Path(record["image_path"])
+        suffix = image_path.suffix.lstrip(".").lower().replace("jpg", "jpeg") or "png"
+        with open(image_path, "rb") as f:
+            image = base64.b64encode(f.read()).decode("utf-8")
+        response = await atimed_completion(
+            client,
+            "pdf.caption",
+            model=self.model,
+            messages=[{"role": "user", "content": [
+                {"type": "text", "text": f"{CAPTION_PROMPT}\nText printed near the figure: {hint}"},
+                {"type": "image_url", "image_url": {"url": f"data:image/{suffix};base64,{image}"}},
+            ]}],
+            max_tokens=256,
+            temperature=0.0,
+        )
+        text = strip_model_thoughts(response["choices"][0]["message"]["content"])
+        return text[:MAX_CAPTION_CHARS] if text else None
+
+    async def acaption_batch(self, records: List[Dict[str, Any]], hints: List[str]) -> List[Optional[str]]:
+        from src.llm import get_llm
+
+        client = get_llm()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def caption(record: Dict[str, Any], hint: str) -> Optional[str]:
+            if not record.get("image_path") or not Path(record["image_path"]).is_file():
+                return hint
+            async with semaphore:
+                try:
+                    described = await self._describe(client, record, hint)
+                except Exception as e:
+                    print(f"Captioning {record['image_path']} failed: {e}")
+                    return None
+            # the printed caption names the figure ("Figure 3"), which questions refer to
+            return f"{hint.rstrip('. ')}. {described}" if described and hint else described
+
+        return await asyncio.gather(*(caption(r, h) for r, h in zip(records, hints)))
+
+    def caption_batch(self, records: List[Dict[str, Any]], hints: List[str]) -> List[Optional[str]]:
+        return asyncio.run(self.acaption_batch(records, hints))
+
+
+def get_captioner(name: Optional[str] = None):
+    """The captioner named `name` (default PDF_CAPTIONER, "local"), or None for "off"."""
+    name = (name or os.getenv(CAPTIONER_ENV_VAR, "local")).lower()
+    if name == "local":
+        return LocalCaptioner()
+    if name == "vlm":
+        return VisionCaptioner()
+    if name == "off":
+        return None
+    raise ValueError(f"Unknown captioner '{name}', expected one of {list(CAPTIONERS)}.")
+
+
+def caption_records(records: List[Dict[str, Any]], captioner, stats: Optional[CaptionStats] = None,
+                    force: bool = False) -> List[Dict[str, Any]]:
+    """Returns the records of one PDF with their figure and table chunks described by `captioner`, in one batch."""
+    stats = stats if stats is not None else CaptionStats()
+    todo = []
+    records = list(records)
+    for i, record in enumerate(records):
+        if not needs_caption(record):
+            continue
+        if record.get("captioned_by"):
+            if not force:
+                stats.skipped += 1
+                continue
+            records[i] = _uncaptioned(record)
+        todo.append(i)
+    if not todo:
+        return records
+
+    by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for record in records:
+        by_page.setdefault(record["page"], []).append(record)
+    hints = [local_caption(records[i], by_page[records[i]["page"]]) for i in todo]
+    captions = captioner.caption_batch([records[i] for i in todo], hints)
+
+    for i, hint, caption in zip(todo, hints, captions):
+        record = dict(records[i])
+        if not caption:
+            stats.fallbacks += 1
+            caption, captioned_by = hint, LocalCaptioner.name
+        else:
+            captioned_by = captioner.name
+        if record.get("image_path"):
+            stats.figures += 1
+            alt_text = (record.get("text") or "").strip()
+            if alt_text and alt_text != PLACEHOLDER_TEXT:
+                record["alt_text"] = alt_text
+            record["text"] = f"{FIGURE_PREFIX.format(page=record['page'])}{caption}"
+        else:
+            stats.tables += 1
+            record["text"] = f"{TABLE_PREFIX.format(page=record['page'])}{caption}\n{record.get('text') or ''}"
+        record["captioned_by"] = captioned_by
+        records[i] = record
+    return records
+
+
+def _uncaptioned(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The record as parse_ingest wrote it, for captioning again."""
+    record = dict(record)
+    del record["captioned_by"]
+    if record.get("image_path"):
+        record["text"] = record.pop("alt_text", PLACEHOLDER_TEXT)
+    elif (record.get("text") or "").startswith(TABLE_PREFIX.format(page=record["page"])):
+        record["text"] = record["text"].split("\n", 1)[1] if "\n" in record["text"] else ""
+    return record
+
+if __name__ == "__main__":
+    import argparse
+    from src.constants import CHUNK_RECORDS_FILE
+    from src.chunk_io import ChunkWriter, ReadReport, iter_chunk_records
+    from src.dedup import iter_pdf_groups
+
+    parser = argparse.ArgumentParser(description="Describe the figure and table chunks of data/chunks.jsonl.")
+    parser.add_argument("--captioner", choices=[c for c in CAPTIONERS if c != "off"], default=None,
+                        help=f"default: ${CAPTIONER_ENV_VAR} or local")
+    parser.add_argument("--force", action="store_true", help="caption chunks captioned in an earlier run again")
+    args = parser.parse_args()
+
+    if not CHUNK_RECORDS_FILE.exists():
+        raise SystemExit(f"{CHUNK_RECORDS_FILE} not found; run `parse_ingest.py` first.")
+    captioner = get_captioner(args.captioner or os.getenv(CAPTIONER_ENV_VAR, "local"))
+    report, stats = ReadReport(), CaptionStats()
+    # the writer replaces the file only after the read has finished
+    with ChunkWriter(CHUNK_RECORDS_FILE) as writer:
+        for group in iter_pdf_groups(iter_chunk_records(CHUNK_RECORDS_FILE, report)):
+            for record in caption_records(group, captioner, stats, force=args.force):
+                writer.write(record)
+    print(f"Read {CHUNK_RECORDS_FILE}: {report.summary()}")
+    print(f"Wrote {CHUNK_RECORDS_FILE}: {writer.report.summary()}")
+    print(f"Captioning ({captioner.name}): {stats.summary()}. Re-index with `python -m src.bulk_ingest --rebuild`.")
@@ -0,0 +1,160 @@
+"""
+Streaming reader and writer for the chunk records file (data/chunks.jsonl).
+
+Records are decoded one line at a time (with orjson when it is installed, else the json module),
+checked against `CHUNK_SCHEMA`, and yielded; malformed lines and invalid records are skipped and
+counted in a `ReadReport` instead of aborting the ingest. Memory use therefore depends on the
+largest record, not on the size of the library. `ChunkWriter` appends records as they are produced,
+skips (and counts in a `WriteReport`) the ones that are invalid, and only replaces the previous file
+once the write has completed.
+"""
+import os
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(line: bytes) -> Any:
+        return orjson.loads(line)
+
+    def _dumps(record: Dict[str, Any]) -> bytes:
+        return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:  # orjson is optional; the standard library codec is slower but equivalent
+    import json
+
+    def _loads(line: bytes) -> Any:
+        return json.loads(line)
+
+    def _dumps(record: Dict[str, Any]) -> bytes:
+        return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+# field -> accepted types; fields not listed are passed through unchecked
+CHUNK_SCHEMA: Dict[str, Tuple[type, ...]] = {
+    "id": (str,),
+    "source_pdf": (str,),
+    "page": (int,),
+    "text": (str,),
+}
+OPTIONAL_FIELDS: Dict[str, Tuple[type, ...]] = {
+    "image_path": (str, type(None)),
+    "type": (str,),
+    "bbox": (list,),
+    "pages": (list,), # every page a collapsed duplicate appears on (src/dedup.py)
+    "captioned_by": (str,), # the text is a figure/table description (src/captioning.py)
+    "alt_text": (str,),
+}
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass
+class ReadReport:
+    read: int = 0
+    skipped: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list) # (line number, reason), first few only
+
+    def add_error(self, line_no: int, reason: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, reason))
+
+    def summary(self) -> str:
+        text = f"{self.read} records read, {self.skipped} skipped"
+        if self.errors:
+            text += "; first problems: " + "; ".join(f"line {n}: {reason}" for n, reason in self.errors[:5])
+        return text
+
+
+@dataclass
+class WriteReport:
+    written: int = 0
+    skipped: int = 0
+    errors: List[Tuple[Any, str]] = field(default_factory=list) # (record id, reason), first few only
+
+    def add_error(self, record_id: Any, reason: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((record_id, reason))
+
+    def summary(self) -> str:
+        text = f"{self.written} records written, {self.skipped} skipped"
+        if self.errors:
+            text += "; first problems: " + "; ".join(f"record {rid!r}: {reason}" for rid, reason in self.errors[:5])
+        return text
+
+
+def validate_record(record: Any) -> Optional[str]:
+    """Returns why `record` is not a valid chunk record, or None if it is."""
+    if not isinstance(record, dict):
+        return f"expected an object, got {type(record).__name__}"
+    for name, types in CHUNK_SCHEMA.items():
+        if name not in record:
+            return f"missing field '{name}'"
+        # bool is an int subclass; a page of `true` is still a broken record
+        if not isinstance(record[name], types) or isinstance(record[name], bool):
+            return f"field '{name}' has type {type(record[name]).__name__}"
+    for name, types in OPTIONAL_FIELDS.items():
+        if name in record and not isinstance(record[name], types):
+            return f"field '{name}' has type {type(record[name]).__name__}"
+    return None
+
+
+def iter_chunk_records(path: Path, report: Optional[ReadReport] = None) -> Iterator[Dict[str, Any]]:
+    """Yields the valid records of a JSONL file one at a time, skipping (and reporting) bad lines."""
+    report = report if report is not None else ReadReport()
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = _loads(line)
+            except ValueError as e:  # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors
+                report.add_error(line_no, f"invalid JSON ({e})")
+                continue
+            problem = validate_record(record)
+            if problem:
+                report.add_error(line_no, problem)
+                continue
+            report.read += 1
+            yield record
+
+
+class ChunkWriter:
+    """
+    Writes records to `<path>.tmp` as they arrive and renames it over `path` on a clean exit,
+    so an interrupted parse never leaves a truncated chunks file behind. Invalid records are
+    skipped and counted in `report`, so one bad chunk does not abort the pass.
+    """
+
+    def __init__(self, path: Path, report: Optional[WriteReport] = None) -> None:
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.report = report if report is not None else WriteReport()
+        self._file = None
+
+    @property
+    def written(self) -> int:
+        return self.report.written
+
+    def __enter__(self) -> "ChunkWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, "wb")
+        return self
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Writes `record`; returns False (and reports why) when it is invalid and was skipped."""
+        problem = validate_record(record)
+        if problem:
+            self.report.add_error(record.get("id") if isinstance(record, dict) else None, problem)
+            return False
+        self._file.write(_dumps(record) + b"\n")
+        self.report.written += 1
+        return True
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
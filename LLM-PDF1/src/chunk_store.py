@@ -0,0 +1,204 @@
+"""
+Compact chunk model and the sidecar text store of the vector store.
+
+Chroma keeps only each chunk's embedding and small metadata; the chunk texts live in one
+append-only UTF-8 file next to the collection (`chunk_text.bin`), with an append-only index of
+chunk id -> (offset, length) (`chunk_text_index.jsonl`). Queries return `ChunkHandle`s that carry the
+metadata and read their text from the memory-mapped file only when `text` is accessed, i.e. for the
+chunks that actually go into a prompt or onto the screen. Handles support `ctx["text"]` and
+`ctx.get(...)`, so code written for the previous plain-dict results keeps working.
+"""
+import json
+import mmap
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TEXT_FILE_NAME = "chunk_text.bin"
+INDEX_FILE_NAME = "chunk_text_index.jsonl"
+
+
+class ChunkRecord:
+    """One parsed chunk; unknown fields of the source record are kept in `extra`."""
+
+    __slots__ = ("id", "source_pdf", "page", "type", "bbox", "image_path", "text", "extra")
+    FIELDS = ("id", "source_pdf", "page", "type", "bbox", "image_path", "text")
+
+    def __init__(self, id: str, source_pdf: str, page: int, text: str, type: Optional[str] = None,
+                 bbox: Optional[list] = None, image_path: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> None:
+        self.id = id
+        self.source_pdf = source_pdf
+        self.page = page
+        self.text = text
+        self.type = type
+        self.bbox = bbox
+        self.image_path = image_path
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "ChunkRecord":
+        extra = {k: v for k, v in record.items() if k not in cls.FIELDS}
+        return cls(**{k: record.get(k) for k in cls.FIELDS}, extra=extra or None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {name: getattr(self, name) for name in self.FIELDS}
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def metadata(self) -> Dict[str, Any]:
+        """Everything except the text, for the Chroma metadata."""
+        meta = self.to_dict()
+        del meta["text"]
+        return meta
+
+
+class ChunkHandle:
+    """A query result: chunk metadata plus distance, with the text read lazily from the text store."""
+
+    __slots__ = ("id", "source_pdf", "page", "type", "image_path", "distance", "meta", "_store", "_text")
+    KEYS = ("id", "source_pdf", "page", "type", "image_path", "distance")
+
+    def __init__(self, id: str, meta: Dict[str, Any], distance: float, store: "TextStore") -> None:
+        self.id = id
+        self.source_pdf = meta.get("source_pdf")
+        self.page = meta.get("page")
+        self.type = meta.get("type")
+        self.image_path = meta.get("image_path")
+        self.distance = distance
+        self.meta = meta
+        self._store = store
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            # collections built before the text store existed have no sidecar entry
+            self._text = self._store.get(self.id)
+            if self._text is None:
+                self._text = self.meta.get("text", "")
+        return self._text
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "text":
+            return self.text
+        if key in self.KEYS:
+            return getattr(self, key)
+        return self.meta[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key == "text" or key in self.KEYS or key in self.meta
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.meta, **{key: getattr(self, key) for key in self.KEYS}, "text": self.text}
+
+
+class TextStore:
+    """Append-only text file with an id -> (offset, length) index, read through mmap."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.text_path = self.directory / TEXT_FILE_NAME
+        self.index_path = self.directory / INDEX_FILE_NAME
+        self._index: Optional[Dict[str, Tuple[int, int]]] = None
+        self._index_size = 0 # bytes of the index file read into _index
+        self._index_inode: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> Dict[str, Tuple[int, int]]:
+        if self._index is None:
+            self._read_index()
+        return self._index
+
+    def _read_index(self) -> None:
+        """Reads the index entries appended since the last read, e.g. by an ingest in another process."""
+        try:
+            stat = self.index_path.stat()
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+        if self._index is None or size < self._index_size or inode != self._index_inode:
+            # first read, or the store was cleared (and possibly rebuilt) since: the mapped texts are stale too
+            self._index, self._index_size, self._index_inode = {}, 0, inode
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+        if size == self._index_size:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_size)
+            data = f.read(size - self._index_size)
+        complete = data.rfind(b"\n") + 1 # a line still being written is read next time
+        for line in data[:complete].splitlines():
+            chunk_id, offset, length = json.loads(line)
+            self._index[chunk_id] = (offset, length)
+        self._index_size += complete
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def append(self, records: Iterable[ChunkRecord]) -> int:
+        """Appends the texts of records not stored yet and returns how many were added."""
+        with self._lock:
+            self._read_index()
+            index = self._index
+            new = [r for r in records if r.id not in index]
+            if not new:
+                return 0
+            self.directory.mkdir(parents=True, exist_ok=True)
+            entries = []
+            with open(self.text_path, "ab") as f:
+                offset = f.tell()
+                for record in new:
+                    data = (record.text or "").encode("utf-8")
+                    f.write(data)
+                    entries.append((record.id, offset, len(data)))
+                    offset += len(data)
+            # the index is written after the texts, so every indexed entry is readable
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                for chunk_id, offset, length in entries:
+                    f.write(json.dumps([chunk_id, offset, length], ensure_ascii=False) + "\n")
+                    index[chunk_id] = (offset, length)
+            return len(new)
+
+    def get(self, chunk_id: str) -> Optional[str]:
+        entry = self.index.get(chunk_id)
+        if entry is None:
+            # a long-running worker does not see chunks ingested by other processes until it re-reads
+            with self._lock:
+                self._read_index()
+                entry = self._index.get(chunk_id)
+            if entry is None:
+                return None
+        offset, length = entry
+        if length == 0:
+            return ""
+        with self._lock:
+            # (re)map when the file has grown past the current mapping since it was opened
+            if self._mmap is None or len(self._mmap) < offset + length:
+                if self._mmap is not None:
+                    self._mmap.close()
+                    self._mmap = None
+                if not self.text_path.exists() or self.text_path.stat().st_size < offset + length:
+                    return None
+                with open(self.text_path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap[offset:offset + length].decode("utf-8")
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            for path in (self.text_path, self.index_path):
+                if path.exists():
+                    path.unlink()
+            self._index, self._index_size = {}, 0
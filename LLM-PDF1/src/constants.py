@@ -5,6 +5,7 @@ OUTPUT_DIR = Path("data")
 IMAGES_DIR = OUTPUT_DIR / "images"
 CHUNK_RECORDS_FILE = OUTPUT_DIR / "chunks.jsonl"
 COLLECTION_NAME = "pdf_chunks" 
+EVAL_CONCURRENCY = 8 # concurrent LLM calls during BERTScore evaluation
 
 
 # test Cases for BERTScore evaluation 
@@ -0,0 +1,205 @@
+"""
+Near-duplicate collapsing and boilerplate removal for the chunks of one PDF.
+
+The layout parser emits every chunk it finds, so running headers and footers, page numbers and
+figures repeated across pages are embedded and retrieved many times over. `collapse_duplicates`
+runs over one document's records (before they are written to data/chunks.jsonl) and:
+
+  - drops boilerplate: short texts that occur on at least BOILERPLATE_PAGE_FRACTION of the pages of
+    a document with MIN_BOILERPLATE_PAGES pages or more. Texts are compared by case and whitespace
+    only, except page marks (short texts with digits that open or close their page, like running
+    headers and footers), whose page numbers and dates are ignored;
+  - collapses duplicates into the first occurrence, which gets a `pages` list of every page the
+    content appears on. Images are duplicates when their content hash matches, short texts when
+    they are equal up to case and whitespace, longer texts when the MinHash estimate of the Jaccard similarity
+    of their word 3-shingles is at least JACCARD_THRESHOLD. Candidate pairs come from LSH banding
+    (BANDS bands of the NUM_PERM signature), so each chunk is compared with a few others, not all.
+
+Duplicates are only collapsed within a document, so queries filtered to one PDF still see all of it.
+
+Usage on an existing records file (from the repository root):
+    PYTHONPATH=LLM-PDF1 python -m src.dedup
+"""
+import re
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+BOILERPLATE_PAGE_FRACTION = 0.5
+MIN_BOILERPLATE_PAGES = 4
+BOILERPLATE_MAX_CHARS = 300
+PAGE_MARK_MAX_CHARS = 100
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 5 # shorter texts are compared by exact text only
+NUM_PERM = 128
+BANDS = 32 # 4 rows each: pairs above ~0.5 Jaccard usually share a band
+JACCARD_THRESHOLD = 0.8
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+@dataclass
+class DedupStats:
+    records: int = 0
+    boilerplate: int = 0
+    duplicates: int = 0
+
+    @property
+    def kept(self) -> int:
+        return self.records - self.boilerplate - self.duplicates
+
+    def summary(self) -> str:
+        return (f"{self.records} chunks, {self.boilerplate} boilerplate dropped, "
+                f"{self.duplicates} duplicates collapsed, {self.kept} kept")
+
+
+def exact_form(text: str) -> str:
+    """The text up to case and whitespace: what exact duplicates share."""
+    return " ".join(text.lower().split())
+
+
+def page_mark_form(text: str) -> str:
+    """Words only, digits masked: page numbers and dates in running headers/footers differ per page."""
+    return _DIGITS_RE.sub("#", " ".join(_WORD_RE.findall(text.lower())))
+
+
+def _boilerplate_keys(records: List[Dict[str, Any]]) -> List[Optional[Tuple[str, str]]]:
+    """The key each record is counted under for boilerplate detection, None when it cannot be boilerplate."""
+    first_last = {}
+    for i, record in enumerate(records):
+        if not record.get("image_path"):
+            first, _ = first_last.get(record["page"], (i, i))
+            first_last[record["page"]] = (first, i)
+    edges = {i for pair in first_last.values() for i in pair}
+
+    keys: List[Optional[Tuple[str, str]]] = []
+    for i, record in enumerate(records):
+        text = record.get("text") or ""
+        exact = exact_form(text)
+        if record.get("image_path") or not _WORD_RE.search(exact) or len(exact) > BOILERPLATE_MAX_CHARS:
+            keys.append(None)
+        elif i in edges and len(exact) <= PAGE_MARK_MAX_CHARS and _DIGITS_RE.search(exact):
+            keys.append(("mark", page_mark_form(text)))
+        else:
+            keys.append(("text", exact))
+    return keys
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the word shingles of `text`, or None when it has too few shingles."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest() for s in shingles)
+    hashes = np.frombuffer(digests, dtype=np.uint32).astype(np.uint64) % _PRIME
+    # (a*h + b) mod p stays below 2^62, so it cannot overflow uint64
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME).min(axis=0)
+
+
+def _bands(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(band, rows.tobytes()) for band, rows in enumerate(np.split(signature, BANDS))]
+
+
+def _image_key(image_path: str) -> str:
+    # parse_ingest._save_image names files "<page>_<content hash>.<ext>"
+    stem = Path(image_path).stem
+    return stem.split("_", 1)[1] if "_" in stem else stem
+
+
+def collapse_duplicates(records: List[Dict[str, Any]], stats: Optional[DedupStats] = None) -> List[Dict[str, Any]]:
+    """Returns the records of one PDF without boilerplate, with duplicates merged into their first occurrence."""
+    stats = stats if stats is not None else DedupStats()
+    stats.records += len(records)
+
+    boilerplate_keys = _boilerplate_keys(records)
+    pages_of: Dict[Tuple[str, str], set] = {}
+    for record, bkey in zip(records, boilerplate_keys):
+        if bkey is not None:
+            pages_of.setdefault(bkey, set()).add(record["page"])
+    page_count = len({r["page"] for r in records})
+    boilerplate = set()
+    if page_count >= MIN_BOILERPLATE_PAGES:
+        boilerplate = {bkey for bkey, pages in pages_of.items()
+                       if len(pages) >= max(2, BOILERPLATE_PAGE_FRACTION * page_count)}
+
+    kept: List[Dict[str, Any]] = []
+    exact: Dict[Any, int] = {} # image hash or text up to case and whitespace -> index in kept
+    band_index: Dict[Tuple[int, bytes], List[int]] = {}
+    signatures: Dict[int, np.ndarray] = {} # index in kept -> minhash
+    for record, bkey in zip(records, boilerplate_keys):
+        if bkey in boilerplate:
+            stats.boilerplate += 1
+            continue
+
+        if record.get("image_path"):
+            key = ("image", _image_key(record["image_path"]))
+        else:
+            text = exact_form(record.get("text") or "")
+            # empty texts have nothing to compare; each is its own key
+            key = ("text", text) if text else ("empty", id(record))
+        match = exact.get(key)
+        signature = None
+        if match is None and key[0] == "text":
+            signature = minhash(record.get("text") or "")
+            if signature is not None:
+                candidates = {i for band in _bands(signature) for i in band_index.get(band, [])}
+                for i in sorted(candidates):
+                    # the share of equal signature rows estimates the Jaccard similarity
+                    if np.mean(signatures[i] == signature) >= JACCARD_THRESHOLD:
+                        match = i
+                        break
+
+        # records deduplicated before keep their pages when the pass is run again
+        pages = record.get("pages") or [record["page"]]
+        if match is not None:
+            canonical = kept[match]
+            canonical["pages"].extend(p for p in pages if p not in canonical["pages"])
+            stats.duplicates += 1
+            continue
+
+        record = {**record, "pages": list(pages)}
+        exact[key] = len(kept)
+        if signature is not None:
+            signatures[len(kept)] = signature
+            for band in _bands(signature):
+                band_index.setdefault(band, []).append(len(kept))
+        kept.append(record)
+    return kept
+
+
+def iter_pdf_groups(records: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Groups consecutive records of the same PDF, the order in which parse_ingest writes them."""
+    group: List[Dict[str, Any]] = []
+    for record in records:
+        if group and record["source_pdf"] != group[0]["source_pdf"]:
+            yield group
+            group = []
+        group.append(record)
+    if group:
+        yield group
+
+
+if __name__ == "__main__":
+    from src.constants import CHUNK_RECORDS_FILE
+    from src.chunk_io import ChunkWriter, ReadReport, iter_chunk_records
+
+    if not CHUNK_RECORDS_FILE.exists():
+        raise SystemExit(f"{CHUNK_RECORDS_FILE} not found; run `parse_ingest.py` first.")
+    report, stats = ReadReport(), DedupStats()
+    # the writer replaces the file only after the read has finished
+    with ChunkWriter(CHUNK_RECORDS_FILE) as writer:
+        for group in iter_pdf_groups(iter_chunk_records(CHUNK_RECORDS_FILE, report)):
+            for record in collapse_duplicates(group, stats):
+                writer.write(record)
+    print(f"Read {CHUNK_RECORDS_FILE}: {report.summary()}")
+    print(f"Wrote {CHUNK_RECORDS_FILE}: {writer.report.summary()}")
+    print(f"Deduplicated: {stats.summary()}. Re-index with `python -m src.bulk_ingest --rebuild`.")
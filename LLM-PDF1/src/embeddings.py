@@ -0,0 +1,68 @@
+"""
+Embedding backends for the vector store.
+
+All backends run the same sentence-transformers model and return L2-normalised float32 vectors, so
+a collection built with one backend can be queried with another (check with
+`python -m benchmarks.embedding_backends`). Select one with EMBEDDING_BACKEND:
+
+    torch       PyTorch fp32 (default, previous behaviour)
+    torch-int8  PyTorch with dynamic int8 quantization of the Linear layers, no extra dependencies
+    onnx        ONNX Runtime fp32, needs `pip install "sentence-transformers[onnx]"`
+    onnx-int8   ONNX Runtime with the int8 model shipped in the model repo (EMBEDDING_ONNX_FILE)
+"""
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+BACKEND_ENV_VAR = "EMBEDDING_BACKEND"
+ONNX_FILE_ENV_VAR = "EMBEDDING_ONNX_FILE"
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+# AVX2 kernels run on practically every x86 server; use model_qint8_avx512.onnx on AVX-512 hosts
+DEFAULT_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def default_backend() -> str:
+    return os.getenv(BACKEND_ENV_VAR, "torch").lower()
+
+
+class Embedder:
+    """A sentence-transformers model on one of `BACKENDS`, encoding to normalised float32 vectors."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, backend: str = "torch") -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {list(BACKENDS)}.")
+        # imported here so that choosing a backend does not pull in torch before it is needed
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.backend = backend
+        if backend.startswith("onnx"):
+            model_kwargs = {"file_name": os.getenv(ONNX_FILE_ENV_VAR, DEFAULT_ONNX_INT8_FILE)} if backend == "onnx-int8" else None
+            self.model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        else:
+            self.model = SentenceTransformer(model_name, device="cpu")
+            if backend == "torch-int8":
+                import torch
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension() or 384
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False,
+                                       normalize_embeddings=True, convert_to_numpy=True)
+        return embeddings.astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=4)
+def _load_embedder(model_name: str, backend: str) -> Embedder:
+    return Embedder(model_name, backend)
+
+
+def get_embedder(model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None) -> Embedder:
+    """Returns the process-wide embedder for (model, backend); the backend defaults to EMBEDDING_BACKEND."""
+    return _load_embedder(model_name, backend or default_backend())
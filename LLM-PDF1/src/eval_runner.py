@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+from genai_common.scoring import score_pairs
+from src.llm import agenerate_answer, API_ERROR_MESSAGE
+from src.constants import EVAL_CONCURRENCY
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+async def _generate_answers(questions: List[str], contexts: List[List[Dict]], concurrency: int,
+                            on_progress: Optional[ProgressCallback]) -> List[str]:
+    """Runs one LLM call per question, at most `concurrency` in flight at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def answer(i: int) -> str:
+        nonlocal done
+        async with semaphore:
+            result = await agenerate_answer(questions[i], contexts[i])
+        done += 1
+        if on_progress:
+            on_progress(done, len(questions), f"Answered: {questions[i]}")
+        return result
+
+    return await asyncio.gather(*(answer(i) for i in range(len(questions))))
+
+
+async def arun_rag_evaluation(vs, pdf_name: str, test_cases: List[Dict[str, str]], k: int = 15,
+                              concurrency: int = EVAL_CONCURRENCY,
+                              on_progress: Optional[ProgressCallback] = None,
+                              rescale: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Evaluates `test_cases` for one PDF in three batched stages: one retrieval call for all questions,
+    concurrent LLM calls, and a single BERTScore call over every successful candidate/reference pair
+    (optionally rescaled with the BERTScore baseline).
+    Returns one result row per test case, in input order.
+    """
+    questions = [tc["question"] for tc in test_cases]
+    references = [tc["expected_response"] for tc in test_cases]
+
+    contexts = vs.query_batch(questions, k=k, source_pdf=pdf_name)
+    answers = await _generate_answers(questions, contexts, concurrency, on_progress)
+
+    scored = [i for i, a in enumerate(answers) if a and a.strip() and a != API_ERROR_MESSAGE]
+    scores: Dict[int, tuple] = {}
+    if scored:
+        if on_progress:
+            on_progress(len(questions), len(questions), f"Scoring {len(scored)} answers with BERTScore...")
+        pair_scores = score_pairs([answers[i] for i in scored], [references[i] for i in scored], rescale_with_baseline=rescale)
+        scores.update(zip(scored, pair_scores))
+
+    rows = []
+    for i, question in enumerate(questions):
+        precision, recall, f1 = scores.get(i, (0.0, 0.0, 0.0))
+        rows.append({
+            "Question": question,
+            "Generated Response": answers[i] if i in scores else (answers[i] or "[Empty/Error Response]"),
+            "Expected Response": references[i],
+            "BERTScore Precision": precision,
+            "BERTScore Recall": recall,
+            "BERTScore F1": f1,
+        })
+    return rows
+
+
+def run_rag_evaluation(vs, pdf_name: str, test_cases: List[Dict[str, str]], k: int = 15,
+                       concurrency: int = EVAL_CONCURRENCY,
+                       on_progress: Optional[ProgressCallback] = None,
+                       rescale: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """Blocking wrapper around `arun_rag_evaluation` for Streamlit and scripts."""
+    return asyncio.run(arun_rag_evaluation(vs, pdf_name, test_cases, k=k, concurrency=concurrency,
+                                           on_progress=on_progress, rescale=rescale))
+
+
+if __name__ == "__main__":
+    # headless run over every PDF in TEST_QUESTIONS_PER_PDF, e.g. before a deployment
+    import argparse
+    from src.vector_store import VectorStore
+    from src.constants import TEST_QUESTIONS_PER_PDF
+
+    parser = argparse.ArgumentParser(description="Run the BERTScore RAG evaluation for all PDFs.")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--rescale", action="store_true", help="rescale BERTScore with its baseline")
+    args = parser.parse_args()
+
+    vs = VectorStore()
+    for pdf_name, cases in TEST_QUESTIONS_PER_PDF.items():
+        rows = run_rag_evaluation(vs, pdf_name, cases, concurrency=args.concurrency, rescale=args.rescale)
+        avg_f1 = sum(r["BERTScore F1"] for r in rows) / len(rows)
+        print(f"{pdf_name}: {len(rows)} questions, average BERTScore F1 {avg_f1:.4f}")
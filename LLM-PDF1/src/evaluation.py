@@ -1,9 +1,8 @@
 import pandas as pd
-from bert_score import score as bert_score_score
-from src.llm import generate_answer
+from src.eval_runner import run_rag_evaluation
 from src.constants import TEST_QUESTIONS_PER_PDF
 
-def evaluate_bert_score_rag(st, vs, selected_pdf_for_eval: str):
+def evaluate_bert_score_rag(st, vs, selected_pdf_for_eval: str, rescale: bool = False):
     st.subheader(f"BERTScore Evaluation Results for: {selected_pdf_for_eval}")
     
     test_cases_for_pdf = TEST_QUESTIONS_PER_PDF.get(selected_pdf_for_eval, [])
@@ -11,47 +10,18 @@ def evaluate_bert_score_rag(st, vs, selected_pdf_for_eval: str):
         st.warning(f"No test cases defined for '{selected_pdf_for_eval}'. Please add questions and expected responses to `TEST_QUESTIONS_PER_PDF`.")
         return
 
-    bert_scores = []
     total_questions = len(test_cases_for_pdf)
 
     progress_bar = st.progress(0)
     status_text = st.empty()
 
-    for i, test_case in enumerate(test_cases_for_pdf):
-        question = test_case["question"]
-        expected_response = test_case["expected_response"]
+    def on_progress(done: int, total: int, message: str):
+        status_text.text(f"{message} ({done}/{total})")
+        progress_bar.progress(done / total)
 
-        status_text.text(f"Evaluating LLM Response: {question} ({i+1}/{total_questions})")
-        
-        # get contexts for the current question and PDF
-        contexts = vs.query(question, k=15, source_pdf=selected_pdf_for_eval)
-        
-        # get the actual generated response from the RAG pipeline
-        generated_response = generate_answer(question, contexts)
-        
-        if generated_response and generated_response != "Sorry, I was unable to generate an answer due to an API error.":
-            # BERTScore needs lists of strings
-            P, R, F1 = bert_score_score([generated_response], [expected_response], lang="en", verbose=False)
-            
-            bert_scores.append({
-                "Question": question,
-                "Generated Response": generated_response,
-                "Expected Response": expected_response,
-                "BERTScore Precision": P.mean().item(),
-                "BERTScore Recall": R.mean().item(),
-                "BERTScore F1": F1.mean().item()
-            })
-        else:
-            bert_scores.append({
-                "Question": question,
-                "Generated Response": generated_response or "[Empty/Error Response]",
-                "Expected Response": expected_response,
-                "BERTScore Precision": 0.0,
-                "BERTScore Recall": 0.0,
-                "BERTScore F1": 0.0
-            })
-        
-        progress_bar.progress((i + 1) / total_questions)
+    # batched retrieval, concurrent LLM calls and a single BERTScore pass
+    status_text.text(f"Retrieving contexts for {total_questions} questions...")
+    bert_scores = run_rag_evaluation(vs, selected_pdf_for_eval, test_cases_for_pdf, k=15, on_progress=on_progress, rescale=rescale)
 
     status_text.empty()
     st.markdown("---")
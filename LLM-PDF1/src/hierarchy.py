@@ -0,0 +1,175 @@
+"""
+Document and page vectors for coarse-to-fine retrieval.
+
+At ingest every chunk embedding is added to the running sum of its page; a page's vector is the
+normalized mean of its chunks and a document's vector the normalized mean of its pages' sums.
+A hierarchical query (`VectorStore(hierarchical=True)` or VECTOR_STORE_HIERARCHICAL=1) then:
+
+    1. scores the document vectors and keeps the best `top_docs` documents,
+    2. scores the pages of those documents and keeps the best `top_pages` pages,
+    3. searches only the chunks of those pages.
+
+Stage costs grow with the number of documents, the pages of a few documents and the chunks of a
+few pages, instead of with every chunk in the library. The sums are kept in
+`<persist_directory>/hierarchy/` (`page_sums.npy` and `pages.jsonl`, one [source_pdf, page, chunks]
+per row) so later ingests can extend them; `rebuild` recomputes them from an existing index.
+
+Summaries cover only the chunks ingested since they were introduced. When they count fewer
+chunks than the index holds, or the filtered PDF has none, queries search flat until
+`python -m src.bulk_ingest --hierarchy-only` has rebuilt them.
+"""
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+HIERARCHICAL_ENV_VAR = "VECTOR_STORE_HIERARCHICAL"
+TOP_DOCS = int(os.getenv("HIERARCHY_TOP_DOCS", "5"))
+TOP_PAGES = int(os.getenv("HIERARCHY_TOP_PAGES", "20"))
+
+PageKey = Tuple[str, int]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class PageSummaries:
+    """Per-page embedding sums with derived page and document vectors."""
+
+    def __init__(self, persist_directory: str) -> None:
+        self.directory = Path(persist_directory) / "hierarchy"
+        self.sums_path = self.directory / "page_sums.npy"
+        self.pages_path = self.directory / "pages.jsonl"
+        self._lock = threading.Lock()
+        self._rows: Dict[PageKey, int] = {}
+        self._pages: List[PageKey] = []
+        self._counts: List[int] = []
+        self._sums: List[np.ndarray] = []
+        self._dirty = False
+        self._views = None  # (page vectors, doc names, doc vectors, doc -> page rows), rebuilt after adds
+        self._warned = False
+        self._load()
+
+    def _load(self) -> None:
+        if not (self.sums_path.exists() and self.pages_path.exists()):
+            return
+        sums = np.load(self.sums_path)
+        with open(self.pages_path, "r", encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                source_pdf, page, count = json.loads(line)
+                self._rows[(source_pdf, page)] = row
+                self._pages.append((source_pdf, page))
+                self._counts.append(count)
+                self._sums.append(sums[row])
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def add(self, metadatas: List[Dict[str, Any]], embeddings: List[List[float]]) -> None:
+        """Adds chunk embeddings to their pages' sums; callers pass each chunk once."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            for meta, vector in zip(metadatas, vectors):
+                key = (meta.get("source_pdf", ""), meta.get("page", -1))
+                row = self._rows.get(key)
+                if row is None:
+                    self._rows[key] = len(self._pages)
+                    self._pages.append(key)
+                    self._counts.append(1)
+                    self._sums.append(vector.copy())
+                else:
+                    self._counts[row] += 1
+                    self._sums[row] += vector
+            self._dirty = True
+            self._views = None
+
+    def rebuild(self, index, page_size: int = 1024) -> int:
+        """Recomputes the sums from every chunk of `index`; returns the number of pages."""
+        self.reset()
+        for _, embeddings, metadatas in index.iter_embeddings(page_size):
+            self.add(metadatas, embeddings)
+        self.flush()
+        return len(self)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_sums = self.sums_path.with_name("page_sums.tmp.npy")
+            np.save(tmp_sums, np.stack(self._sums) if self._sums else np.zeros((0, 0), dtype=np.float32))
+            tmp_pages = self.pages_path.with_name("pages.jsonl.tmp")
+            with open(tmp_pages, "w", encoding="utf-8") as f:
+                for (source_pdf, page), count in zip(self._pages, self._counts):
+                    f.write(json.dumps([source_pdf, page, count], ensure_ascii=False) + "\n")
+            os.replace(tmp_sums, self.sums_path)
+            os.replace(tmp_pages, self.pages_path)
+            self._dirty = False
+
+    def reset(self) -> None:
+        with self._lock:
+            for path in (self.sums_path, self.pages_path):
+                if path.exists():
+                    path.unlink()
+            self._rows, self._pages, self._counts, self._sums = {}, [], [], []
+            self._dirty, self._views = False, None
+
+    def _build_views(self):
+        sums = np.stack(self._sums)
+        doc_rows: Dict[str, List[int]] = {}
+        for row, (source_pdf, _) in enumerate(self._pages):
+            doc_rows.setdefault(source_pdf, []).append(row)
+        docs = list(doc_rows)
+        doc_vectors = _normalize(np.stack([sums[doc_rows[d]].sum(axis=0) for d in docs]))
+        return _normalize(sums), docs, doc_vectors, {d: np.asarray(r) for d, r in doc_rows.items()}
+
+    def _incomplete(self, reason: str) -> None:
+        if not self._warned:
+            self._warned = True
+            print(f"Warning: page summaries are incomplete ({reason}); searching flat. "
+                  "Rebuild them with `python -m src.bulk_ingest --hierarchy-only`.")
+
+    def select(self, query_vectors: List[List[float]], top_docs: int = TOP_DOCS, top_pages: int = TOP_PAGES,
+               source_pdf: Optional[str] = None, indexed_chunks: Optional[int] = None) -> Optional[List[List[PageKey]]]:
+        """
+        Returns the candidate pages of each query, best first, or None when the summaries cannot
+        cover the search (the caller then searches flat): none exist, they count fewer chunks than
+        `indexed_chunks`, or `source_pdf` has none. With `source_pdf` the document stage is skipped.
+        """
+        with self._lock:
+            if not self._pages:
+                return None
+            if indexed_chunks is not None and sum(self._counts) < indexed_chunks:
+                self._incomplete(f"{sum(self._counts)} of {indexed_chunks} indexed chunks")
+                return None
+            if self._views is None:
+                self._views = self._build_views()
+            page_vectors, docs, doc_vectors, doc_rows = self._views
+            pages = list(self._pages)
+
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if source_pdf:
+            if source_pdf not in doc_rows:
+                self._incomplete(f"none for {source_pdf}")
+                return None
+            doc_choices = [[source_pdf]] * len(queries)
+        else:
+            doc_scores = queries @ doc_vectors.T
+            n_docs = min(top_docs, len(docs))
+            doc_choices = [[docs[i] for i in np.argsort(-row)[:n_docs]] for row in doc_scores]
+
+        selected: List[List[PageKey]] = []
+        for query, chosen in zip(queries, doc_choices):
+            rows = np.concatenate([doc_rows[d] for d in chosen])
+            if len(rows) <= top_pages:
+                selected.append([pages[r] for r in rows])
+                continue
+            scores = page_vectors[rows] @ query
+            best = np.argpartition(-scores, top_pages - 1)[:top_pages]
+            selected.append([pages[rows[i]] for i in best[np.argsort(-scores[best])]])
+        return selected
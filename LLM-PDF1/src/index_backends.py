@@ -0,0 +1,353 @@
+"""
+Vector index backends behind `VectorStore`, selected with VECTOR_INDEX_BACKEND:
+
+    chroma  ChromaDB HNSW collection (default), optionally sharded per PDF
+    numpy   exact brute-force search over a memory-mapped .npy matrix
+
+The Chroma HNSW parameters come from `hnsw` ({"M", "construction_ef", "search_ef"}) or
+VECTOR_STORE_HNSW_M / _CONSTRUCTION_EF / _SEARCH_EF; unset ones keep Chroma's defaults. M and
+construction_ef only apply when a collection is created, so change them with a rebuild.
+
+Both take sanitized metadata dicts and return, per query, parallel lists of ids, metadatas and
+distances (squared L2, as Chroma's default space), so `VectorStore.query` results are identical in
+shape whichever backend is used. A query can be restricted to one PDF or to a list of
+(source_pdf, page) pairs, the latter for the second stage of the hierarchical query (src/hierarchy.py).
+"""
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.constants import COLLECTION_NAME
+
+INDEX_BACKEND_ENV_VAR = "VECTOR_INDEX_BACKEND"
+INDEX_DTYPE_ENV_VAR = "VECTOR_INDEX_DTYPE"
+INDEX_BACKENDS = ("chroma", "numpy")
+# set VECTOR_STORE_SHARD_BY_PDF=1 to also index every PDF in its own Chroma collection
+SHARD_ENV_VAR = "VECTOR_STORE_SHARD_BY_PDF"
+SHARD_PREFIX = f"{COLLECTION_NAME}__"
+HNSW_ENV_VARS = {
+    "M": "VECTOR_STORE_HNSW_M",
+    "construction_ef": "VECTOR_STORE_HNSW_CONSTRUCTION_EF",
+    "search_ef": "VECTOR_STORE_HNSW_SEARCH_EF",
+}
+
+QueryResult = Tuple[List[List[str]], List[List[Dict[str, Any]]], List[List[float]]]
+PageKey = Tuple[str, int]
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in {"1", "true", "yes"}
+
+
+def _pages_filter(pages: List[PageKey]) -> Dict[str, Any]:
+    by_pdf: Dict[str, List[int]] = {}
+    for source_pdf, page in pages:
+        by_pdf.setdefault(source_pdf, []).append(page)
+    clauses = [{"$and": [{"source_pdf": {"$eq": pdf}}, {"page": {"$in": pdf_pages}}]} for pdf, pdf_pages in by_pdf.items()]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def hnsw_metadata(hnsw: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Chroma collection metadata for the HNSW settings in `hnsw`, falling back to HNSW_ENV_VARS."""
+    hnsw = hnsw or {}
+    unknown = set(hnsw) - set(HNSW_ENV_VARS)
+    if unknown:
+        raise ValueError(f"Unknown HNSW settings {sorted(unknown)}, expected {list(HNSW_ENV_VARS)}.")
+    metadata = {}
+    for key, env_var in HNSW_ENV_VARS.items():
+        value = hnsw.get(key, os.getenv(env_var))
+        if value is not None:
+            metadata[f"hnsw:{key}"] = int(value)
+    return metadata
+
+
+def shard_name(source_pdf: str) -> str:
+    """Collection name for one PDF's shard; hashed because Chroma restricts collection names."""
+    return SHARD_PREFIX + hashlib.sha1(source_pdf.encode("utf-8")).hexdigest()[:16]
+
+
+class ChromaIndex:
+    """
+    With `shard_by_pdf` every chunk is written both to the global collection and to a per-PDF shard.
+    Queries filtered by `source_pdf` are routed to that PDF's shard, so their cost depends on the
+    document's size rather than the library's and no approximate search is post-filtered; unfiltered
+    queries, and PDFs without a shard (e.g. indexed before sharding was enabled), use the global collection.
+    """
+
+    name = "chroma"
+
+    def __init__(self, persist_directory: str, shard_by_pdf: bool = False, hnsw: Optional[Dict[str, int]] = None) -> None:
+        import chromadb  # imported here so the numpy backend runs without chromadb installed
+
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.hnsw = hnsw_metadata(hnsw)
+        self.collection = self._get_or_create(COLLECTION_NAME)
+        self.shard_by_pdf = shard_by_pdf
+        self._shards: Dict[str, Any] = {}
+        self._shards_lock = threading.Lock()
+
+    def _get_or_create(self, name: str, metadata: Optional[Dict[str, Any]] = None):
+        metadata = {**(metadata or {}), **self.hnsw}
+        collection = self.client.get_or_create_collection(name=name, metadata=metadata or None)
+        # search_ef can change on an existing collection; M and construction_ef are fixed at creation
+        search_ef = self.hnsw.get("hnsw:search_ef")
+        if search_ef is not None and (collection.metadata or {}).get("hnsw:search_ef") != search_ef:
+            try:
+                collection.modify(metadata={**(collection.metadata or {}), "hnsw:search_ef": search_ef})
+            except Exception as e:  # older and newer chromadb versions differ in what modify accepts
+                print(f"Could not set hnsw:search_ef on '{name}': {e}")
+        return collection
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        if isinstance(embeddings, np.ndarray): # e.g. from the bulk ingest pool
+            embeddings = embeddings.tolist()
+        self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        if self.shard_by_pdf:
+            self._add_to_shards(ids, embeddings, metadatas)
+
+    def flush(self) -> None:
+        pass  # Chroma persists on every add
+
+    def _add_to_shards(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        by_pdf: Dict[str, List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            by_pdf.setdefault(meta.get("source_pdf", ""), []).append(i)
+        for source_pdf, rows in by_pdf.items():
+            self._shard(source_pdf, create=True).add(
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+            )
+
+    def _shard(self, source_pdf: str, create: bool = False):
+        """Returns the shard collection of `source_pdf`, or None when it does not exist and `create` is False."""
+        with self._shards_lock:
+            if source_pdf not in self._shards:
+                name = shard_name(source_pdf)
+                if create:
+                    self._shards[source_pdf] = self._get_or_create(name, {"source_pdf": source_pdf})
+                else:
+                    try:
+                        self._shards[source_pdf] = self.client.get_collection(name=name)
+                    except Exception:  # not created yet; the type of error differs between chromadb versions
+                        return None
+            return self._shards[source_pdf]
+
+    def _shard_names(self) -> List[str]:
+        # chromadb >= 0.6 returns names, older versions return collection objects
+        names = [getattr(c, "name", c) for c in self.client.list_collections()]
+        return [name for name in names if name.startswith(SHARD_PREFIX)]
+
+    def rebuild_shards(self, page_size: int = 1024) -> int:
+        """Builds the per-PDF shards from the global collection without re-embedding; returns the chunks copied."""
+        for name in self._shard_names():
+            self.client.delete_collection(name=name)
+        with self._shards_lock:
+            self._shards.clear()
+        copied = 0
+        for ids, embeddings, metadatas in self.iter_embeddings(page_size):
+            self._add_to_shards(ids, embeddings, metadatas)
+            copied += len(ids)
+        return copied
+
+    def iter_embeddings(self, page_size: int = 1024) -> Iterator[Tuple[List[str], List[List[float]], List[Dict[str, Any]]]]:
+        """Yields (ids, embeddings, metadatas) pages of the global collection."""
+        total = self.collection.count()
+        for offset in range(0, total, page_size):
+            page = self.collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+            embeddings = [e.tolist() if hasattr(e, "tolist") else list(e) for e in page["embeddings"]]
+            yield page["ids"], embeddings, page["metadatas"]
+
+    def reset(self) -> None:
+        self.client.delete_collection(name=COLLECTION_NAME)
+        for name in self._shard_names():
+            self.client.delete_collection(name=name)
+        with self._shards_lock:
+            self._shards.clear()
+        self.collection = self._get_or_create(COLLECTION_NAME)
+
+    def query(self, embeddings: List[List[float]], k: int, source_pdf: Optional[str] = None,
+              pages: Optional[List[PageKey]] = None) -> QueryResult:
+        query_kwargs = dict(query_embeddings=embeddings, n_results=k, include=["metadatas", "distances"])
+        # route filtered queries to the PDF's shard; fall back to a filtered global search without one
+        collection = self.collection
+        if pages:
+            query_kwargs["where"] = _pages_filter(pages)
+        elif source_pdf:
+            shard = self._shard(source_pdf) if self.shard_by_pdf else None
+            if shard is not None:
+                collection = shard
+            else:
+                query_kwargs["where"] = {"source_pdf": source_pdf}
+        res = collection.query(**query_kwargs)
+        return res.get("ids", []) or [], res.get("metadatas", []) or [], res.get("distances", []) or []
+
+
+class NumpyIndex:
+    """
+    Exact search: all vectors in one contiguous float32 (or float16) matrix, rows sorted by PDF and page
+    so a filtered query is a dot product against one contiguous slice (or a few, for a page list)
+    followed by an `argpartition` top-k.
+
+    Files in `<persist_directory>/numpy_index/`: `vectors.npy` (opened memory-mapped) and
+    `metadata.jsonl` (one [id, metadata] per row, same order). Added vectors are kept in memory and
+    searchable immediately; `flush()` rewrites both files, which ingest does once at the end.
+    """
+
+    name = "numpy"
+
+    def __init__(self, persist_directory: str, dtype: str = "float32") -> None:
+        self.directory = Path(persist_directory) / "numpy_index"
+        self.vectors_path = self.directory / "vectors.npy"
+        self.metadata_path = self.directory / "metadata.jsonl"
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._metas: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._ranges: Dict[str, Tuple[int, int]] = {}  # source_pdf -> (start row, end row)
+        self._page_ranges: Dict[PageKey, Tuple[int, int]] = {}
+        self._pending: List[Tuple[str, np.ndarray, Dict[str, Any]]] = []
+        self._known: set = set()
+        self._dirty = False  # rows not written to disk yet
+        self._load()
+
+    def _load(self) -> None:
+        if not (self.vectors_path.exists() and self.metadata_path.exists()):
+            return
+        self._matrix = np.load(self.vectors_path, mmap_mode="r")
+        with open(self.metadata_path, "r", encoding="utf-8") as f:
+            for line in f:
+                chunk_id, meta = json.loads(line)
+                self._ids.append(chunk_id)
+                self._metas.append(meta)
+        self._known = set(self._ids)
+        self._compute_ranges()
+
+    @staticmethod
+    def _sort_key(meta: Dict[str, Any]) -> PageKey:
+        return meta.get("source_pdf", ""), meta.get("page", -1)
+
+    def _compute_ranges(self) -> None:
+        ranges: Dict[str, Tuple[int, int]] = {}
+        page_ranges: Dict[PageKey, Tuple[int, int]] = {}
+        for row, meta in enumerate(self._metas):
+            key = self._sort_key(meta)
+            ranges[key[0]] = (ranges.get(key[0], (row, row))[0], row + 1)
+            page_ranges[key] = (page_ranges.get(key, (row, row))[0], row + 1)
+        self._ranges, self._page_ranges = ranges, page_ranges
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._ids) + len(self._pending)
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> None:
+        vectors = np.asarray(embeddings, dtype=self.dtype)
+        with self._lock:
+            for chunk_id, vector, meta in zip(ids, vectors, metadatas):
+                # like Chroma, adding an existing id is a no-op
+                if chunk_id not in self._known:
+                    self._known.add(chunk_id)
+                    self._pending.append((chunk_id, vector, meta))
+                    self._dirty = True
+
+    def _merge_pending(self) -> None:
+        """Folds pending rows into the matrix, regrouping rows by PDF (called with the lock held)."""
+        if not self._pending:
+            return
+        ids = self._ids + [p[0] for p in self._pending]
+        metas = self._metas + [p[2] for p in self._pending]
+        new_rows = np.stack([p[1] for p in self._pending])
+        matrix = new_rows if self._matrix is None else np.concatenate([np.asarray(self._matrix), new_rows])
+        order = sorted(range(len(ids)), key=lambda i: self._sort_key(metas[i]))
+        self._ids = [ids[i] for i in order]
+        self._metas = [metas[i] for i in order]
+        self._matrix = np.ascontiguousarray(matrix[order])
+        self._compute_ranges()
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._merge_pending()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_vectors = self.vectors_path.with_name("vectors.tmp.npy")
+            np.save(tmp_vectors, self._matrix)
+            tmp_metadata = self.metadata_path.with_name("metadata.jsonl.tmp")
+            with open(tmp_metadata, "w", encoding="utf-8") as f:
+                for chunk_id, meta in zip(self._ids, self._metas):
+                    f.write(json.dumps([chunk_id, meta], ensure_ascii=False) + "\n")
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_metadata, self.metadata_path)
+            self._matrix = np.load(self.vectors_path, mmap_mode="r")
+            self._dirty = False
+
+    def reset(self) -> None:
+        with self._lock:
+            for path in (self.vectors_path, self.metadata_path):
+                if path.exists():
+                    path.unlink()
+            self._ids, self._metas, self._pending, self._known = [], [], [], set()
+            self._matrix, self._ranges, self._page_ranges, self._dirty = None, {}, {}, False
+
+    def iter_embeddings(self, page_size: int = 1024) -> Iterator[Tuple[List[str], List[List[float]], List[Dict[str, Any]]]]:
+        with self._lock:
+            self._merge_pending()
+            matrix, ids, metas = self._matrix, self._ids, self._metas
+        for start in range(0, len(ids), page_size):
+            end = start + page_size
+            yield ids[start:end], np.asarray(matrix[start:end], dtype=np.float32).tolist(), metas[start:end]
+
+    def query(self, embeddings: List[List[float]], k: int, source_pdf: Optional[str] = None,
+              pages: Optional[List[PageKey]] = None) -> QueryResult:
+        queries = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._merge_pending()
+            matrix, ids, metas = self._matrix, self._ids, self._metas
+            if pages:
+                spans = [self._page_ranges[key] for key in map(tuple, pages) if key in self._page_ranges]
+                rows = np.concatenate([np.arange(a, b) for a, b in spans]) if spans else np.arange(0)
+            else:
+                start, end = (0, len(ids)) if not source_pdf else self._ranges.get(source_pdf, (0, 0))
+                rows = np.arange(start, end)
+        n = len(rows)
+        if matrix is None or n == 0:
+            return [[] for _ in queries], [[] for _ in queries], [[] for _ in queries]
+
+        # one contiguous block is sliced (a view of the memory map); page lists are gathered
+        contiguous = rows[-1] - rows[0] + 1 == n
+        block = matrix[rows[0]:rows[-1] + 1] if contiguous else matrix[rows]
+        scores = queries @ np.asarray(block, dtype=np.float32).T
+        top = min(k, n)
+        if top < n:
+            candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        else:
+            candidates = np.broadcast_to(np.arange(n), (len(queries), n))
+        id_lists, meta_lists, dist_lists = [], [], []
+        for row, cand in zip(scores, candidates):
+            ranked = cand[np.argsort(-row[cand], kind="stable")]
+            id_lists.append([ids[rows[i]] for i in ranked])
+            meta_lists.append([metas[rows[i]] for i in ranked])
+            # squared L2 between unit vectors, the same distance Chroma reports by default
+            dist_lists.append([max(0.0, float(d)) for d in 2.0 - 2.0 * row[ranked]])
+        return id_lists, meta_lists, dist_lists
+
+
+def create_index(persist_directory: str, backend: Optional[str] = None, shard_by_pdf: Optional[bool] = None,
+                 hnsw: Optional[Dict[str, int]] = None):
+    backend = (backend or os.getenv(INDEX_BACKEND_ENV_VAR, "chroma")).lower()
+    if backend == "chroma":
+        return ChromaIndex(persist_directory, shard_by_pdf=_env_flag(SHARD_ENV_VAR) if shard_by_pdf is None else shard_by_pdf,
+                           hnsw=hnsw)
+    if backend == "numpy":
+        return NumpyIndex(persist_directory, dtype=os.getenv(INDEX_DTYPE_ENV_VAR, "float32"))
+    raise ValueError(f"Unknown vector index backend '{backend}', expected one of {list(INDEX_BACKENDS)}.")
@@ -2,19 +2,69 @@ import re
 import os
 import base64
 from pathlib import Path
-from typing import List, Dict
-from fireworks.client import Fireworks
+from typing import List, Dict, Iterator
 from dotenv import load_dotenv
+from genai_common.llm_client import get_client
+from genai_common.cassette import replay_enabled as cassette_replay_enabled
+from genai_common.hedging import LatencyPolicy
+from genai_common.prompt_metrics import timed_completion, atimed_completion
+from genai_common.tracing import mark_failed, span
+from genai_common.streaming import strip_thoughts_stream
 
 load_dotenv()
 
-fireworks_api_key = os.getenv("FIREWORKS_API_KEY") 
-if not fireworks_api_key:
-    raise ValueError("FIREWORKS_API_KEY not found in environment variables")
-else:
-    llm = Fireworks(api_key=fireworks_api_key)
+
+def get_llm():
+    """The shared pooled client, created on first use so importing this module stays cheap."""
+    # replaying recorded completions (LLM_CASSETTE_MODE=replay) works offline without a key
+    if not os.getenv("FIREWORKS_API_KEY") and not cassette_replay_enabled():
+        raise ValueError("FIREWORKS_API_KEY not found in environment variables")
+    # FIREWORKS_BASE_URL can point it at a local mock/stub server
+    return get_client()
+
 
 MODEL_NAME = "accounts/fireworks/models/qwen2p5-vl-32b-instruct"
+API_ERROR_MESSAGE = "Sorry, I was unable to generate an answer due to an API error."
+
+# hedge a slow completion after 8s and fall back to a faster vision model after 20s;
+# override with PDF_HEDGE_AFTER_S, PDF_BUDGET_S, PDF_FALLBACK_MODELS, PDF_FALLBACK_BUDGET_S
+LATENCY_POLICY = LatencyPolicy.from_env(
+    "PDF",
+    primary_model=MODEL_NAME,
+    fallback_models=["accounts/fireworks/models/llama4-scout-instruct-basic"],
+    budget_s=20.0,
+    hedge_after_s=8.0,
+    fallback_budget_s=30.0,
+)
+
+# fixed instructions sent as the first message of every request, so the provider can reuse
+# its cached prefix; the retrieved contexts and the question always follow in the user message
+SYSTEM_PROMPT = (
+    "You are a helpful RAG assistant specialized in answering questions about scientific PDFs. You will be given chunks of text and potentially images from a PDF and tables and diagrams. "
+    "Use ONLY the provided context to answer the question accurately. Cite the source PDF and page where relevant."
+)
+
+# retrieved images go to the model only for questions about figures when their chunk has a text
+# description from ingest (src/captioning.py); PDF_SEND_IMAGES=always/never overrides
+SEND_IMAGES_ENV_VAR = "PDF_SEND_IMAGES"
+FIGURE_QUESTION_RE = re.compile(
+    r"\b(fig(ure)?s?|charts?|graphs?|plots?|diagrams?|images?|pictures?|illustrations?|visuals?|"
+    r"tables?|screenshots?|flow ?charts?)\b",
+    re.IGNORECASE,
+)
+
+
+def wants_images(question: str) -> bool:
+    return bool(FIGURE_QUESTION_RE.search(question))
+
+
+def _send_image(ctx: Dict, question_wants_images: bool) -> bool:
+    mode = os.getenv(SEND_IMAGES_ENV_VAR, "auto").lower()
+    if mode in {"always", "never"}:
+        return mode == "always"
+    # images indexed before captioning have no text to stand in for them
+    return question_wants_images or not ctx.get("captioned_by")
+
 
 def strip_model_thoughts(text: str) -> str:
     text = re.sub(r'<thought>(.*?)</thought>', '', text, flags=re.DOTALL)
@@ -36,49 +86,89 @@ def strip_model_thoughts(text: str) -> str:
     
     return text
 
-def generate_answer(question: str, contexts: List[Dict]) -> str:
-    prompt_text = (
-        "You are a helpful RAG assistant specialized in answering questions about scientific PDFs. You will be given chunks of text and potentially images from a PDF and tables and diagrams. "
-        "Use ONLY the provided context to answer the question accurately. Cite the source PDF and page where relevant.\n\n"
-        "--- CONTEXT ---\n"
-    )
-    
-    text_contexts_str = "\n\n".join([
-        f"Source: {ctx['source_pdf']} page {ctx['page']}\n{ctx['text']}" for ctx in contexts
-    ])
-    
-    prompt_text += text_contexts_str
-    prompt_text += f"\n\n--- QUESTION ---\n{question}\n\n--- ANSWER ---\n"
+def build_answer_messages(question: str, contexts: List[Dict]) -> List[Dict]:
+    """Builds the chat messages for a question: fixed system prompt, then contexts, question and images."""
+    with span("context_build"):
+        text_contexts_str = "\n\n".join([
+            f"Source: {ctx['source_pdf']} page {ctx['page']}\n{ctx['text']}" for ctx in contexts
+        ])
+        prompt_text = f"--- CONTEXT ---\n{text_contexts_str}\n\n--- QUESTION ---\n{question}\n\n--- ANSWER ---\n"
     
     message_content = [{"type": "text", "text": prompt_text}]
 
-    for ctx in contexts:
-        if ctx.get("image_path"):
-            img_path = Path(ctx["image_path"])
-            if img_path.exists() and img_path.is_file():
-                try:
-                    with open(img_path, "rb") as f:
-                        base64_image = base64.b64encode(f.read()).decode("utf-8")
-                    
-                    message_content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{base64_image}" 
-                        },
-                    })
-                except Exception as e:
-                    print(f"Error processing image {img_path}: {e}") 
+    with span("image_encoding"):
+        question_wants_images = wants_images(question)
+        for ctx in contexts:
+            if ctx.get("image_path") and _send_image(ctx, question_wants_images):
+                img_path = Path(ctx["image_path"])
+                if img_path.exists() and img_path.is_file():
+                    try:
+                        with open(img_path, "rb") as f:
+                            base64_image = base64.b64encode(f.read()).decode("utf-8")
+                        
+                        message_content.append({
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/png;base64,{base64_image}" 
+                            },
+                        })
+                    except Exception as e:
+                        print(f"Error processing image {img_path}: {e}") 
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": message_content},
+    ]
+
+def generate_answer(question: str, contexts: List[Dict]) -> str:
+    messages = build_answer_messages(question, contexts)
+    try:
+        with span("llm_call"):
+            response = timed_completion(
+                get_llm(),
+                "pdf.generate_answer",
+                model=MODEL_NAME,
+                policy=LATENCY_POLICY,
+                messages=messages,
+                max_tokens=2048,
+                temperature=0.1,
+            )
+        with span("formatting"):
+            return strip_model_thoughts(response["choices"][0]["message"]["content"])
+    except Exception as e:
+        print(f"LLM request failed: {e}")
+        mark_failed()
+        return API_ERROR_MESSAGE
+
+async def agenerate_answer(question: str, contexts: List[Dict]) -> str:
+    """Async variant of `generate_answer` for callers that run many questions concurrently."""
+    messages = build_answer_messages(question, contexts)
+    try:
+        with span("llm_call"):
+            response = await atimed_completion(
+                get_llm(),
+                "pdf.generate_answer",
+                model=MODEL_NAME,
+                policy=LATENCY_POLICY,
+                messages=messages,
+                max_tokens=2048,
+                temperature=0.1,
+            )
+        with span("formatting"):
+            return strip_model_thoughts(response["choices"][0]["message"]["content"])
+    except Exception as e:
+        print(f"LLM request failed: {e}")
+        mark_failed()
+        return API_ERROR_MESSAGE
+
 
+def stream_answer(question: str, contexts: List[Dict]) -> Iterator[str]:
+    """Streaming variant of `generate_answer`: yields answer text as it arrives, without thought blocks."""
+    messages = build_answer_messages(question, contexts)
     try:
-        response = llm.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{
-                "role": "user",
-                "content": message_content,
-            }],
-            max_tokens=2048,
-            temperature=0.1,
-        )
-        return strip_model_thoughts(response.choices[0].message.content)
+        with span("llm_call"):
+            yield from strip_thoughts_stream(get_llm().stream(model=MODEL_NAME, messages=messages, max_tokens=2048, temperature=0.1))
     except Exception as e:
-        return "Sorry, I was unable to generate an answer due to an API error."
+        print(f"LLM request failed: {e}")
+        mark_failed()
+        yield API_ERROR_MESSAGE
@@ -1,5 +1,4 @@
 import os
-import json
 import hashlib
 import base64
 from pathlib import Path
@@ -10,6 +9,9 @@ from chunking.parser.fastpdf.util import OCRMode
 from chunking.parser import FastPDF
 from chunking.base import CType
 from src.constants import PDF_DIR, OUTPUT_DIR, IMAGES_DIR, CHUNK_RECORDS_FILE
+from src.chunk_io import ChunkWriter
+from src.dedup import DedupStats, collapse_duplicates
+from src.captioning import CaptionStats, caption_records, get_captioner
 
 def _hash_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()[:16]
@@ -79,19 +81,28 @@ def main():
     PDF_DIR.mkdir(exist_ok=True)
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    all_records: List[Dict] = []
-    for pdf_file in PDF_DIR.glob("*.pdf"):
-        print(f"Parsing {pdf_file} ...")
-        records = parse_pdf(pdf_file)
-        all_records.extend(records)
+    # records are written as each PDF is parsed, so memory holds one document at a time
+    stats = DedupStats()
+    captioner, caption_stats = get_captioner(), CaptionStats() # PDF_CAPTIONER: local (default), vlm or off
+    with ChunkWriter(CHUNK_RECORDS_FILE) as writer:
+        for pdf_file in PDF_DIR.glob("*.pdf"):
+            print(f"Parsing {pdf_file} ...")
+            # drop running headers/footers and merge repeated chunks before they are embedded
+            records = collapse_duplicates(parse_pdf(pdf_file), stats)
+            # describe figures and tables once here, so answers need not send the images
+            if captioner:
+                records = caption_records(records, captioner, caption_stats)
+            for rec in records:
+                # convert bbox to float
+                rec['bbox'] = [float(x) for x in rec['bbox']]
+                writer.write(rec)
 
-    print(f"Total chunks parsed: {len(all_records)}")
-
-    with open(CHUNK_RECORDS_FILE, "w", encoding="utf-8") as f:
-        for rec in all_records:
-            # convert bbox to float
-            rec['bbox'] = [float(x) for x in rec['bbox']]
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    print(f"Deduplication: {stats.summary()}")
+    if captioner:
+        print(f"Captioning ({captioner.name}): {caption_stats.summary()}")
+    print(f"Total chunks parsed: {writer.written}")
+    if writer.report.skipped:
+        print(f"Skipped invalid chunks: {writer.report.summary()}")
     print(f"Wrote chunks to {CHUNK_RECORDS_FILE}")
 
 if __name__ == "__main__":
@@ -1,20 +1,50 @@
-import chromadb
-from sentence_transformers import SentenceTransformer  
-from pathlib import Path
-from typing import List, Dict, Any
+import os
 import json
-from src.constants import CHUNK_RECORDS_FILE, COLLECTION_NAME
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from src.constants import CHUNK_RECORDS_FILE
+from src.embeddings import DEFAULT_MODEL_NAME, get_embedder
+from src.chunk_io import ReadReport, iter_chunk_records
+from src.chunk_store import ChunkHandle, ChunkRecord, TextStore
+from src.index_backends import create_index
+from src.hierarchy import HIERARCHICAL_ENV_VAR, TOP_DOCS, TOP_PAGES, PageSummaries
+from genai_common.tracing import span
 
 
 class VectorStore:
-    """A thin wrapper around ChromaDB for textual chunks."""
+    """
+    Embeds and indexes textual chunks; the texts live in a sidecar `TextStore`.
 
-    def __init__(self, persist_directory: str = "vector_store", model_name: str = "sentence-transformers/all-MiniLM-L6-v2", st = None) -> None:
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(name=COLLECTION_NAME)
-        self.embedder = SentenceTransformer(model_name)
+    The vectors go to the index picked by `index_backend` / VECTOR_INDEX_BACKEND (see src/index_backends.py):
+    a ChromaDB collection, optionally sharded per PDF and with its HNSW parameters from `hnsw`,
+    or an exact NumPy matrix search.
+    Page and document vectors are maintained alongside; with `hierarchical` queries first pick
+    candidate documents and pages and only search their chunks (see src/hierarchy.py).
+    """
+
+    def __init__(self, persist_directory: str = "vector_store", model_name: str = DEFAULT_MODEL_NAME, st = None,
+                 embedding_backend: Optional[str] = None, shard_by_pdf: Optional[bool] = None,
+                 index_backend: Optional[str] = None, hierarchical: Optional[bool] = None,
+                 hnsw: Optional[Dict[str, int]] = None) -> None:
+        self.index = create_index(persist_directory, index_backend, shard_by_pdf, hnsw)
+        self.pages = PageSummaries(persist_directory)
+        if hierarchical is None:
+            hierarchical = os.getenv(HIERARCHICAL_ENV_VAR, "").lower() in {"1", "true", "yes"}
+        self.hierarchical = hierarchical
+        self.model_name = model_name
+        self.embedding_backend = embedding_backend
+        self.text_store = TextStore(Path(persist_directory))
         self.st = st
 
+    @property
+    def embedder(self):
+        # loaded on first encode, so opening an existing store does not import torch;
+        # shared per process; EMBEDDING_BACKEND picks torch, torch-int8, onnx or onnx-int8 (see src/embeddings.py)
+        return get_embedder(self.model_name, self.embedding_backend)
+
     def _sanitize_metadata(self, meta: Dict[str, Any]) -> Dict[str, Any]:
         sanitized: Dict[str, Any] = {}
         for k, v in meta.items():
@@ -29,24 +59,55 @@ class VectorStore:
 
     def _embed_texts(self, texts: List[str]):
         try:
-            embeddings = self.embedder.encode(texts, show_progress_bar=False, normalize_embeddings=True)
-            return [e.tolist() if hasattr(e, "tolist") else list(e) for e in embeddings]
+            with span("embedding"):
+                embeddings = self.embedder.encode(texts)
+            return embeddings.tolist()
         except Exception as e:
             print(f"Embedding generation failed: {e}")
-            dim = self.embedder.get_sentence_embedding_dimension() or 384
-            return [[0.0] * dim for _ in texts]
-
-    def add_documents(self, docs: List[Dict[str, Any]]):
-        embeddings = self._embed_texts([d["text"] for d in docs])
-        sanitized_metas = [self._sanitize_metadata(d) for d in docs]
-        self.collection.add(
-            ids=[d["id"] for d in docs],
-            embeddings=embeddings,
-            metadatas=sanitized_metas,
-        )
+            return [[0.0] * self.embedder.dimension for _ in texts]
+
+    def add_documents(self, docs: List[ChunkRecord]):
+        self.add_embedded(docs, self._embed_texts([d.text for d in docs]))
+
+    def add_embedded(self, docs: List[ChunkRecord], embeddings: Union[List[List[float]], np.ndarray]):
+        """Writes documents whose embeddings (lists or a float32 matrix) were computed elsewhere (e.g. by the bulk ingest pool)."""
+        docs = [d if isinstance(d, ChunkRecord) else ChunkRecord.from_dict(d) for d in docs]
+        sanitized_metas = [self._sanitize_metadata(d.metadata()) for d in docs]
+        # chunks already stored (e.g. a repeated ingest) must not be counted twice in the page sums
+        new_rows = [i for i, d in enumerate(docs) if d.id not in self.text_store.index]
+        # texts first: a chunk that is searchable must also be readable
+        self.text_store.append(docs)
+        with span(f"{self.index.name}_add"):
+            self.index.add([d.id for d in docs], embeddings, sanitized_metas)
+        if new_rows:
+            self.pages.add([sanitized_metas[i] for i in new_rows], [embeddings[i] for i in new_rows])
+
+    def count(self) -> int:
+        return self.index.count()
+
+    def flush(self):
+        """Persists buffered index writes (a no-op for Chroma, which writes on every add) and the page sums."""
+        self.index.flush()
+        self.pages.flush()
+
+    def rebuild_hierarchy(self) -> int:
+        """Recomputes the page and document vectors from the index without re-embedding; returns the pages."""
+        return self.pages.rebuild(self.index)
+
+    def rebuild_shards(self, page_size: int = 1024) -> int:
+        """Builds the per-PDF Chroma shards from the global collection; returns the chunks copied."""
+        if not hasattr(self.index, "rebuild_shards"):
+            raise ValueError(f"The {self.index.name} index has no shards.")
+        return self.index.rebuild_shards(page_size)
+
+    def reset(self):
+        """Drops the index and the texts, e.g. before re-indexing with a different embedding model."""
+        self.index.reset()
+        self.pages.reset()
+        self.text_store.clear()
 
     def ingest_from_jsonl(self, jsonl_path: Path = CHUNK_RECORDS_FILE, batch_size: int = 64):
-        buffer: List[Dict[str, Any]] = []
+        buffer: List[ChunkRecord] = []
         if not jsonl_path.exists():
             if self.st:
                 self.st.error(f"Error: Chunk records file not found at {jsonl_path}. Please run `parse_ingest.py` first.")
@@ -54,40 +115,59 @@ class VectorStore:
                 print(f"Error: Chunk records file not found at {jsonl_path}. Please run `parse_ingest.py` first.")
             return
 
-        with open(jsonl_path, "r", encoding="utf-8") as f:
-            for line in f:
-                buffer.append(json.loads(line))
-                if len(buffer) >= batch_size:
-                    self.add_documents(buffer)
-                    buffer.clear()
+        report = ReadReport()
+        for record in iter_chunk_records(jsonl_path, report):
+            buffer.append(ChunkRecord.from_dict(record))
+            if len(buffer) >= batch_size:
+                self.add_documents(buffer)
+                buffer.clear()
         if buffer:
             self.add_documents(buffer)
+        self.flush()
 
-    def query(self, text: str, k: int = 5, source_pdf: str | None = None):
-        embedding = self._embed_texts([text])[0]
-        query_kwargs = dict(
-            query_embeddings=[embedding],
-            n_results=k,
-            include=["metadatas", "distances"],
-        )
-        if source_pdf:
-            query_kwargs["where"] = {"source_pdf": source_pdf}
-
-        res = self.collection.query(**query_kwargs)
+        print(f"Ingested {jsonl_path}: {report.summary()}")
+        if report.skipped and self.st:
+            self.st.warning(f"Skipped {report.skipped} malformed chunk records in {jsonl_path}: {report.summary()}")
+        return report
 
-        meta_lists = res.get("metadatas", []) or []
-        dist_lists = res.get("distances", []) or []
+    def query(self, text: str, k: int = 5, source_pdf: str | None = None) -> List[ChunkHandle]:
+        return self.query_batch([text], k=k, source_pdf=source_pdf)[0]
 
-        if not meta_lists:
+    def query_batch(self, texts: List[str], k: int = 5, source_pdf: str | None = None) -> List[List[ChunkHandle]]:
+        """
+        Embeds all texts in one call and runs a single multi-query against the index (or, when
+        hierarchical, one query per text over its candidate pages).
+        Results are `ChunkHandle`s whose text is read from the text store on first access.
+        """
+        if not texts:
             return []
+        return self.query_embedded(self._embed_texts(texts), k=k, source_pdf=source_pdf)
 
-        first_meta_list = meta_lists[0]
-        first_dist_list = dist_lists[0] if dist_lists else []
+    def query_embedded(self, embeddings: List[List[float]], k: int = 5, source_pdf: str | None = None) -> List[List[ChunkHandle]]:
+        """`query_batch` for query vectors computed elsewhere (e.g. by the retrieval benchmark)."""
+        candidates = None
+        if self.hierarchical:
+            with span("hierarchy_select"):
+                candidates = self.pages.select(embeddings, TOP_DOCS, TOP_PAGES, source_pdf, self.index.count())
+        with span(f"{self.index.name}_query"):
+            if candidates is None:
+                id_lists, meta_lists, dist_lists = self.index.query(embeddings, k, source_pdf)
+            else:
+                id_lists, meta_lists, dist_lists = [], [], []
+                for embedding, pages in zip(embeddings, candidates):
+                    ids, metas, dists = self.index.query([embedding], k, pages=pages) if pages else ([[]], [[]], [[]])
+                    id_lists.append(ids[0] if ids else [])
+                    meta_lists.append(metas[0] if metas else [])
+                    dist_lists.append(dists[0] if dists else [])
 
-        results: List[Dict[str, Any]] = []
-        for meta_raw, dist in zip(first_meta_list, first_dist_list):
-            if meta_raw is None: continue
-            meta_dict = dict(meta_raw)
-            meta_dict["distance"] = dist
-            results.append(meta_dict)
-        return results
\ No newline at end of file
+        batch_results: List[List[ChunkHandle]] = []
+        for i in range(len(embeddings)):
+            ids = id_lists[i] if i < len(id_lists) else []
+            metas = meta_lists[i] if i < len(meta_lists) else []
+            dists = dist_lists[i] if i < len(dist_lists) else []
+            results: List[ChunkHandle] = []
+            for chunk_id, meta_raw, dist in zip(ids, metas, dists):
+                if meta_raw is None: continue
+                results.append(ChunkHandle(chunk_id, meta_raw, dist, self.text_store))
+            batch_results.append(results)
+        return batch_results
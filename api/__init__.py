@@ -0,0 +1 @@
+# headless HTTP API for both assistants (run from the repository root with `python -m api.server`)
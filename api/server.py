@@ -0,0 +1,206 @@
+"""
+Headless ASGI service for the blood bank and PDF assistants.
+
+Usage (from the repository root):
+    python -m api.server --port 8000 --workers 4
+    uvicorn api.server:app --port 8000 --workers 4
+
+Endpoints:
+    POST /bloodbank/ask          {"question", "history": [[q, a], ...], "tool_log": {turn index: [call, ...]}}
+    POST /bloodbank/ask/stream   same body, answer streamed as server-sent events
+    POST /pdf/ask                {"question", "pdf": <file name or null>, "k": 15}
+    POST /pdf/ask/stream         same body, contexts then answer streamed as server-sent events
+    GET  /healthz, GET /metrics  (Prometheus text format)
+
+The service is stateless: conversation history travels with each request, so any number of workers
+or hosts can sit behind a load balancer. Each worker loads the dataset, the vector store and the
+embedding model once at startup and shares the pooled LLM client across all requests.
+KFSHRC_API_ASSISTANTS (default "bloodbank,pdf") limits which assistants a deployment serves.
+Streaming responses emit `delta` events with answer text and a final `done` event with the cleaned answer.
+"""
+import os
+import sys
+import json
+import argparse
+import contextvars
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from genai_common import metrics
+from genai_common.llm_client import get_client
+from genai_common.tracing import trace
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+ASSISTANTS_ENV_VAR = "KFSHRC_API_ASSISTANTS"
+
+# warm per-worker resources, filled in by `lifespan`
+_resources: Dict[str, Any] = {}
+
+
+class BloodbankQuestion(BaseModel):
+    question: str
+    history: List[List[str]] = []
+    tool_log: Dict[int, List[str]] = {} # tool calls by turn index in `history`
+
+
+class PdfQuestion(BaseModel):
+    question: str
+    pdf: Optional[str] = None
+    k: int = 15
+
+
+def enabled_assistants() -> List[str]:
+    return [name.strip() for name in os.getenv(ASSISTANTS_ENV_VAR, "bloodbank,pdf").split(",") if name.strip()]
+
+
+def load_bloodbank() -> None:
+    sys.path.insert(0, str(REPO_ROOT / "LLM-CSV"))
+    import conversation_manager  # loads the dataset and the tool definitions
+    import data_handler
+
+    data_handler.start_delta_watcher()  # no-op unless BLOODBANK_DELTA_DIR is set
+    _resources["bloodbank"] = conversation_manager
+
+
+def load_pdf() -> None:
+    sys.path.insert(0, str(REPO_ROOT / "LLM-PDF1"))
+    from src import llm
+    from src.vector_store import VectorStore
+
+    vs = VectorStore()
+    if vs.count() == 0:
+        print("Warning: the vector store is empty; run the PDF ingest before serving /pdf/ask.")
+    vs._embed_texts(["warm-up"])  # load the embedding model weights before the first request
+    _resources["pdf"] = (vs, llm)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loaders = {"bloodbank": load_bloodbank, "pdf": load_pdf}
+    for name in enabled_assistants():
+        if name not in loaders:
+            raise ValueError(f"Unknown assistant '{name}' in {ASSISTANTS_ENV_VAR}, expected one of {sorted(loaders)}.")
+        await run_in_threadpool(loaders[name])
+    get_client()
+    yield
+
+
+app = FastAPI(title="KFSHRC GenAI assistants", lifespan=lifespan)
+
+
+def _require(name: str):
+    if name not in _resources:
+        raise HTTPException(status_code=404, detail=f"The {name} assistant is not enabled on this server.")
+    return _resources[name]
+
+
+def _single_context(events: Iterator[str]) -> Iterator[str]:
+    """
+    Starlette advances a sync generator with one threadpool call per item, each in a fresh copy of
+    the context; run every step in the same context so the request trace spans the whole stream.
+    """
+    context = contextvars.copy_context()
+    while True:
+        try:
+            yield context.run(next, events)
+        except StopIteration:
+            return
+
+
+def _sse(event: str, payload: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.get("/healthz")
+def healthz() -> Dict:
+    return {"status": "ok", "assistants": sorted(_resources), "llm_circuit": get_client().async_client.breaker.state}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> str:
+    return metrics.render_prometheus()
+
+
+@app.post("/bloodbank/ask")
+async def bloodbank_ask(body: BloodbankQuestion) -> Dict:
+    conversation_manager = _require("bloodbank")
+    history = [tuple(turn) for turn in body.history]
+    tool_log = dict(body.tool_log)
+
+    def answer():
+        with trace("bloodbank.ask") as request_trace:
+            response = conversation_manager.run_conversation(body.question, history=history, tool_log=tool_log)
+        return response, request_trace
+
+    turn = conversation_manager.turn_index(history, body.question)
+    response, request_trace = await run_in_threadpool(answer)
+    return {"answer": response, "tool_calls": tool_log.get(turn, []), "timing": request_trace.to_dict()}
+
+
+@app.post("/bloodbank/ask/stream")
+def bloodbank_ask_stream(body: BloodbankQuestion) -> StreamingResponse:
+    conversation_manager = _require("bloodbank")
+    history = [tuple(turn) for turn in body.history]
+    tool_log = dict(body.tool_log)
+
+    # a sync generator: Starlette iterates it in the threadpool, so blocking LLM and pandas calls are fine here
+    def events() -> Iterator[str]:
+        with trace("bloodbank.ask") as request_trace:
+            parts = []
+            for delta in conversation_manager.stream_conversation(body.question, history=history, tool_log=tool_log):
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+        yield _sse("done", {
+            "answer": conversation_manager.strip_model_thoughts("".join(parts)),
+            "tool_calls": tool_log.get(conversation_manager.turn_index(history, body.question), []),
+            "timing": request_trace.to_dict(),
+        })
+
+    return StreamingResponse(_single_context(events()), media_type="text/event-stream")
+
+
+@app.post("/pdf/ask")
+async def pdf_ask(body: PdfQuestion) -> Dict:
+    vs, llm = _require("pdf")
+    with trace("pdf.ask") as request_trace:
+        contexts = await run_in_threadpool(vs.query, body.question, body.k, body.pdf)
+        answer = await llm.agenerate_answer(body.question, contexts)
+    return {"answer": answer, "contexts": [ctx.to_dict() for ctx in contexts], "timing": request_trace.to_dict()}
+
+
+@app.post("/pdf/ask/stream")
+def pdf_ask_stream(body: PdfQuestion) -> StreamingResponse:
+    vs, llm = _require("pdf")
+
+    def events() -> Iterator[str]:
+        with trace("pdf.ask") as request_trace:
+            contexts = vs.query(body.question, k=body.k, source_pdf=body.pdf)
+            yield _sse("contexts", {"contexts": [ctx.to_dict() for ctx in contexts]})
+            parts = []
+            for delta in llm.stream_answer(body.question, contexts):
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+        yield _sse("done", {"answer": llm.strip_model_thoughts("".join(parts)), "timing": request_trace.to_dict()})
+
+    return StreamingResponse(_single_context(events()), media_type="text/event-stream")
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve both assistants over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes; each loads its own models")
+    args = parser.parse_args()
+    uvicorn.run("api.server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
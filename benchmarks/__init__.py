@@ -0,0 +1 @@
+# headless benchmarks and measurement scripts (run from the repository root with `python -m benchmarks.<name>`)
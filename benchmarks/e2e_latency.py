@@ -0,0 +1,208 @@
+"""
+End-to-end latency benchmark for both assistants with a stubbed LLM.
+
+Usage (from the repository root):
+    python -m benchmarks.e2e_latency --assistant both --sessions 1,4,8 --llm-latency 0.2
+    python -m benchmarks.e2e_latency --replay data/cassettes   # recorded responses instead of the stub
+
+Runs the blood bank `TEST_CASES` through `run_conversation` and the `TEST_QUESTIONS_PER_PDF`
+workload through `VectorStore.query` + `generate_answer`, and reports per-stage p50/p95/p99
+(embedding, chroma_query or numpy_query, context_build, image_encoding, llm_call, tool_execution, formatting),
+throughput at each number of concurrent sessions, and peak RSS. The LLM is the local mock server
+with a fixed latency (or a cassette replay), so runs are reproducible and need no network.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from genai_common.mock_server import start_mock_server
+from genai_common.tracing import Trace, trace
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# scripted tool calls for the blood bank TEST_CASES, so the data tools run exactly as in production
+STUB_TOOL_CALLS = {
+    "How many female patients received Plasma Thawed?":
+        {"filters": {"GENDER": {"eq": "F"}, "PRODUCT_CAT": {"eq": "Plasma Thawed"}}, "aggregations": {"ENCNTR_ID": "count"}},
+    "What is the maximum transfused volume recorded?":
+        {"aggregations": {"TRANSFUSED_VOL": "max"}},
+    "How many patients have AB-negative blood type?":
+        {"filters": {"CUR_ABO_CD": {"eq": "AB"}, "CUR_RH_CD": {"eq": "NEG"}}, "aggregations": {"ENCNTR_ID": "count"}},
+    "How many transfusions occurred in 2021?":
+        {"filters": {"TRANSFUSION_DT": {"gte": "2021-01-01", "lte": "2021-12-31"}}, "aggregations": {"ENCNTR_ID": "count"}},
+    "What is the average age of male patients?":
+        {"filters": {"GENDER": {"eq": "M"}}, "aggregations": {"AGE": "mean"}},
+    "What is the total volume of Bone Marrow transfusions?":
+        {"filters": {"PRODUCT_CAT": {"eq": "Bone Marrow"}}, "aggregations": {"TRANSFUSED_VOL": "sum"}},
+    "How many patients older than 50 received any product?":
+        {"filters": {"AGE": {"gt": 50}}, "aggregations": {"ENCNTR_ID": "count"}},
+    "What is the earliest transfusion date recorded?":
+        {"aggregations": {"TRANSFUSION_DT": "min"}},
+    "How many transfusions were done in KFHI-Adult Cardiac Surgery?":
+        {"filters": {"MED_SERVICE": {"contains": "KFHI-Adult Cardiac Surgery"}}, "aggregations": {"ENCNTR_ID": "count"}},
+    "What is the average transfused volume for patients with O blood type?":
+        {"filters": {"CUR_ABO_CD": {"eq": "O"}}, "aggregations": {"TRANSFUSED_VOL": "mean"}},
+}
+
+STAGES = ["embedding", "chroma_query", "numpy_query", "context_build", "image_encoding", "llm_call", "tool_execution", "formatting"]
+
+
+def stub_responder(request: Dict) -> Dict:
+    """Answers tool-result turns with a short summary and known questions with their scripted tool call."""
+    messages = request.get("messages", [])
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        return {"role": "assistant", "content": f"Stub answer based on: {str(last.get('content'))[:200]}"}
+    if request.get("tools") and request.get("tool_choice") != "none":
+        args = STUB_TOOL_CALLS.get(last.get("content"))
+        if args is not None:
+            return {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_0", "type": "function",
+                "function": {"name": "query_data", "arguments": json.dumps(args)},
+            }]}
+    return {"role": "assistant", "content": "Stub answer from the retrieved context. [1]"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # 1-based rank ceil(p/100 * n); the rounding to 9 places drops float noise (0.07 * 100 = 7.000000000000001)
+    index = max(0, min(len(ordered) - 1, math.ceil(round(pct / 100 * len(ordered), 9)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_sessions(name: str, items: List, handler: Callable, sessions: int) -> Tuple[List[Trace], float]:
+    """Runs the full workload once per session, `sessions` at a time, and returns all traces and the wall time."""
+    def run_session(_):
+        traces = []
+        for item in items:
+            with trace(name) as t:
+                handler(item)
+            traces.append(t)
+        return traces
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(run_session, range(sessions)))
+    return [t for session in results for t in session], time.perf_counter() - start
+
+
+def summarize(traces: List[Trace], wall_s: float) -> Dict:
+    stages = {}
+    for stage in STAGES + ["total"]:
+        if stage == "total":
+            values = [t.duration_s for t in traces]
+        else:
+            values = [t.stage_totals()[stage] for t in traces if stage in t.stage_totals()]
+        if values:
+            stages[stage] = {p: percentile(values, q) * 1000 for p, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+            stages[stage]["count"] = len(values)
+    return {"requests": len(traces), "wall_s": wall_s, "throughput_rps": len(traces) / wall_s if wall_s else 0.0, "stages_ms": stages}
+
+
+def bloodbank_workload():
+    sys.path.insert(0, str(REPO_ROOT / "LLM-CSV"))
+    from conversation_manager import run_conversation
+    from evaluation import TEST_CASES
+
+    def handler(case):
+        run_conversation(case["question"], history=[], tool_log={})
+
+    return TEST_CASES, handler
+
+
+def pdf_workload():
+    sys.path.insert(0, str(REPO_ROOT / "LLM-PDF1"))
+    from src.llm import generate_answer
+    from src.vector_store import VectorStore
+    from src.constants import TEST_QUESTIONS_PER_PDF, CHUNK_RECORDS_FILE
+
+    vs = VectorStore()
+    if vs.count() == 0:
+        if not CHUNK_RECORDS_FILE.exists():
+            raise SystemExit(f"{CHUNK_RECORDS_FILE} not found; run the PDF ingest before benchmarking.")
+        vs.ingest_from_jsonl()
+
+    items = [(pdf, case["question"]) for pdf, cases in TEST_QUESTIONS_PER_PDF.items() for case in cases]
+
+    def handler(item):
+        pdf, question = item
+        generate_answer(question, vs.query(question, k=15, source_pdf=pdf))
+
+    return items, handler
+
+
+def print_report(name: str, sessions: int, summary: Dict) -> None:
+    print(f"\n== {name} | {sessions} concurrent session(s) | {summary['requests']} requests in {summary['wall_s']:.2f}s "
+          f"| {summary['throughput_rps']:.2f} req/s")
+    print(f"{'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, s in summary["stages_ms"].items():
+        print(f"{stage:<16}{s['count']:>7}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assistant", choices=["bloodbank", "pdf", "both"], default="both")
+    parser.add_argument("--sessions", default="1,4", help="comma separated concurrent session counts")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--replay", metavar="DIR", help="replay recorded completions from this cassette directory")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    session_counts = [int(n) for n in args.sessions.split(",")]
+
+    server = None
+    if args.replay:
+        os.environ["LLM_CASSETTE_MODE"] = "replay"
+        os.environ["LLM_CASSETTE_DIR"] = args.replay
+    else:
+        server = start_mock_server(base_latency_s=args.llm_latency, per_uncached_token_s=0.0, responder=stub_responder)
+        os.environ["FIREWORKS_BASE_URL"] = server.base_url
+    os.environ.setdefault("FIREWORKS_API_KEY", "benchmark")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(max(session_counts) * 2))
+    # measure the pipeline itself: no hedged duplicates or model fallbacks unless explicitly configured
+    for prefix in ("BLOODBANK", "PDF"):
+        os.environ.setdefault(f"{prefix}_HEDGE_AFTER_S", "0")
+        os.environ.setdefault(f"{prefix}_FALLBACK_MODELS", "")
+
+    workloads = []
+    if args.assistant in ("bloodbank", "both"):
+        workloads.append(("bloodbank", *bloodbank_workload()))
+    if args.assistant in ("pdf", "both"):
+        workloads.append(("pdf", *pdf_workload()))
+
+    results = {}
+    for name, items, handler in workloads:
+        run_sessions(name, items[:1], handler, 1)  # warm-up: model loading, first connection
+        for sessions in session_counts:
+            summary = summarize(*run_sessions(name, items, handler, sessions))
+            results[f"{name}@{sessions}"] = summary
+            print_report(name, sessions, summary)
+
+    rss = peak_rss_mb()
+    print(f"\nPeak RSS: {rss:.0f} MB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "peak_rss_mb": rss}, f, indent=2)
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Parity check and CPU benchmark for the PDF embedding backends.
+
+Usage (from the repository root):
+    python -m benchmarks.embedding_backends --backends torch,torch-int8,onnx,onnx-int8 --limit 2000
+
+Encodes the ingested chunks (data/chunks.jsonl, or the evaluation questions and reference answers
+when nothing has been ingested yet) with every backend and reports:
+  - parity with the torch fp32 embeddings: mean/min cosine per text and the overlap of each test
+    question's top-k neighbours, i.e. whether an existing collection can be queried with the backend;
+  - ingest throughput (texts/s at the ingest batch size) and single-query latency p50/p95.
+Exits with status 1 when a backend falls below --min-cosine, so it can gate a backend switch.
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.e2e_latency import percentile
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "LLM-PDF1"))
+
+from src.chunk_io import iter_chunk_records  # noqa: E402
+from src.constants import CHUNK_RECORDS_FILE, TEST_QUESTIONS_PER_PDF  # noqa: E402
+from src.embeddings import BACKENDS, DEFAULT_MODEL_NAME, Embedder  # noqa: E402
+
+
+def load_corpus(limit: int) -> List[str]:
+    if CHUNK_RECORDS_FILE.exists():
+        texts = []
+        for record in iter_chunk_records(CHUNK_RECORDS_FILE):
+            if record["text"]:
+                texts.append(record["text"])
+            if len(texts) >= limit:
+                break
+        return texts
+    print(f"{CHUNK_RECORDS_FILE} not found; using the evaluation questions and answers as the corpus.")
+    cases = [case for cases in TEST_QUESTIONS_PER_PDF.values() for case in cases]
+    return [c["expected_response"] for c in cases] + [c["question"] for c in cases]
+
+
+def top_k(query_vectors: np.ndarray, corpus_vectors: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(query_vectors @ corpus_vectors.T), axis=1)[:, :k]
+
+
+def run_backend(backend: str, model_name: str, corpus: List[str], queries: List[str], batch_size: int) -> Dict:
+    start = time.perf_counter()
+    embedder = Embedder(model_name, backend)
+    load_s = time.perf_counter() - start
+
+    embedder.encode(corpus[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    corpus_vectors = embedder.encode(corpus, batch_size=batch_size)
+    ingest_s = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embedder.encode([query])[0])
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "load_s": load_s,
+        "texts_per_s": len(corpus) / ingest_s,
+        "query_p50_ms": percentile(latencies, 50) * 1000,
+        "query_p95_ms": percentile(latencies, 95) * 1000,
+        "corpus_vectors": corpus_vectors,
+        "query_vectors": np.stack(query_vectors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma separated backends; torch is always the reference")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--limit", type=int, default=2000, help="maximum number of chunks to encode")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10, help="neighbours compared for retrieval parity")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="minimum mean cosine to the torch embeddings")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.limit)
+    queries = [case["question"] for cases in TEST_QUESTIONS_PER_PDF.values() for case in cases]
+    backends = ["torch"] + [b for b in args.backends.split(",") if b and b != "torch"]
+    k = min(args.k, len(corpus))
+    print(f"Corpus: {len(corpus)} texts, {len(queries)} queries, model {args.model}\n")
+
+    results = {}
+    reference = None
+    for backend in backends:
+        try:
+            result = run_backend(backend, args.model, corpus, queries, args.batch_size)
+        except Exception as e:  # e.g. onnxruntime not installed
+            print(f"{backend}: skipped ({type(e).__name__}: {e})")
+            continue
+        if reference is None:
+            reference = result
+        cosines = np.sum(result["corpus_vectors"] * reference["corpus_vectors"], axis=1)
+        ours, theirs = top_k(result["query_vectors"], result["corpus_vectors"], k), top_k(reference["query_vectors"], reference["corpus_vectors"], k)
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ours, theirs)])
+        results[backend] = {
+            "load_s": round(result["load_s"], 2),
+            "texts_per_s": round(result["texts_per_s"], 1),
+            "query_p50_ms": round(result["query_p50_ms"], 2),
+            "query_p95_ms": round(result["query_p95_ms"], 2),
+            "mean_cosine": round(float(cosines.mean()), 4),
+            "min_cosine": round(float(cosines.min()), 4),
+            f"top{k}_overlap": round(float(overlap), 3),
+        }
+
+    print(f"{'backend':<12}{'load s':>8}{'texts/s':>10}{'q p50 ms':>10}{'q p95 ms':>10}{'mean cos':>10}{'min cos':>9}{f'top{k} ovl':>10}")
+    for backend, r in results.items():
+        print(f"{backend:<12}{r['load_s']:>8.2f}{r['texts_per_s']:>10.1f}{r['query_p50_ms']:>10.2f}{r['query_p95_ms']:>10.2f}"
+              f"{r['mean_cosine']:>10.4f}{r['min_cosine']:>9.4f}{r[f'top{k}_overlap']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [b for b, r in results.items() if r["mean_cosine"] < args.min_cosine]
+    if failed:
+        print(f"\nParity check FAILED for: {', '.join(failed)} (mean cosine below {args.min_cosine})")
+        sys.exit(1)
+    print("\nParity check passed for all benchmarked backends.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Import-time profile of the two Streamlit apps.
+
+Usage (from the repository root):
+    python -m benchmarks.import_profile --top 15
+    python -m benchmarks.import_profile --assistant pdf --strict
+
+Imports the modules each app imports at startup in a fresh interpreter under `python -X importtime`
+and reports the total import time, the slowest top-level imports, and whether any heavy dependency
+(torch, bert_score, sentence_transformers, chromadb, ...) was imported or the LLM client's event loop
+thread was started. With --strict the script exits with status 1 when one was, so a regression to
+eager loading fails the check.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("torch", "bert_score", "sentence_transformers", "transformers", "chromadb", "onnxruntime")
+GENAI_COMMON_IMPORTS = ["genai_common.metrics", "genai_common.tracing", "genai_common.streamlit_panels", "genai_common.api_client"]
+# what each app imports at module level; the apps themselves cannot be imported outside `streamlit run`
+APPS: Dict[str, Dict] = {
+    "bloodbank": {
+        "path": REPO_ROOT / "LLM-CSV",
+        "imports": ["streamlit", "pandas", "data_handler", "conversation_manager", "evaluation"] + GENAI_COMMON_IMPORTS,
+    },
+    "pdf": {
+        "path": REPO_ROOT / "LLM-PDF1",
+        "imports": ["streamlit", "pandas", "src.llm", "src.vector_store", "src.constants"] + GENAI_COMMON_IMPORTS,
+    },
+}
+
+PROBE = """
+{imports}
+import sys, json, threading
+print(json.dumps({{
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+    "llm_client_started": any(t.name == "llm-client-loop" for t in threading.enumerate()),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Returns (module, self us, cumulative us) for the top-level imports in `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # nested imports are indented below the module that triggered them
+        if name.startswith(" ") and not name.startswith("  "):
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    # everything up to `site` is interpreter startup, the same for any program
+    names = [name for name, _, _ in rows]
+    return rows[names.index("site") + 1:] if "site" in names else rows
+
+
+def profile(app: str) -> Dict:
+    config = APPS[app]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(config["path"]), str(REPO_ROOT)]))
+    code = PROBE.format(imports="\n".join(f"import {m}" for m in config["imports"]), heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{app} imports failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}")
+    top_level = parse_importtime(result.stderr)
+    return {
+        "total_ms": sum(c for _, _, c in top_level) / 1000,
+        "slowest": sorted(top_level, key=lambda row: -row[2]),
+        **json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assistant", choices=["bloodbank", "pdf", "both"], default="both")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 when a heavy dependency is loaded eagerly")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    apps = list(APPS) if args.assistant == "both" else [args.assistant]
+    results, failed = {}, []
+    for app in apps:
+        try:
+            r = profile(app)
+        except RuntimeError as e:
+            print(f"{app}: {e}")
+            failed.append(app)
+            continue
+        results[app] = r
+        print(f"\n{app}: {r['total_ms']:.0f} ms to import")
+        print(f"  {'module':<40}{'cumulative ms':>15}{'self ms':>10}")
+        for name, self_us, cumulative_us in r["slowest"][:args.top]:
+            print(f"  {name:<40}{cumulative_us / 1000:>15.1f}{self_us / 1000:>10.1f}")
+        print(f"  heavy modules imported: {', '.join(r['heavy']) or 'none'}")
+        print(f"  LLM client started: {'yes' if r['llm_client_started'] else 'no'}")
+        if r["heavy"] or r["llm_client_started"]:
+            failed.append(app)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.strict and failed:
+        print(f"\nEager loading detected for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures prompt-prefix caching for both assistants against the local mock LLM server.
+
+Usage (from the repository root):
+    python -m benchmarks.prompt_cache --turns 5
+
+Every completion is recorded with its prompt tokens, cached tokens, latency and a fingerprint of
+its fixed prefix (system prompt + tool schemas). A healthy run shows a single prefix per label
+and a high cached share from the second request on.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+from genai_common import prompt_metrics
+from genai_common.mock_server import start_mock_server
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def run_bloodbank(turns: int) -> None:
+    sys.path.insert(0, str(REPO_ROOT / "LLM-CSV"))
+    from conversation_manager import run_conversation
+    from evaluation import TEST_CASES
+
+    history, tool_log = [], {}
+    for case in TEST_CASES[:turns]:
+        answer = run_conversation(case["question"], history=history, tool_log=tool_log)
+        history.append((case["question"], answer))
+
+
+def run_pdf(turns: int) -> None:
+    sys.path.insert(0, str(REPO_ROOT / "LLM-PDF1"))
+    from src.llm import generate_answer
+    from src.constants import TEST_QUESTIONS_PER_PDF
+
+    for pdf_name, cases in TEST_QUESTIONS_PER_PDF.items():
+        # stand-in contexts: the reference answers of the other questions for the same PDF
+        contexts = [{"source_pdf": pdf_name, "page": i + 1, "text": c["expected_response"]} for i, c in enumerate(cases)]
+        for case in cases[:turns]:
+            generate_answer(case["question"], contexts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5, help="questions to send per assistant / per PDF")
+    parser.add_argument("--assistant", choices=["bloodbank", "pdf", "both"], default="both")
+    args = parser.parse_args()
+
+    server = start_mock_server()
+    os.environ["FIREWORKS_BASE_URL"] = server.base_url
+    os.environ.setdefault("FIREWORKS_API_KEY", "mock-key")
+    os.environ[prompt_metrics.MEASURE_ENV_VAR] = "1"
+
+    if args.assistant in ("bloodbank", "both"):
+        run_bloodbank(args.turns)
+    if args.assistant in ("pdf", "both"):
+        run_pdf(args.turns)
+
+    print()
+    print(prompt_metrics.format_report())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
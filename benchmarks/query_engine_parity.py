@@ -0,0 +1,136 @@
+"""
+Parity check (and timing) of the blood bank query engines: pandas vs DuckDB over Parquet.
+
+Usage (from the repository root):
+    python -m benchmarks.query_engine_parity
+    python -m benchmarks.query_engine_parity --parquet "/data/extracts/*.parquet" --csv /data/extract.csv
+
+Runs every case in `CASES` (the argument combinations the `query_data` and `get_unique_values` tools
+accept: each operator, aggregation function, grouping, resample period and the error paths) through
+both engines and compares the results: equal keys and order, numbers equal up to float rounding,
+NaN equal to NaN, and errors on the same cases. The Parquet file is created from the CSV in a
+temporary directory unless --parquet is given. Exits with status 1 on any mismatch.
+"""
+import os
+import sys
+import math
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "LLM-CSV"))
+
+CASES: List[Dict[str, Any]] = [
+    {},
+    {"filters": {"GENDER": {"eq": "F"}, "PRODUCT_CAT": {"eq": "Plasma Thawed"}}, "aggregations": {"MRN": "nunique"}},
+    {"aggregations": {"TRANSFUSED_VOL": "max"}},
+    {"filters": {"CUR_ABO_CD": {"eq": "AB"}, "CUR_RH_CD": {"eq": "NEG"}}, "aggregations": {"MRN": "nunique"}},
+    {"filters": {"TRANSFUSION_DT": {"gte": "2021-01-01", "lte": "2021-12-31"}}, "aggregations": {"ENCNTR_ID": "count"}},
+    {"filters": {"GENDER": {"eq": "M"}}, "aggregations": {"AGE": "mean"}},
+    {"filters": {"PRODUCT_CAT": {"eq": "Bone Marrow"}}, "aggregations": {"TRANSFUSED_VOL": "sum"}},
+    {"filters": {"AGE": {"gt": 50}}, "aggregations": {"MRN": "nunique"}},
+    {"filters": {"MED_SERVICE": {"contains": "adult cardiac"}}},
+    {"filters": {"CUR_ABO_CD": {"eq": "O"}}, "aggregations": {"TRANSFUSED_VOL": "mean", "AGE": "std"}},
+    {"filters": {"GENDER": {"neq": "F"}, "AGE": {"lt": 30}}, "aggregations": {"TRANSFUSED_VOL": "sum", "MRN": "count"}},
+    {"aggregations": {"TRANSFUSED_VOL": "sum"}, "group_by": ["PRODUCT_CAT"]},
+    {"aggregations": {"TRANSFUSED_VOL": "mean", "MRN": "nunique"}, "group_by": ["CUR_ABO_CD", "CUR_RH_CD"]},
+    {"aggregations": {"AGE": "max"}, "group_by": ["AGE"]},
+    {"aggregations": {"TRANSFUSED_VOL": "sum"}, "time_resample_period": "M"},
+    {"aggregations": {"ENCNTR_ID": "count"}, "time_resample_period": "W"},
+    {"filters": {"MED_SERVICE": {"contains": "Oncology"}}, "aggregations": {"TRANSFUSED_VOL": "sum", "AGE": "mean"}, "time_resample_period": "D"},
+    {"filters": {"TRANSFUSION_DT": {"gte": "2021-03-01", "lte": "2021-05-31"}}, "aggregations": {"ENCNTR_ID": "count"},
+     "group_by": ["PRODUCT_CAT"], "time_resample_period": "W"},
+    {"filters": {"AGE": {"gte": 80}}, "aggregations": {"TRANSFUSED_VOL": "sum", "MRN": "nunique"},
+     "group_by": ["GENDER", "CUR_RH_CD"], "time_resample_period": "M"},
+    {"filters": {"AGE": {"gt": 200}}, "aggregations": {"TRANSFUSED_VOL": "sum"}},
+    {"filters": {"NOT_A_COLUMN": {"eq": 1}}},
+    {"filters": {"AGE": {"between": 1}}},
+    {"aggregations": {"NOT_A_COLUMN": "sum"}},
+    {"unique": "PRODUCT_CAT"},
+    {"unique": "CUR_ABO_CD"},
+    {"unique": "NOT_A_COLUMN"},
+]
+
+
+def same(a: Any, b: Any, rel_tol: float = 1e-9) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a) == list(b) and all(same(a[k], b[k], rel_tol) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y, rel_tol) for x, y in zip(a, b))
+    try:
+        fa, fb = float(a), float(b)
+    except (TypeError, ValueError):
+        return a == b
+    if math.isnan(fa) or math.isnan(fb):
+        return math.isnan(fa) and math.isnan(fb)
+    return math.isclose(fa, fb, rel_tol=rel_tol, abs_tol=1e-12)
+
+
+def run(engine, case: Dict[str, Any]):
+    start = time.perf_counter()
+    if "unique" in case:
+        result = engine["unique"](case["unique"])
+    else:
+        result = engine["query"](**case)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(REPO_ROOT / "RAG" / "synthetic_data_blood_bank.csv"))
+    parser.add_argument("--parquet", help="Parquet file or glob with the same data (default: converted from --csv)")
+    parser.add_argument("--verbose", action="store_true", help="print both results of mismatching cases")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    os.environ["BLOODBANK_QUERY_ENGINE"] = "pandas" # data_handler loads the CSV for the reference engine
+    import duckdb_engine
+
+    # the CSV has no appended deltas, so none are read from the deployment's delta directory either
+    os.environ[duckdb_engine.DELTA_PARQUET_ENV_VAR] = tempfile.mkdtemp()
+    if args.parquet:
+        os.environ[duckdb_engine.PARQUET_ENV_VAR] = args.parquet
+    else:
+        parquet_file = os.path.join(tempfile.mkdtemp(), "blood_bank.parquet")
+        os.environ[duckdb_engine.PARQUET_ENV_VAR] = duckdb_engine.export_parquet(args.csv, parquet_file)
+
+    import data_handler
+    if args.csv != str(REPO_ROOT / "RAG" / "synthetic_data_blood_bank.csv"):
+        import pandas as pd
+        data_handler.df = pd.read_csv(args.csv, parse_dates=["TRANSFUSION_DT"])
+
+    engines = {
+        "pandas": {"query": data_handler.query_data_pandas, "unique": data_handler.get_unique_values_pandas},
+        "duckdb": {"query": duckdb_engine.query_data, "unique": duckdb_engine.get_unique_values},
+    }
+    run(engines["duckdb"], {}) # opens the connection outside the timings
+
+    mismatches = 0
+    totals = {name: 0.0 for name in engines}
+    for i, case in enumerate(CASES):
+        (expected, t_pandas), (actual, t_duckdb) = run(engines["pandas"], case), run(engines["duckdb"], case)
+        totals["pandas"] += t_pandas
+        totals["duckdb"] += t_duckdb
+        if "error" in expected or "error" in actual:
+            ok = "error" in expected and "error" in actual
+        else:
+            ok = same(expected, actual)
+        status = "ok" if ok else "MISMATCH"
+        print(f"{i:>3} {status:<9} pandas {t_pandas * 1000:7.1f} ms  duckdb {t_duckdb * 1000:7.1f} ms  {case}")
+        if not ok:
+            mismatches += 1
+            if args.verbose:
+                print(f"    pandas: {str(expected)[:500]}\n    duckdb: {str(actual)[:500]}")
+
+    print(f"\nTotal: pandas {totals['pandas'] * 1000:.0f} ms, duckdb {totals['duckdb'] * 1000:.0f} ms over {len(CASES)} cases")
+    if mismatches:
+        print(f"{mismatches} of {len(CASES)} cases differ.")
+        sys.exit(1)
+    print("All cases match.")
+
+
+if __name__ == "__main__":
+    main()
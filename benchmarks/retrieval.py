@@ -0,0 +1,246 @@
+"""
+Retrieval-only benchmark for the PDF assistant: recall@k, MRR and search latency, without LLM calls.
+
+Usage (from the repository root, after `parse_ingest.py` has written data/chunks.jsonl):
+    python -m benchmarks.retrieval
+    python -m benchmarks.retrieval --k 3,5,10,15 --backends torch,onnx-int8 --hnsw-m 16,32 --hnsw-ef 10,50,200
+
+Gold labels: the reference answer of every TEST_QUESTIONS_PER_PDF question is compared with the
+chunks of its PDF by IDF-weighted overlap of their content words (citation markers like "[1, 4]"
+removed). Chunks scoring at least GOLD_RATIO of the best chunk are gold; questions whose best
+chunk covers less than MIN_OVERLAP of the answer are left out as unanswerable from the text. The
+labels are written to --gold and reused while that file exists, so they can be reviewed and
+corrected by hand; --relabel recomputes them.
+
+For each embedding backend all chunks are embedded once, then indexed in a temporary store per
+index configuration: the exact NumPy index (the reference, so a lower HNSW recall is the
+approximation's loss) and Chroma for each combination of --hnsw-m and --hnsw-construction-ef,
+queried with each --hnsw-ef (search_ef). Every question is searched within its PDF, as the app
+does, through `VectorStore.query_embedded` at each k, and the table reports:
+
+    recall@k  share of the question's gold chunks in the top k
+    hit@k     share of questions with a gold chunk in the top k
+    MRR       mean reciprocal rank of the first gold chunk in the top k (0 when there is none)
+    p50/p95   search latency per query; the question embedding time is reported per backend
+"""
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import itertools
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.e2e_latency import percentile
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "LLM-PDF1"))
+
+from src.chunk_io import iter_chunk_records  # noqa: E402
+from src.chunk_store import ChunkRecord  # noqa: E402
+from src.constants import CHUNK_RECORDS_FILE, OUTPUT_DIR, TEST_QUESTIONS_PER_PDF  # noqa: E402
+from src.embeddings import DEFAULT_MODEL_NAME, Embedder  # noqa: E402
+from src.vector_store import VectorStore  # noqa: E402
+
+DEFAULT_GOLD_FILE = OUTPUT_DIR / "retrieval_gold.json"
+MIN_OVERLAP = 0.5 # weighted share of the answer's words the best chunk must contain
+GOLD_RATIO = 0.8 # chunks within this share of the best score are gold too
+ADD_BATCH = 256
+
+_WORD_RE = re.compile(r"\w+")
+_CITATION_RE = re.compile(r"\[\d+(?:\s*,\s*\d+)*\]")
+STOPWORDS = frozenset("""
+a an the of and or in on at to for by with from as into than then that this these those there it its
+is are was were be been being has have had do does did not no can could would should will may might
+which what who whom whose when where why how all any each both more most other some such only own so
+very also their they them he she his her we our you your i us about after before between during over
+under again further once here same too just if but because while up down out off per via
+""".split())
+
+
+def terms(text: str) -> set:
+    words = _WORD_RE.findall(_CITATION_RE.sub(" ", text.lower()))
+    return {w for w in words if w not in STOPWORDS and (len(w) > 1 or w.isdigit())}
+
+
+def load_records() -> List[Dict[str, Any]]:
+    if not CHUNK_RECORDS_FILE.exists():
+        raise SystemExit(f"{CHUNK_RECORDS_FILE} not found; run `parse_ingest.py` first.")
+    return list(iter_chunk_records(CHUNK_RECORDS_FILE))
+
+
+def label_gold(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gold chunks per test question, by IDF-weighted overlap of the reference answer with each chunk."""
+    by_pdf: Dict[str, List[Tuple[Dict[str, Any], set]]] = {}
+    for record in records:
+        if record.get("text"):
+            by_pdf.setdefault(record["source_pdf"], []).append((record, terms(record["text"])))
+
+    labels = []
+    for pdf, cases in TEST_QUESTIONS_PER_PDF.items():
+        chunks = by_pdf.get(pdf, [])
+        document_freq: Dict[str, int] = {}
+        for _, chunk_terms in chunks:
+            for term in chunk_terms:
+                document_freq[term] = document_freq.get(term, 0) + 1
+        idf = lambda term: math.log((len(chunks) + 1) / (document_freq.get(term, 0) + 1)) + 1.0
+        for case in cases:
+            answer = terms(case["expected_response"])
+            total = sum(idf(t) for t in answer)
+            scores = [sum(idf(t) for t in answer & chunk_terms) / total if total else 0.0 for _, chunk_terms in chunks]
+            best = max(scores, default=0.0)
+            gold = [record for (record, _), score in zip(chunks, scores) if best >= MIN_OVERLAP and score >= GOLD_RATIO * best]
+            labels.append({
+                "source_pdf": pdf,
+                "question": case["question"],
+                "best_overlap": round(best, 3),
+                "gold_ids": [r["id"] for r in gold],
+                "gold_pages": sorted({p for r in gold for p in (r.get("pages") or [r["page"]])}),
+            })
+    return labels
+
+
+def load_gold(path: Path, records: List[Dict[str, Any]], relabel: bool) -> List[Dict[str, Any]]:
+    if path.exists() and not relabel:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    labels = label_gold(records)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(labels, f, indent=2, ensure_ascii=False)
+    print(f"Wrote gold labels for {sum(1 for l in labels if l['gold_ids'])} of {len(labels)} questions to {path}")
+    return labels
+
+
+def score(ranked_ids: List[str], gold: set) -> Tuple[float, float, float]:
+    """(recall, hit, reciprocal rank) of one ranked result list."""
+    found = [i for i, chunk_id in enumerate(ranked_ids) if chunk_id in gold]
+    return len(found) / len(gold), float(bool(found)), 1.0 / (found[0] + 1) if found else 0.0
+
+
+def index_configs(args) -> List[Tuple[str, Dict[str, Any]]]:
+    """(label, VectorStore keyword arguments) per index configuration; stores sharing `build` share an index."""
+    configs = [("numpy exact", {"index_backend": "numpy", "build": "numpy"})]
+    for m, construction_ef in itertools.product(args.hnsw_m, args.hnsw_construction_ef):
+        for search_ef in args.hnsw_ef:
+            configs.append((f"chroma M={m} efc={construction_ef} ef={search_ef}", {
+                "index_backend": "chroma",
+                "hnsw": {"M": m, "construction_ef": construction_ef, "search_ef": search_ef},
+                "build": f"chroma-{m}-{construction_ef}",
+            }))
+    if args.hierarchical:
+        configs += [(f"{label} +hierarchy", {**kwargs, "hierarchical": True}) for label, kwargs in configs]
+    return configs
+
+
+def evaluate(vs: VectorStore, cases: List[Dict[str, Any]], query_vectors: np.ndarray, k: int) -> Dict[str, float]:
+    recalls, hits, reciprocal_ranks, latencies = [], [], [], []
+    for case, vector in zip(cases, query_vectors):
+        start = time.perf_counter()
+        results = vs.query_embedded([vector.tolist()], k=k, source_pdf=case["source_pdf"])[0]
+        latencies.append(time.perf_counter() - start)
+        recall, hit, rr = score([r.id for r in results], set(case["gold_ids"]))
+        recalls.append(recall)
+        hits.append(hit)
+        reciprocal_ranks.append(rr)
+    return {
+        "recall": float(np.mean(recalls)),
+        "hit": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def run_backend(backend: str, args, records: List[Dict[str, Any]], cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    embedder = Embedder(args.model, backend)
+    start = time.perf_counter()
+    chunk_vectors = embedder.encode([r.get("text") or "" for r in records], batch_size=args.batch_size)
+    print(f"\n{backend}: embedded {len(records)} chunks in {time.perf_counter() - start:.1f}s")
+    latencies, query_vectors = [], []
+    for case in cases:
+        start = time.perf_counter()
+        query_vectors.append(embedder.encode([case["question"]])[0])
+        latencies.append(time.perf_counter() - start)
+    print(f"{backend}: question embedding p50 {percentile(latencies, 50) * 1000:.2f} ms, p95 {percentile(latencies, 95) * 1000:.2f} ms")
+
+    rows = []
+    builds: Dict[str, str] = {}
+    workdir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    try:
+        for label, kwargs in index_configs(args):
+            kwargs = dict(kwargs)
+            build = kwargs.pop("build")
+            try:
+                if build not in builds:
+                    builds[build] = str(Path(workdir) / build)
+                    vs = VectorStore(builds[build], args.model, embedding_backend=backend, **kwargs)
+                    docs = [ChunkRecord.from_dict(r) for r in records]
+                    for i in range(0, len(docs), ADD_BATCH):
+                        vs.add_embedded(docs[i:i + ADD_BATCH], chunk_vectors[i:i + ADD_BATCH].tolist())
+                    vs.flush()
+                # reopening applies this configuration's search settings to the built index
+                vs = VectorStore(builds[build], args.model, embedding_backend=backend, **kwargs)
+            except ImportError as e:  # e.g. chromadb not installed
+                print(f"{label}: skipped ({e})")
+                continue
+            evaluate(vs, cases[:1], np.stack(query_vectors[:1]), max(args.k))  # warm-up (page cache, lazy loads)
+            for k in args.k:
+                rows.append({"backend": backend, "index": label, "k": k, **evaluate(vs, cases, np.stack(query_vectors), k)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int_list, default=[5, 10, 15], help="comma separated k values (the app uses 15)")
+    parser.add_argument("--backends", default="torch", help="comma separated embedding backends (see src/embeddings.py)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int_list, default=[16], help="Chroma HNSW M values")
+    parser.add_argument("--hnsw-construction-ef", type=int_list, default=[100], help="Chroma HNSW construction_ef values")
+    parser.add_argument("--hnsw-ef", type=int_list, default=[10, 50, 100], help="Chroma HNSW search_ef values")
+    parser.add_argument("--hierarchical", action="store_true", help="also run every configuration with the hierarchical query")
+    parser.add_argument("--gold", type=Path, default=DEFAULT_GOLD_FILE, help="gold label file, written when missing")
+    parser.add_argument("--relabel", action="store_true", help="recompute the gold labels even when --gold exists")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    records = load_records()
+    labels = load_gold(args.gold, records, args.relabel)
+    cases = [label for label in labels if label["gold_ids"]]
+    if not cases:
+        raise SystemExit("No question has gold chunks; check the test questions against the ingested PDFs.")
+    print(f"{len(records)} chunks, {len(cases)} of {len(labels)} questions with gold chunks "
+          f"(mean {np.mean([len(c['gold_ids']) for c in cases]):.1f} per question)")
+
+    rows = []
+    for backend in [b for b in args.backends.split(",") if b]:
+        try:
+            rows += run_backend(backend, args, records, cases)
+        except Exception as e:  # e.g. onnxruntime not installed
+            print(f"{backend}: skipped ({type(e).__name__}: {e})")
+
+    print(f"\n{'backend':<12}{'index':<36}{'k':>4}{'recall':>9}{'hit':>8}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in rows:
+        print(f"{r['backend']:<12}{r['index']:<36}{r['k']:>4}{r['recall']:>9.3f}{r['hit']:>8.3f}{r['mrr']:>8.3f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-worker memory of the blood bank dataset, private copies vs the shared Arrow file.
+
+Usage (from the repository root, Linux only: reads /proc/<pid>/smaps_rollup):
+    python -m benchmarks.shared_dataset_memory --workers 4 --scale 50
+
+Starts `--workers` processes that each import `data_handler` and run the first `--queries`
+query_engine_parity cases, once with BLOODBANK_SHARED_DATASET=0 (every worker parses the CSV into
+its own DataFrame) and once with BLOODBANK_SHARED_DATASET=1 (every worker maps shared_dataset's
+Arrow file). While all workers are alive it reports each worker's private memory and PSS (shared
+pages divided among the processes mapping them), which is what adding one more worker costs.
+`--scale` repeats the CSV rows to stand in for a larger extract; `--queries 0` measures the loaded
+dataset alone, without the memory the queries leave allocated.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from benchmarks.query_engine_parity import CASES
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+WORKER = """
+import sys
+sys.path.insert(0, "LLM-CSV")
+import data_handler
+from benchmarks.query_engine_parity import CASES
+for case in CASES[:int(sys.argv[1])]:
+    if "unique" not in case:
+        data_handler.query_data_pandas(**case)
+print("ready", flush=True)
+sys.stdin.read()  # stay alive until every worker has been measured
+"""
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), "pss": fields.get("Pss", 0)}
+
+
+def start_worker(env: Dict[str, str], queries: int) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", WORKER, str(queries)], cwd=REPO_ROOT, env=env, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(proc: subprocess.Popen) -> None:
+    for line in proc.stdout:
+        if line.strip() == "ready":
+            return
+    raise RuntimeError("a worker failed to load the dataset")
+
+
+def run(workers: int, shared: bool, csv_path: str, arrow_path: str, queries: int) -> List[Dict[str, float]]:
+    env = dict(os.environ, BLOODBANK_QUERY_ENGINE="pandas", BLOODBANK_SHARED_DATASET="1" if shared else "0",
+               BLOODBANK_CSV=csv_path, BLOODBANK_ARROW_FILE=arrow_path, BLOODBANK_QUERY_CACHE_SIZE="0",
+               PYTHONPATH=str(REPO_ROOT))
+    procs = []
+    try:
+        if shared:
+            # a separate process parses the CSV and publishes the file, so every measured worker only attaches
+            procs.append(start_worker(env, 0))
+            wait_ready(procs[-1])
+            procs.pop().communicate("")
+        for _ in range(workers):
+            procs.append(start_worker(env, queries))
+        for proc in procs:
+            wait_ready(proc)
+        return [memory_mb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.communicate("")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scale", type=int, default=20, help="times the CSV rows are repeated")
+    parser.add_argument("--queries", type=int, default=len(CASES), help="parity cases each worker runs before it is measured")
+    parser.add_argument("--csv", default=str(REPO_ROOT / "RAG" / "synthetic_data_blood_bank.csv"))
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "blood_bank.csv")
+    pd.concat([pd.read_csv(args.csv)] * args.scale).to_csv(csv_path, index=False)
+    arrow_path = os.path.join(tmp, "blood_bank.arrow")
+    print(f"{args.workers} workers, {args.scale}x the CSV rows")
+
+    for shared in (False, True):
+        sizes = run(args.workers, shared, csv_path, arrow_path, args.queries)
+        private = sum(s["private"] for s in sizes) / len(sizes)
+        pss = sum(s["pss"] for s in sizes) / len(sizes)
+        label = "shared Arrow file" if shared else "private DataFrames"
+        print(f"  {label:<20} per worker: private {private:7.1f} MB, PSS {pss:7.1f} MB; all workers PSS {pss * len(sizes):7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# helpers shared by the LLM-CSV and LLM-PDF1 assistants
@@ -0,0 +1,48 @@
+"""
+Client for the headless assistants API (api/server.py).
+
+When KFSHRC_API_URL is set (e.g. http://127.0.0.1:8000) the Streamlit apps send questions to the
+API instead of running the pipeline in-process, so many UI sessions share one pool of warm workers.
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+API_URL_ENV_VAR = "KFSHRC_API_URL"
+API_TIMEOUT_S = 120.0
+
+_http: Optional[httpx.Client] = None
+_http_lock = threading.Lock()
+
+
+def api_url() -> Optional[str]:
+    url = os.getenv(API_URL_ENV_VAR)
+    return url.rstrip("/") if url else None
+
+
+def _client() -> httpx.Client:
+    global _http
+    with _http_lock:
+        if _http is None:
+            _http = httpx.Client(base_url=api_url(), timeout=httpx.Timeout(API_TIMEOUT_S, connect=5.0))
+        return _http
+
+
+def ask_bloodbank(question: str, history: List[Tuple[str, str]], tool_log: Dict[int, List[str]]) -> Dict:
+    """Returns {"answer", "tool_calls", "timing"}; raises httpx.HTTPError when the API is unreachable."""
+    response = _client().post("/bloodbank/ask", json={
+        "question": question,
+        "history": [list(turn) for turn in history],
+        "tool_log": tool_log,
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+def ask_pdf(question: str, pdf: Optional[str], k: int = 15) -> Dict:
+    """Returns {"answer", "contexts", "timing"}; raises httpx.HTTPError when the API is unreachable."""
+    response = _client().post("/pdf/ask", json={"question": question, "pdf": pdf, "k": k})
+    response.raise_for_status()
+    return response.json()
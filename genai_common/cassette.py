@@ -0,0 +1,111 @@
+"""
+Record-and-replay layer for LLM completions, for offline and deterministic benchmarks.
+
+With LLM_CASSETTE_MODE=record every completion is stored on disk under a hash of its request;
+with LLM_CASSETTE_MODE=replay the stored response is returned instead of calling the API, so the
+evaluation tabs and benchmarks run without network access. Replay latency is simulated with
+LLM_CASSETTE_LATENCY_S: a number of seconds, or `recorded` to reuse each call's recorded latency.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from genai_common import metrics
+from genai_common.errors import LLMError
+
+MODE_ENV_VAR = "LLM_CASSETTE_MODE"
+DIR_ENV_VAR = "LLM_CASSETTE_DIR"
+LATENCY_ENV_VAR = "LLM_CASSETTE_LATENCY_S"
+DEFAULT_CASSETTE_DIR = Path("data") / "cassettes"
+MODES = {"off", "record", "replay"}
+
+_events_total = metrics.counter("genai_llm_cassette_events_total", "Cassette hits, misses and recordings.")
+
+
+class CassetteMissError(LLMError):
+    """Raised in replay mode when no recording exists for a request."""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Stable hash of a request: canonical JSON with sorted keys."""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def replay_enabled() -> bool:
+    return os.getenv(MODE_ENV_VAR, "off").lower() == "replay"
+
+
+class Cassette:
+    def __init__(self, directory: Path, mode: str = "replay", latency: Optional[str] = None) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {sorted(MODES)}.")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.latency = latency
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        mode = os.getenv(MODE_ENV_VAR, "off").lower()
+        if mode == "off":
+            return None
+        return cls(Path(os.getenv(DIR_ENV_VAR) or DEFAULT_CASSETTE_DIR), mode, os.getenv(LATENCY_ENV_VAR))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def load(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self._path(request_key(request))
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, request: Dict[str, Any], response: Dict[str, Any], latency_s: float) -> None:
+        key = request_key(request)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "model": request.get("model"), "latency_s": latency_s, "response": response}
+        # write atomically so concurrent recorders never leave a half-written file behind
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.recorded += 1
+        _events_total.inc(event="recorded")
+
+    def _replay_delay(self, entry: Dict[str, Any]) -> float:
+        if not self.latency:
+            return 0.0
+        if self.latency == "recorded":
+            return float(entry.get("latency_s") or 0.0)
+        return float(self.latency)
+
+    async def wrap(self, request: Dict[str, Any], call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Serves `request` from the cassette in replay mode, or runs `call()` and stores its result in record mode."""
+        if self.mode == "replay":
+            entry = self.load(request)
+            if entry is None:
+                self.misses += 1
+                _events_total.inc(event="miss")
+                raise CassetteMissError(f"No cassette recording for request {request_key(request)[:12]} (model {request.get('model')}).")
+            self.hits += 1
+            _events_total.inc(event="hit")
+            delay = self._replay_delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return entry["response"]
+
+        start = time.perf_counter()
+        response = await call()
+        if self.mode == "record":
+            self.save(request, response, time.perf_counter() - start)
+        return response
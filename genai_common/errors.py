@@ -0,0 +1,13 @@
+from typing import Optional
+
+
+class LLMError(Exception):
+    """Raised when a completion request fails after all retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(LLMError):
+    """Raised without contacting the API while the circuit breaker is open."""
@@ -0,0 +1,133 @@
+"""
+Tail-latency controls for LLM calls: hedged requests and model fallback tiers.
+
+A `LatencyPolicy` is an ordered list of `ModelTier`s. The first tier's model is called right away;
+if it has not answered after `hedge_after_s`, an identical request is fired and the first of the two
+to finish wins. Once a tier has used up its `budget_s`, the next (smaller/faster) tier is launched
+while the earlier requests keep racing, so falling back never throws away a nearly finished answer.
+The call fails only when every launched request has failed or the total budget is spent.
+"""
+import os
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from genai_common import metrics
+from genai_common.errors import LLMError
+
+# counters for hedges fired/won and fallbacks used, readable by the metrics layer
+stats: Dict[str, int] = {"requests": 0, "hedges_fired": 0, "hedge_wins": 0, "fallbacks_fired": 0, "fallback_wins": 0}
+_stats_lock = threading.Lock()
+_events_total = metrics.counter("genai_llm_latency_policy_events_total", "Hedging and fallback events.")
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        stats[key] += 1
+    _events_total.inc(event=key)
+
+
+@dataclass
+class ModelTier:
+    model: str
+    budget_s: float
+    hedge_after_s: Optional[float] = None  # None disables hedging for this tier
+
+
+@dataclass
+class LatencyPolicy:
+    tiers: List[ModelTier] = field(default_factory=list)
+
+    @property
+    def total_budget_s(self) -> float:
+        return sum(t.budget_s for t in self.tiers)
+
+    @classmethod
+    def from_env(cls, prefix: str, primary_model: str, fallback_models: List[str],
+                 budget_s: float, hedge_after_s: Optional[float], fallback_budget_s: float) -> "LatencyPolicy":
+        """
+        Builds a policy from defaults that can be overridden per assistant with
+        {prefix}_BUDGET_S, {prefix}_HEDGE_AFTER_S (0 disables hedging),
+        {prefix}_FALLBACK_MODELS (comma separated, empty disables fallback) and {prefix}_FALLBACK_BUDGET_S.
+        """
+        budget_s = float(os.getenv(f"{prefix}_BUDGET_S", budget_s))
+        hedge_env = os.getenv(f"{prefix}_HEDGE_AFTER_S")
+        if hedge_env is not None:
+            hedge_after_s = float(hedge_env) or None
+        fallback_env = os.getenv(f"{prefix}_FALLBACK_MODELS")
+        if fallback_env is not None:
+            fallback_models = [m.strip() for m in fallback_env.split(",") if m.strip()]
+        fallback_budget_s = float(os.getenv(f"{prefix}_FALLBACK_BUDGET_S", fallback_budget_s))
+
+        tiers = [ModelTier(primary_model, budget_s, hedge_after_s)]
+        tiers += [ModelTier(model, fallback_budget_s) for model in fallback_models]
+        return cls(tiers)
+
+
+def _launch_schedule(policy: LatencyPolicy):
+    """Returns (start offset in seconds, tier index, is_hedge) tuples in launch order."""
+    events = []
+    offset = 0.0
+    for i, tier in enumerate(policy.tiers):
+        events.append((offset, i, False))
+        if tier.hedge_after_s is not None and tier.hedge_after_s < tier.budget_s:
+            events.append((offset + tier.hedge_after_s, i, True))
+        offset += tier.budget_s
+    return sorted(events)
+
+
+async def complete_with_policy(chat: Callable[..., Awaitable[Dict]], request: Dict, policy: LatencyPolicy) -> Dict:
+    """
+    Runs `chat(**request)` under `policy`, overriding `model` per tier, and returns the first successful response.
+    """
+    if not policy.tiers:
+        return await chat(**request)
+
+    _count("requests")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + policy.total_budget_s
+    schedule = _launch_schedule(policy)
+    pending: Dict[asyncio.Task, tuple] = {}
+    last_error: Optional[BaseException] = None
+
+    def launch():
+        _, tier_index, is_hedge = schedule.pop(0)
+        if is_hedge:
+            _count("hedges_fired")
+        elif tier_index > 0:
+            _count("fallbacks_fired")
+        task = asyncio.ensure_future(chat(**{**request, "model": policy.tiers[tier_index].model}))
+        pending[task] = (tier_index, is_hedge)
+
+    launch()
+    try:
+        while pending or schedule:
+            if not pending:
+                # everything in flight failed: move on to the next launch without waiting
+                launch()
+                continue
+            next_launch = started + schedule[0][0] if schedule else deadline
+            timeout = max(0.0, min(next_launch, deadline) - loop.time())
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                tier_index, is_hedge = pending.pop(task)
+                if task.exception() is None:
+                    if is_hedge:
+                        _count("hedge_wins")
+                    if tier_index > 0:
+                        _count("fallback_wins")
+                    return task.result()
+                last_error = task.exception()
+
+            if not done:
+                if loop.time() >= deadline:
+                    raise LLMError(f"LLM call exceeded its {policy.total_budget_s:.1f}s latency budget.")
+                if schedule:
+                    launch()
+        raise last_error or LLMError("LLM call failed on every tier.")
+    finally:
+        for task in pending:
+            task.cancel()
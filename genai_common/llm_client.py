@@ -0,0 +1,368 @@
+"""
+Shared client for the OpenAI-compatible Fireworks chat completions API.
+
+`AsyncLLMClient` owns one pooled `httpx.AsyncClient` and adds per-call timeouts, retries with
+jittered exponential backoff, a concurrency limit and a circuit breaker. `LLMClient` runs it on a
+dedicated event loop thread so the synchronous Streamlit code (and async callers running on their
+own loops) all share the same connection pool and limits within a process.
+
+Responses are returned as plain dicts in the OpenAI format. `stream()` yields the content deltas of
+a streamed (server-sent events) completion instead.
+"""
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+
+from genai_common import metrics
+from genai_common.errors import LLMError, CircuitOpenError
+from genai_common.cassette import Cassette
+from genai_common.hedging import LatencyPolicy, complete_with_policy
+
+DEFAULT_BASE_URL = "https://api.fireworks.ai/inference/v1"
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_retries_total = metrics.counter("genai_llm_retries_total", "LLM request attempts that were retried.")
+_failures_total = metrics.counter("genai_llm_failures_total", "LLM calls that failed after all retries, by reason.")
+
+
+@dataclass
+class ClientConfig:
+    api_key: str = ""
+    base_url: str = DEFAULT_BASE_URL
+    timeout_s: float = 60.0
+    connect_timeout_s: float = 5.0
+    max_retries: int = 3
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    max_concurrency: int = 8
+    max_connections: int = 20
+    breaker_failure_threshold: int = 5
+    breaker_reset_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        """Reads FIREWORKS_API_KEY / FIREWORKS_BASE_URL and optional LLM_* tuning variables."""
+        return cls(
+            api_key=os.getenv("FIREWORKS_API_KEY", ""),
+            base_url=os.getenv("FIREWORKS_BASE_URL") or DEFAULT_BASE_URL,
+            timeout_s=float(os.getenv("LLM_TIMEOUT_S", cls.timeout_s)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", cls.max_retries)),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", cls.max_concurrency)),
+        )
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects calls for `reset_s` seconds.
+    After that a single trial call is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_s: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_s else "open"
+
+    def acquire(self) -> Optional[str]:
+        """Admits a call: "closed" for a normal call, "trial" for the half-open trial, None to reject it."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_cancelled(self, admitted: Optional[str]) -> None:
+        # a trial that ends without an outcome (e.g. the losing side of a hedge, cancelled during
+        # backoff) must not keep the circuit half-open forever; other calls do not own the trial
+        if admitted != "trial":
+            return
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_s, base_s * 2**attempt)]."""
+    return random.uniform(0, min(max_s, base_s * (2 ** attempt)))
+
+
+class AsyncLLMClient:
+    def __init__(self, config: ClientConfig, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.config = config
+        self.breaker = CircuitBreaker(config.breaker_failure_threshold, config.breaker_reset_s)
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self) -> None:
+        # created lazily so they bind to the loop that actually runs the requests
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.config.base_url,
+                headers={"Authorization": f"Bearer {self.config.api_key}"} if self.config.api_key else None,
+                timeout=httpx.Timeout(self.config.timeout_s, connect=self.config.connect_timeout_s),
+                limits=httpx.Limits(max_connections=self.config.max_connections,
+                                    max_keepalive_connections=self.config.max_connections),
+                transport=self._transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+
+    async def chat(self, timeout_s: Optional[float] = None, **request) -> Dict[str, Any]:
+        """
+        Sends a chat completion request (OpenAI format) and returns the decoded response.
+        Retries timeouts, connection errors and retryable status codes; raises LLMError otherwise.
+        """
+        self._ensure_started()
+        admitted = self.breaker.acquire()
+        if admitted is None:
+            _failures_total.inc(reason="circuit_open")
+            raise CircuitOpenError("LLM circuit breaker is open; skipping request.")
+        try:
+            return await self._chat_attempts(timeout_s, request)
+        except BaseException:
+            # covers cancellation during the request or the backoff sleep and errors outside the HTTP
+            # call (e.g. decoding the response); a settled trial has already cleared the flag
+            self.breaker.record_cancelled(admitted)
+            raise
+
+    async def _chat_attempts(self, timeout_s: Optional[float], request: Dict[str, Any]) -> Dict[str, Any]:
+        timeout = httpx.Timeout(timeout_s, connect=self.config.connect_timeout_s) if timeout_s else httpx.USE_CLIENT_DEFAULT
+        last_error: Optional[LLMError] = None
+        for attempt in range(self.config.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    response = await self._http.post("/chat/completions", json=request, timeout=timeout)
+                if response.status_code == 200:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        # e.g. a truncated body or a proxy's error page; retried like a failed request
+                        last_error = LLMError(f"LLM API returned a body that is not JSON ({e}): {response.text[:200]}", 200)
+                    else:
+                        self.breaker.record_success()
+                        return data
+                else:
+                    last_error = LLMError(f"LLM API returned {response.status_code}: {response.text[:200]}", response.status_code)
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        # the service answered, so a bad request does not count against the breaker
+                        self.breaker.record_success()
+                        raise last_error
+                    retry_after = response.headers.get("Retry-After")
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = LLMError(f"LLM request failed: {type(e).__name__}: {e}")
+
+            if attempt < self.config.max_retries:
+                _retries_total.inc()
+                delay = backoff_delay(attempt, self.config.backoff_base_s, self.config.backoff_max_s)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, min(float(retry_after), self.config.backoff_max_s))
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        _failures_total.inc(reason=str(last_error.status_code or "transport"))
+        raise last_error
+
+    async def chat_stream(self, **request) -> AsyncIterator[str]:
+        """
+        Streams a chat completion and yields its content deltas. Failures before the first delta are
+        retried like `chat`; once content has been yielded an error is raised to the caller as LLMError.
+        """
+        self._ensure_started()
+        admitted = self.breaker.acquire()
+        if admitted is None:
+            _failures_total.inc(reason="circuit_open")
+            raise CircuitOpenError("LLM circuit breaker is open; skipping request.")
+        attempts = self._stream_attempts(request)
+        try:
+            async for delta in attempts:
+                yield delta
+        except BaseException:
+            # also covers GeneratorExit when the consumer stops early, and the backoff sleep
+            self.breaker.record_cancelled(admitted)
+            raise
+        finally:
+            await attempts.aclose()
+
+    async def _stream_attempts(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        request = {**request, "stream": True}
+        last_error: Optional[LLMError] = None
+        for attempt in range(self.config.max_retries + 1):
+            started = False
+            try:
+                async with self._semaphore:
+                    async with self._http.stream("POST", "/chat/completions", json=request) as response:
+                        if response.status_code == 200:
+                            invalid_event = None
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                try:
+                                    event = json.loads(data)
+                                except ValueError as e:
+                                    invalid_event = LLMError(f"LLM API sent an event that is not JSON ({e}): {data[:200]}", 200)
+                                    break
+                                choices = event.get("choices") or []
+                                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                                if delta:
+                                    started = True
+                                    yield delta
+                            if invalid_event is None:
+                                self.breaker.record_success()
+                                return
+                            last_error = invalid_event
+                            if started:
+                                self.breaker.record_failure()
+                                raise last_error
+                        else:
+                            await response.aread()
+                            last_error = LLMError(f"LLM API returned {response.status_code}: {response.text[:200]}", response.status_code)
+                            if response.status_code not in RETRYABLE_STATUS_CODES:
+                                self.breaker.record_success()
+                                raise last_error
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = LLMError(f"LLM request failed: {type(e).__name__}: {e}")
+                if started:
+                    self.breaker.record_failure()
+                    raise last_error
+
+            if attempt < self.config.max_retries:
+                _retries_total.inc()
+                await asyncio.sleep(backoff_delay(attempt, self.config.backoff_base_s, self.config.backoff_max_s))
+
+        self.breaker.record_failure()
+        _failures_total.inc(reason=str(last_error.status_code or "transport"))
+        raise last_error
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+class LLMClient:
+    """
+    Synchronous facade over `AsyncLLMClient` running on a private background event loop.
+    `complete()` blocks the calling thread; `acomplete()` can be awaited from any other loop.
+    """
+
+    def __init__(self, config: Optional[ClientConfig] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cassette: Optional[Cassette] = None) -> None:
+        self.async_client = AsyncLLMClient(config or ClientConfig.from_env(), transport=transport)
+        # record/replay layer (LLM_CASSETTE_MODE); None means calls always go to the API
+        self.cassette = cassette
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-client-loop", daemon=True)
+        self._thread.start()
+
+    @property
+    def config(self) -> ClientConfig:
+        return self.async_client.config
+
+    def submit(self, coro) -> Future:
+        """Schedules a coroutine on the client loop and returns its future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _call(self, request: Dict[str, Any], policy: Optional[LatencyPolicy]):
+        def call():
+            if policy is None:
+                return self.async_client.chat(**request)
+            return complete_with_policy(self.async_client.chat, request, policy)
+
+        if self.cassette is None:
+            return call()
+        return self.cassette.wrap(request, call)
+
+    def complete(self, policy: Optional[LatencyPolicy] = None, **request) -> Dict[str, Any]:
+        """Blocking completion; `policy` adds hedging and model fallback (see genai_common.hedging)."""
+        return self.submit(self._call(request, policy)).result()
+
+    async def acomplete(self, policy: Optional[LatencyPolicy] = None, **request) -> Dict[str, Any]:
+        return await asyncio.wrap_future(self.submit(self._call(request, policy)))
+
+    def stream(self, **request) -> Iterator[str]:
+        """
+        Blocking generator over the content deltas of a streamed completion. Streams always use the
+        requested model (no hedging or fallback); with a cassette the recorded answer is yielded whole.
+        """
+        if self.cassette is not None:
+            response = self.complete(**request)
+            yield response["choices"][0]["message"].get("content") or ""
+            return
+
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for delta in self.async_client.chat_stream(**request):
+                    chunks.put(delta)
+                chunks.put(done)
+            except BaseException as e:
+                chunks.put(e)
+                raise
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # the consumer went away early (e.g. client disconnect): stop reading the stream
+            future.cancel()
+
+    def close(self) -> None:
+        self.submit(self.async_client.aclose()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    """Returns the process-wide client, creating it from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(ClientConfig.from_env(), cassette=Cassette.from_env())
+        return _client
@@ -0,0 +1,148 @@
+"""
+Minimal in-process metrics registry with a Prometheus text endpoint.
+
+Counters and histograms are keyed by name and a tuple of label values; `register_gauge` adds values
+computed at scrape time (e.g. cache hit rates). `start_metrics_server(port)` serves `/metrics` from a
+background thread and is safe to call on every Streamlit rerun.
+"""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# seconds; covers in-memory pandas queries up to slow LLM completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # per label set: [bucket counts..., sum, count]
+        self.series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {count:g}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]:g}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]:g}")
+        return lines
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+_metrics: Dict[str, object] = {}
+_gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str = "") -> Counter:
+    with _registry_lock:
+        return _metrics.setdefault(name, Counter(name, help_text))
+
+
+def histogram(name: str, help_text: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        return _metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], float]) -> None:
+    """Registers a gauge whose value is computed by `fn` on every scrape."""
+    with _registry_lock:
+        _gauges[name] = (help_text, fn)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        gauges = list(_gauges.items())
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, (help_text, fn) in gauges:
+        try:
+            value = float(fn())
+        except Exception:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves /metrics on a daemon thread; later calls return the already running server."""
+    global _server
+    with _registry_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def start_from_env() -> Optional[ThreadingHTTPServer]:
+    """Starts the /metrics endpoint when METRICS_PORT is set (e.g. METRICS_PORT=9108)."""
+    port = os.getenv("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
@@ -0,0 +1,174 @@
+"""
+A local OpenAI-compatible chat completions server for measuring prompts without the Fireworks API.
+
+It simulates provider-side prefix caching: the rendered request is split into fixed-size blocks
+and every block whose full prefix was seen before counts as cached. Latency grows with the number
+of uncached prompt tokens, so a stable prefix shows up directly as lower time-to-first-token.
+
+Run standalone with `python -m genai_common.mock_server --port 8089` and point the assistants at
+it with FIREWORKS_BASE_URL=http://127.0.0.1:8089/v1.
+"""
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+CACHE_BLOCK_TOKENS = 16
+
+
+class PrefixCache:
+    """Remembers block-aligned prefix hashes of every request it has served."""
+
+    def __init__(self) -> None:
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def lookup_and_store(self, rendered: str) -> Tuple[int, int]:
+        """Returns (prompt_tokens, cached_tokens) for the rendered prompt and caches its prefixes."""
+        prompt_tokens = max(1, len(rendered) // CHARS_PER_TOKEN)
+        block_chars = CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+        digest = hashlib.sha256()
+        cached_blocks = 0
+        still_cached = True
+        with self._lock:
+            for start in range(0, len(rendered) - block_chars + 1, block_chars):
+                digest.update(rendered[start:start + block_chars].encode("utf-8"))
+                key = digest.copy().hexdigest()
+                if still_cached and key in self._seen:
+                    cached_blocks += 1
+                else:
+                    still_cached = False
+                    self._seen.add(key)
+        return prompt_tokens, min(prompt_tokens, cached_blocks * CACHE_BLOCK_TOKENS)
+
+
+def render_prompt(request: Dict) -> str:
+    """Approximates a chat template: tool schemas first, then each message in order."""
+    parts = []
+    if request.get("tools"):
+        parts.append(json.dumps(request["tools"], sort_keys=True, ensure_ascii=False))
+    for message in request.get("messages", []):
+        parts.append(f"<|{message.get('role')}|>{json.dumps(message.get('content'), ensure_ascii=False)}")
+    return "\n".join(parts)
+
+
+def default_responder(request: Dict) -> Dict:
+    """Returns a fixed assistant message; replace it to script tool calls."""
+    return {"role": "assistant", "content": "This is a mock answer."}
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, base_latency_s: float = 0.05, per_uncached_token_s: float = 0.0002,
+                 responder: Optional[Callable[[Dict], Dict]] = None) -> None:
+        super().__init__(address, _Handler)
+        self.cache = PrefixCache()
+        self.base_latency_s = base_latency_s
+        self.per_uncached_token_s = per_uncached_token_s
+        self.responder = responder or default_responder
+        self.request_count = 0
+        self._failures = []
+
+    def fail_next(self, count: int, status: int = 503) -> None:
+        """Makes the next `count` requests fail with `status` (for exercising client retries)."""
+        self._failures.extend([status] * count)
+
+    def handle_error(self, request, client_address):
+        # clients that time out on purpose close the socket before the reply is written
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockLLMServer
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server._failures:
+            self._send_json(self.server._failures.pop(0), {"error": {"message": "Injected failure"}})
+            return
+
+        prompt_tokens, cached_tokens = self.server.cache.lookup_and_store(render_prompt(request))
+        time.sleep(self.server.base_latency_s + (prompt_tokens - cached_tokens) * self.server.per_uncached_token_s)
+        self.server.request_count += 1
+
+        message = self.server.responder(request)
+        if request.get("stream"):
+            self._send_stream(request, message)
+            return
+        completion_tokens = max(1, len(message.get("content") or "") // CHARS_PER_TOKEN)
+        self._send_json(200, {
+            "id": f"mock-{self.server.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+    def _send_stream(self, request: Dict, message: Dict) -> None:
+        """Sends the message content as server-sent event chunks of a few words each."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = (message.get("content") or "").split(" ")
+        for i in range(0, len(words), 3):
+            text = " ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "")
+            chunk = {"id": f"mock-{self.server.request_count}", "object": "chat.completion.chunk",
+                     "model": request.get("model", "mock"), "choices": [{"index": 0, "delta": {"content": text}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_mock_server(port: int = 0, **kwargs) -> MockLLMServer:
+    """Starts the mock server on a background thread; port 0 picks a free port."""
+    server = MockLLMServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Fireworks chat completions API.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--base-latency", type=float, default=0.05, help="seconds added to every request")
+    args = parser.parse_args()
+
+    server = MockLLMServer(("127.0.0.1", args.port), base_latency_s=args.base_latency)
+    print(f"Mock LLM server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from genai_common import metrics
+
+# set LLM_MEASURE_PROMPTS=1 to record prompt/cached tokens and latency for every completion
+MEASURE_ENV_VAR = "LLM_MEASURE_PROMPTS"
+
+_records: List["RequestMetrics"] = []
+_lock = threading.Lock()
+
+# token counters are always updated (they are cheap); the per-request records only in measurement mode
+_prompt_tokens_total = metrics.counter("genai_llm_prompt_tokens_total", "Prompt tokens sent, by call label.")
+_cached_tokens_total = metrics.counter("genai_llm_cached_prompt_tokens_total", "Prompt tokens served from the provider cache.")
+_completions_total = metrics.counter("genai_llm_completions_total", "Completed LLM calls, by call label.")
+
+
+def _prompt_cache_hit_ratio() -> float:
+    prompt = sum(_prompt_tokens_total.values.values())
+    return sum(_cached_tokens_total.values.values()) / prompt if prompt else 0.0
+
+
+metrics.register_gauge("genai_llm_prompt_cache_hit_ratio", "Share of prompt tokens served from the provider cache.",
+                       _prompt_cache_hit_ratio)
+
+
+@dataclass
+class RequestMetrics:
+    label: str
+    model: str
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    latency_s: float
+    prefix_hash: str
+
+
+def measurement_enabled() -> bool:
+    return os.getenv(MEASURE_ENV_VAR, "").lower() in {"1", "true", "yes"}
+
+
+def prefix_fingerprint(messages: List[Dict], tools: Optional[List[Dict]] = None) -> str:
+    """
+    Hashes the fixed part of a request (tool schemas plus the first system message).
+    Requests that should share a provider-side cached prefix must report the same fingerprint.
+    """
+    prefix = messages[:1] if messages and isinstance(messages[0], dict) and messages[0].get("role") == "system" else []
+    payload = json.dumps({"tools": tools or [], "system": prefix}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _get(obj: Any, key: str, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    value = getattr(obj, key, None)
+    if value is None:
+        # pydantic response models keep unknown fields (e.g. prompt_tokens_details) in model_extra
+        value = (getattr(obj, "model_extra", None) or {}).get(key, default)
+    return value
+
+
+def usage_from_response(response: Any) -> Dict[str, int]:
+    """
+    Reads prompt, cached and completion token counts from an OpenAI-style completion response.
+    """
+    usage = _get(response, "usage")
+    details = _get(usage, "prompt_tokens_details")
+    return {
+        "prompt_tokens": int(_get(usage, "prompt_tokens", 0) or 0),
+        "cached_tokens": int(_get(details, "cached_tokens", 0) or 0),
+        "completion_tokens": int(_get(usage, "completion_tokens", 0) or 0),
+    }
+
+
+def record(label: str, request: Dict, response: Any, latency_s: float) -> RequestMetrics:
+    metrics = RequestMetrics(
+        label=label,
+        model=request.get("model", ""),
+        latency_s=latency_s,
+        prefix_hash=prefix_fingerprint(request.get("messages", []), request.get("tools")),
+        **usage_from_response(response),
+    )
+    with _lock:
+        _records.append(metrics)
+    print(f"[prompt-metrics] {json.dumps(asdict(metrics))}")
+    return metrics
+
+
+def timed_completion(client, label: str, policy=None, **request):
+    """
+    Calls `client.complete(**request)` (with an optional latency policy) and, in measurement mode,
+    records token usage and wall-clock latency for the call under `label`.
+    """
+    start = time.perf_counter()
+    response = client.complete(policy=policy, **request)
+    _observe(label, request, response, time.perf_counter() - start)
+    return response
+
+
+async def atimed_completion(client, label: str, policy=None, **request):
+    """Async counterpart of `timed_completion` using `client.acomplete`."""
+    start = time.perf_counter()
+    response = await client.acomplete(policy=policy, **request)
+    _observe(label, request, response, time.perf_counter() - start)
+    return response
+
+
+def _observe(label: str, request: Dict, response: Any, latency_s: float) -> None:
+    usage = usage_from_response(response)
+    _completions_total.inc(label=label)
+    _prompt_tokens_total.inc(usage["prompt_tokens"], label=label)
+    _cached_tokens_total.inc(usage["cached_tokens"], label=label)
+    if measurement_enabled():
+        record(label, request, response, latency_s)
+
+
+def get_records() -> List[RequestMetrics]:
+    with _lock:
+        return list(_records)
+
+
+def reset() -> None:
+    with _lock:
+        _records.clear()
+
+
+def format_report(records: Optional[List[RequestMetrics]] = None) -> str:
+    """
+    Renders a per-request table followed by a per-label summary of cache hit ratio and latency.
+    """
+    records = get_records() if records is None else records
+    lines = [f"{'label':<28}{'prefix':<14}{'prompt':>8}{'cached':>8}{'latency_ms':>12}"]
+    for r in records:
+        lines.append(f"{r.label:<28}{r.prefix_hash:<14}{r.prompt_tokens:>8}{r.cached_tokens:>8}{r.latency_s * 1000:>12.1f}")
+
+    lines.append("")
+    for label in sorted({r.label for r in records}):
+        group = [r for r in records if r.label == label]
+        prompt = sum(r.prompt_tokens for r in group)
+        cached = sum(r.cached_tokens for r in group)
+        avg_ms = sum(r.latency_s for r in group) / len(group) * 1000
+        hit_ratio = cached / prompt if prompt else 0.0
+        lines.append(f"{label}: {len(group)} requests, cached {hit_ratio:.1%} of prompt tokens, avg latency {avg_ms:.1f} ms, "
+                     f"{len({r.prefix_hash for r in group})} distinct prefix(es)")
+    return "\n".join(lines)
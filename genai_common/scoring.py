@@ -0,0 +1,50 @@
+"""
+Process-wide BERTScore scorer shared by both evaluation modules.
+
+The functional `bert_score.score(...)` rebuilds the model and tokenizer on every call; here a
+`BERTScorer` is built once per (lang, model) combination and reused. Baseline rescaling is applied
+to its raw scores afterwards, so toggling it does not load a second model. Module state survives
+Streamlit reruns, so the model is loaded at most once per worker process.
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# set BERTSCORE_RESCALE=1 to rescale scores with the bert_score baseline by default
+RESCALE_ENV_VAR = "BERTSCORE_RESCALE"
+
+_score_lock = threading.Lock()
+
+
+def rescale_default() -> bool:
+    return os.getenv(RESCALE_ENV_VAR, "").lower() in {"1", "true", "yes"}
+
+
+@lru_cache(maxsize=4)
+def get_scorer(lang: str = "en", model_type: Optional[str] = None):
+    # imported here so that loading the app does not pull in torch until an evaluation runs
+    from bert_score import BERTScorer
+    return BERTScorer(lang=lang, model_type=model_type)
+
+
+def score_pairs(candidates: List[str], references: List[str], rescale_with_baseline: Optional[bool] = None,
+                lang: str = "en", batch_size: int = 64) -> List[Tuple[float, float, float]]:
+    """
+    Scores candidate/reference pairs in batches and returns (precision, recall, f1) per pair.
+    """
+    if not candidates:
+        return []
+    if rescale_with_baseline is None:
+        rescale_with_baseline = rescale_default()
+    scorer = get_scorer(lang=lang)
+    # the scorer's model is not safe to share between concurrent Streamlit sessions
+    with _score_lock:
+        P, R, F1 = scorer.score(candidates, references, batch_size=batch_size)
+        # (P, R, F) baseline of the scorer's model and layer, read from bert_score's files on first use
+        baseline = scorer.baseline_vals.tolist() if rescale_with_baseline else None
+    pairs = list(zip(P.tolist(), R.tolist(), F1.tolist()))
+    if baseline is None:
+        return pairs
+    # the affine map BERTScorer(rescale_with_baseline=True) applies to the same raw scores
+    return [tuple((value - b) / (1 - b) for value, b in zip(pair, baseline)) for pair in pairs]
@@ -0,0 +1,55 @@
+"""
+Helpers for streamed answers.
+
+Reasoning models wrap their thoughts in <think>/<thinking>/<thought> tags; `strip_thoughts_stream`
+drops those blocks from a stream of deltas as they arrive, so clients only see the answer text.
+The full answer is still cleaned with each assistant's `strip_model_thoughts` once the stream ends.
+"""
+from typing import Iterable, Iterator
+
+THOUGHT_TAGS = ("think", "thinking", "thought")
+# longest opening tag we need to recognise, e.g. "<thinking>"
+_MAX_TAG_CHARS = max(len(tag) for tag in THOUGHT_TAGS) + 2
+
+
+def strip_thoughts_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """Yields the text of `chunks` with thought blocks removed, holding back only partial tags."""
+    buffer = ""
+    inside = None  # name of the thought tag currently open
+    for chunk in chunks:
+        buffer += chunk
+        while buffer:
+            if inside:
+                closing = f"</{inside}>"
+                end = buffer.find(closing)
+                if end < 0:
+                    # keep just enough to recognise a closing tag split across chunks
+                    buffer = buffer[-len(closing):]
+                    break
+                buffer = buffer[end + len(closing):]
+                inside = None
+                continue
+
+            start = buffer.find("<")
+            if start < 0:
+                yield buffer
+                buffer = ""
+                break
+            if start:
+                yield buffer[:start]
+                buffer = buffer[start:]
+            close = buffer.find(">")
+            if close < 0:
+                if len(buffer) < _MAX_TAG_CHARS:
+                    break  # possibly a tag split across chunks: wait for more text
+                yield buffer[0]
+                buffer = buffer[1:]
+                continue
+            tag = buffer[1:close].strip().lower()
+            if tag in THOUGHT_TAGS:
+                inside = tag
+            elif tag.lstrip("/") not in THOUGHT_TAGS:
+                yield buffer[:close + 1]
+            buffer = buffer[close + 1:]
+    if buffer and not inside:
+        yield buffer
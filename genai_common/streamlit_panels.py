@@ -0,0 +1,38 @@
+from typing import Dict, List, Optional
+
+
+def _share(ms: float, of_ms: float) -> str:
+    return f"{ms / of_ms:.0%}" if of_ms else "-"
+
+
+def render_timing_panel(st, timing: Optional[Dict]) -> None:
+    """Shows the per-stage timing breakdown of the last answer (a `Trace.to_dict()`) in an expander."""
+    if not timing:
+        return
+    stages, parents = timing["stages_ms"], timing.get("parents", {})
+    children: Dict[Optional[str], List[str]] = {}
+    for stage in sorted(stages, key=lambda s: -stages[s]):
+        # a stage whose parent was not recorded is shown at the top level
+        parent = parents.get(stage)
+        children.setdefault(parent if parent in stages else None, []).append(stage)
+
+    rows, shown = [], set()
+
+    def add_rows(parent: Optional[str], depth: int) -> None:
+        for stage in children.get(parent, []):
+            if stage in shown: # stages that ran inside each other at different times
+                continue
+            shown.add(stage)
+            ms = stages[stage]
+            # shares of nested stages are of the stage they ran inside, so top-level shares add up to at most 100%
+            share = _share(ms, timing["duration_ms"]) if parent is None else f"{_share(ms, stages[parent])} of {parent}"
+            rows.append({"Stage": " " * depth + ("↳ " if depth else "") + stage, "Time (ms)": round(ms, 1), "Share": share})
+            add_rows(stage, depth + 1)
+
+    add_rows(None, 0)
+    for stage in stages: # only reachable through a cycle of parents
+        if stage not in shown:
+            children[None] = [stage]
+            add_rows(None, 0)
+    with st.expander(f"Timing breakdown of the last answer ({timing['duration_ms'] / 1000:.2f}s total)"):
+        st.table(rows)
@@ -0,0 +1,126 @@
+"""
+Lightweight per-request stage timing.
+
+Wrap a unit of work in `trace()` and any `span(name)` entered inside it (in the same thread or
+asyncio task) is recorded on that trace. Every span also feeds the `genai_stage_duration_seconds`
+histogram and every trace the `genai_request_duration_seconds` histogram (see genai_common.metrics).
+Finished traces are logged as one JSON line on the `genai.trace` logger; set GENAI_TRACE_LOG=1 to
+print them to stderr without configuring logging.
+
+A span entered inside another one is recorded with the enclosing stage as its parent, so its time is
+not counted twice when stage shares are shown. Code that turns a failure into an answer instead of
+raising (e.g. an apology message) calls `mark_failed()`, so the request still counts as an error.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from genai_common import metrics
+
+logger = logging.getLogger("genai.trace")
+if os.getenv("GENAI_TRACE_LOG", "").lower() in {"1", "true", "yes"} and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_stage_seconds = metrics.histogram("genai_stage_duration_seconds", "Duration of pipeline stages.")
+_request_seconds = metrics.histogram("genai_request_duration_seconds", "End-to-end duration of traced requests.")
+_requests_total = metrics.counter("genai_requests_total", "Traced requests by pipeline and outcome.")
+
+
+@dataclass
+class Trace:
+    name: str
+    spans: List[Tuple[str, float]] = field(default_factory=list)
+    duration_s: float = 0.0
+    parents: Dict[str, str] = field(default_factory=dict) # nested stage -> the stage it ran inside
+    failed: bool = False
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Seconds per stage name, summed over repeated spans (e.g. two LLM calls)."""
+        totals: Dict[str, float] = {}
+        for name, duration in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace": self.name,
+            "duration_ms": round(self.duration_s * 1000, 2),
+            "stages_ms": {name: round(d * 1000, 2) for name, d in self.stage_totals().items()},
+            "parents": dict(self.parents),
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """Starts a trace that collects every span entered inside the block."""
+    current = Trace(name)
+    token = _current_trace.set(current)
+    span_token = _current_span.set(None)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield current
+        outcome = "error" if current.failed else "ok"
+    finally:
+        current.duration_s = time.perf_counter() - start
+        _current_span.reset(span_token)
+        _current_trace.reset(token)
+        _request_seconds.observe(current.duration_s, pipeline=name)
+        _requests_total.inc(pipeline=name, outcome=outcome)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({**current.to_dict(), "outcome": outcome}))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the block and records it on the active trace, if any."""
+    current = _current_trace.get()
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _stage_seconds.observe(duration, stage=name)
+        if current is not None:
+            current.spans.append((name, duration))
+            if parent is not None and parent != name:
+                current.parents.setdefault(name, parent)
+
+
+def timed(name: str):
+    """Decorator form of `span` for functions with many return points."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def mark_failed() -> None:
+    """Records the active trace, if any, as failed although no exception leaves it."""
+    current = _current_trace.get()
+    if current is not None:
+        current.failed = True
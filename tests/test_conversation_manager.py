@@ -0,0 +1,63 @@
+"""
+Tool call log kept per turn by `run_conversation` (LLM-CSV/conversation_manager.py).
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import json
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "LLM-CSV"))
+os.environ.setdefault("BLOODBANK_CSV", str(ROOT / "RAG" / "synthetic_data_blood_bank.csv"))
+
+import conversation_manager  # noqa: E402
+
+TOOL_CALL = {"id": "call-1", "type": "function",
+             "function": {"name": "query_data", "arguments": json.dumps({"filters": {"GENDER": {"eq": "F"}}})}}
+
+
+class _ScriptedClient:
+    """Answers each completion request with the next scripted assistant message."""
+
+    def __init__(self, *messages):
+        self.messages = list(messages)
+
+    def complete(self, policy=None, **request):
+        return {"choices": [{"message": self.messages.pop(0)}]}
+
+
+def _run(client, query, history, tool_log):
+    with mock.patch.object(conversation_manager, "get_llm_client", return_value=client):
+        return conversation_manager.run_conversation(query, history=history, tool_log=tool_log)
+
+
+class ToolLogTest(unittest.TestCase):
+    def test_tool_calls_are_logged_under_the_turn_index(self):
+        history, tool_log = [("earlier", "answer"), ("how many?", "...")], {}
+        client = _ScriptedClient({"role": "assistant", "content": None, "tool_calls": [TOOL_CALL]},
+                                 {"role": "assistant", "content": "Many."})
+        self.assertEqual(_run(client, "how many?", history, tool_log), "Many.")
+        self.assertEqual(list(tool_log), [1])
+        self.assertTrue(tool_log[1][0].startswith("query_data(filters="))
+
+    def test_direct_answer_clears_the_calls_of_an_earlier_try_of_the_turn(self):
+        history = [("how many?", "...")]
+        tool_log = {0: ['query_data(filters={"GENDER": {"eq": "M"}})']}
+        client = _ScriptedClient({"role": "assistant", "content": "I cannot tell."})
+        self.assertEqual(_run(client, "how many?", history, tool_log), "I cannot tell.")
+        self.assertEqual(tool_log, {0: []})
+
+    def test_direct_answer_keeps_the_calls_of_other_turns(self):
+        history, tool_log = [("how many?", "Many.")], {0: ["query_data()"]}
+        client = _ScriptedClient({"role": "assistant", "content": "Hello."})
+        _run(client, "hi", history, tool_log)
+        self.assertEqual(tool_log, {0: ["query_data()"], 1: []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Delta appends of the blood bank dataset and the query_data result cache (LLM-CSV/data_handler.py).
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "LLM-CSV"))
+os.environ.setdefault("BLOODBANK_CSV", str(ROOT / "RAG" / "synthetic_data_blood_bank.csv"))
+os.environ["BLOODBANK_QUERY_ENGINE"] = "pandas"
+os.environ["BLOODBANK_SHARED_DATASET"] = "0"
+
+import data_handler  # noqa: E402
+
+SERVICE = "TEST-Delta Service"
+
+
+def _delta(rows: int, day: str = "2030-01-01"):
+    delta = data_handler.df.head(rows).copy()
+    delta["MED_SERVICE"] = SERVICE
+    delta["TRANSFUSION_DT"] = day
+    return delta
+
+
+def _service_count() -> int:
+    result = data_handler.query_data(filters={"MED_SERVICE": {"eq": SERVICE}})["result"]
+    return result["record_count"] if isinstance(result, dict) else 0
+
+
+class DeltaAppendTest(unittest.TestCase):
+    def test_append_bumps_the_version_and_invalidates_cached_results(self):
+        before = _service_count()
+        self.assertEqual(_service_count(), before)  # served from the cache
+        hits = data_handler.query_cache_stats()["hits"]
+        version = data_handler.dataset_version()
+
+        outcome = data_handler.append_records(_delta(3, "2030-01-02"), name="test-append")
+        self.assertEqual((outcome["rows"], outcome["version"]), (3, version + 1))
+        self.assertEqual(_service_count(), before + 3)
+        self.assertEqual(data_handler.query_cache_stats()["hits"], hits)
+
+    def test_a_delta_is_applied_once_per_name(self):
+        data_handler.append_records(_delta(2, "2030-02-01"), name="test-once")
+        count, version = _service_count(), data_handler.dataset_version()
+        outcome = data_handler.append_records(_delta(2, "2030-02-01"), name="test-once")
+        self.assertEqual(outcome["rows"], 0)
+        self.assertEqual((_service_count(), data_handler.dataset_version()), (count, version))
+
+    def test_pending_delta_files_are_applied_in_name_order_and_only_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _delta(2, "2030-03-02").to_csv(os.path.join(directory, "test-pending-b.csv"), index=False)
+            _delta(1, "2030-03-01").to_csv(os.path.join(directory, "test-pending-a.csv"), index=False)
+            before = _service_count()
+            self.assertEqual(data_handler.apply_pending_deltas(directory), 3)
+            self.assertEqual(data_handler.apply_pending_deltas(directory), 0)
+        self.assertEqual(list(data_handler._applied_deltas)[-2:], ["test-pending-a", "test-pending-b"])
+        self.assertEqual(_service_count(), before + 3)
+
+    def test_delta_with_other_columns_is_rejected(self):
+        version = data_handler.dataset_version()
+        outcome = data_handler.append_records(_delta(1).drop(columns=["AGE"]), name="test-missing-column")
+        self.assertIn("error", outcome)
+        self.assertEqual(data_handler.dataset_version(), version)
+
+
+class QueryCacheTest(unittest.TestCase):
+    def test_equivalent_arguments_share_a_cache_entry(self):
+        data_handler.clear_query_cache()
+        first = data_handler.query_data(
+            filters={"TRANSFUSION_DT": {"gte": "2021-07-01", "lte": "2021-07-31"}, "PRODUCT_CAT": {"contains": "red"}},
+            aggregations={"TRANSFUSED_VOL": "sum"}, time_resample_period="monthly")
+        hits = data_handler.query_cache_stats()["hits"]
+        second = data_handler.query_data(
+            filters={"PRODUCT_CAT": {"contains": "RED"}, "TRANSFUSION_DT": {"lte": "07/31/2021", "gte": "2021-07-01 00:00"}},
+            aggregations={"TRANSFUSED_VOL": "sum"}, time_resample_period="M")
+        self.assertIs(second, first)
+        self.assertEqual(data_handler.query_cache_stats()["hits"], hits + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
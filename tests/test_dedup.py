@@ -0,0 +1,70 @@
+"""
+Boilerplate and duplicate detection of `collapse_duplicates` (LLM-PDF1/src/dedup.py).
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "LLM-PDF1"))
+
+from src.dedup import DedupStats, collapse_duplicates  # noqa: E402
+
+
+def _record(page: int, text: str) -> dict:
+    return {"source_pdf": "paper.pdf", "page": page, "type": "Text", "text": text}
+
+
+class CollapseDuplicatesTest(unittest.TestCase):
+    def test_texts_differing_only_in_numbers_are_kept(self):
+        records = [
+            _record(3, "Table 2. Accuracy of the model is 0.71 on the 2019 cohort."),
+            _record(5, "Table 4. Accuracy of the model is 0.93 on the 2021 cohort."),
+        ]
+        stats = DedupStats()
+        kept = collapse_duplicates(records, stats)
+        self.assertEqual([r["text"] for r in kept], [r["text"] for r in records])
+        self.assertEqual(stats.duplicates, 0)
+
+    def test_numbered_results_on_every_page_are_not_boilerplate(self):
+        words = ["one", "two", "three", "four"]
+        records = []
+        for page in range(1, 5):
+            records += [
+                _record(page, f"Introduction to part {words[page - 1]}"),
+                _record(page, f"Table {page}. Accuracy of the model is 0.{70 + page} on the {2016 + page} cohort."),
+                _record(page, f"Closing remarks on part {words[page - 1]}"),
+            ]
+        stats = DedupStats()
+        kept = collapse_duplicates(records, stats)
+        self.assertEqual(stats.boilerplate, 0)
+        self.assertEqual(sum(r["text"].startswith("Table") for r in kept), 4)
+
+    def test_running_footer_with_page_numbers_is_boilerplate(self):
+        bodies = ["Methods were chosen in 2019.", "Results cover 12 sites.", "We found 3 effects.", "Limits apply to 1 cohort."]
+        records = []
+        for page, body in enumerate(bodies, start=1):
+            records += [_record(page, body), _record(page, f"Page {page} of 4")]
+        stats = DedupStats()
+        kept = collapse_duplicates(records, stats)
+        self.assertEqual(stats.boilerplate, 4)
+        self.assertFalse(any(r["text"].startswith("Page") for r in kept))
+
+    def test_texts_repeated_verbatim_are_collapsed(self):
+        records = [_record(1, "See the appendix."), _record(2, "see the   APPENDIX.")]
+        kept = collapse_duplicates(records)
+        self.assertEqual(len(kept), 1)
+        self.assertEqual(kept[0]["pages"], [1, 2])
+
+    def test_punctuation_only_texts_are_not_merged(self):
+        records = [_record(1, "—"), _record(2, "* * *"), _record(3, ""), _record(4, "")]
+        stats = DedupStats()
+        kept = collapse_duplicates(records, stats)
+        self.assertEqual(len(kept), 4)
+        self.assertEqual((stats.boilerplate, stats.duplicates), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Circuit breaker bookkeeping of `AsyncLLMClient` when a call ends without an outcome or with a broken body.
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+import asyncio
+import unittest
+
+import httpx
+
+from genai_common.errors import LLMError
+from genai_common.llm_client import AsyncLLMClient, CircuitBreaker, ClientConfig
+
+
+def _client(handler, backoff_s: float = 30.0) -> AsyncLLMClient:
+    # opens after one failed call and is half-open right away; long backoff so a cancel lands in the sleep
+    config = ClientConfig(base_url="http://llm.test/v1", max_retries=3, backoff_base_s=backoff_s, backoff_max_s=backoff_s,
+                          breaker_failure_threshold=1, breaker_reset_s=0.0)
+    return AsyncLLMClient(config, transport=httpx.MockTransport(handler))
+
+
+class CancelledTrialTest(unittest.TestCase):
+    def test_trial_cancelled_during_backoff_releases_the_circuit(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            return httpx.Response(503, text="unavailable")
+
+        async def scenario():
+            client = _client(handler)
+            client.breaker.record_failure()  # open, and half-open after reset_s=0
+            self.assertEqual(client.breaker.state, "half-open")
+
+            trial = asyncio.create_task(client.chat(model="m", messages=[]))
+            while not attempts:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.01)  # the 503 has been handled; the trial is in its backoff sleep
+            self.assertTrue(client.breaker._trial_in_flight)
+            trial.cancel()  # the losing side of a hedge
+            with self.assertRaises(asyncio.CancelledError):
+                await trial
+
+            self.assertEqual(client.breaker.state, "half-open")
+            self.assertFalse(client.breaker._trial_in_flight)
+            self.assertEqual(client.breaker.acquire(), "trial")
+            await client.aclose()
+
+        asyncio.run(scenario())
+
+    def test_trial_with_a_body_that_is_not_json_fails_and_releases_the_circuit(self):
+        async def scenario():
+            client = _client(lambda request: httpx.Response(200, text="not json"), backoff_s=0.0)
+            client.breaker.record_failure()
+            with self.assertRaises(LLMError) as raised:
+                await client.chat(model="m", messages=[])
+            self.assertIn("not JSON", str(raised.exception))
+            self.assertFalse(client.breaker._trial_in_flight)
+            self.assertEqual(client.breaker.failures, 2)
+            await client.aclose()
+
+        asyncio.run(scenario())
+
+    def test_body_that_is_not_json_is_retried(self):
+        responses = [httpx.Response(200, text="<html>bad gateway</html>"), httpx.Response(200, json={"choices": []})]
+
+        async def scenario():
+            client = _client(lambda request: responses.pop(0), backoff_s=0.0)
+            self.assertEqual(await client.chat(model="m", messages=[]), {"choices": []})
+            self.assertEqual(client.breaker.state, "closed")
+            await client.aclose()
+
+        asyncio.run(scenario())
+
+    def test_stream_event_that_is_not_json_is_retried_before_the_first_delta(self):
+        bodies = [b"data: {truncated\n\n",
+                  b'data: {"choices": [{"delta": {"content": "hi"}}]}\n\ndata: [DONE]\n\n']
+
+        async def scenario():
+            client = _client(lambda request: httpx.Response(200, content=bodies.pop(0)), backoff_s=0.0)
+            self.assertEqual([d async for d in client.chat_stream(model="m", messages=[])], ["hi"])
+            await client.aclose()
+
+        asyncio.run(scenario())
+
+    def test_cancelling_a_normal_call_keeps_the_trial_of_another(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_s=0.0)
+        breaker.record_failure()
+        self.assertEqual(breaker.acquire(), "trial")
+        breaker.record_cancelled("closed")
+        self.assertTrue(breaker._trial_in_flight)
+        self.assertIsNone(breaker.acquire())
+        breaker.record_cancelled("trial")
+        self.assertEqual(breaker.acquire(), "trial")
+
+
+if __name__ == "__main__":
+    unittest.main()